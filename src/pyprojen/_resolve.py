@@ -2,8 +2,13 @@ import re
 from typing import (
     Any,
     Dict,
+    List,
+    Set,
+    Tuple,
 )
 
+from pyprojen.util.object import copy_tree
+
 
 class IResolvable:
     def to_json(self) -> Any:
@@ -14,47 +19,174 @@ def is_resolvable(obj: Any) -> bool:
     return hasattr(obj, "to_json") and callable(getattr(obj, "to_json"))
 
 
+# what to do with a value, by exact type. Other types, including subclasses, go through `_classify`.
+_SCALAR, _DICT, _LIST, _SET, _LAZY = range(5)
+_KINDS = {
+    str: _SCALAR,
+    int: _SCALAR,
+    float: _SCALAR,
+    bool: _SCALAR,
+    type(None): _SCALAR,
+    dict: _DICT,
+    list: _LIST,
+    set: _SET,
+}
+
+# stack frames: visit a value, build a container out of the values resolved last, or finish a lazy value
+_VISIT, _BUILD_DICT, _BUILD_LIST, _LEAVE = range(4)
+
+
+def evaluate(value: Any, args: List[Any]) -> Any:
+    """
+    Evaluates a lazy value: a resolvable object or a callable.
+
+    Args:
+        value (Any): The lazy value.
+        args (List): Arguments to pass to callable values.
+
+    Returns:
+        Any: The value it produces, still to be resolved.
+    """
+    return value.to_json() if is_resolvable(value) else value(*args)
+
+
 def resolve(value: Any, options: Dict[str, Any] = {}) -> Any:
     """
-    Recursively resolves a value, handling various Python types and custom resolvable objects.
+    Resolves a value, handling various Python types and custom resolvable objects.
+
+    Works with an explicit stack, so documents of any depth can be resolved.
 
     Args:
         value (Any): The value to resolve. Can be of any type.
         options (Dict[str, Any], optional): Additional options for resolution. Defaults to {}.
             - 'args' (List): Arguments to pass to callable values.
             - 'omit_empty' (bool): If True, empty lists and dicts are resolved to None.
+            - 'memo' (Dict): Resolved containers by identity, shared by calls that resolve the same
+              containers, e.g. all files of one synth. The containers must not be modified while the
+              memo is in use. Callers always get their own copy of the result. Ignored with 'args'.
+            - 'evaluate' (Callable): Evaluates lazy values, see `evaluate`, which is the default.
 
     Returns:
         Any: The resolved value.
 
     Raises:
-        ValueError: If a regular expression with flags is encountered.
+        ValueError: If a regular expression with flags is encountered, or the value contains itself.
     """
     args = options.get("args", [])
     omit_empty = options.get("omit_empty", False)
+    # callables may return something else for other args, so only resolutions without args are memoized
+    memo = options.get("memo") if not args else None
+    evaluate_lazy = options.get("evaluate", evaluate)
+
+    # the resolved values, in the order they were visited
+    results: List[Any] = []
+    # with a memo, the same values, but sharing the memoized containers, which are never handed out
+    shared: List[Any] = []
+    # ids of the containers and lazy values being resolved, to detect cycles
+    in_progress: Set[int] = set()
+    stack: List[Tuple[int, Any, Any]] = [(_VISIT, value, None)]
+    while stack:
+        op, item, extra = stack.pop()
+
+        if op == _LEAVE:
+            in_progress.discard(id(item))
+            continue
+
+        if op != _VISIT:
+            in_progress.discard(id(item))
+            count = len(extra) if op == _BUILD_DICT else extra
+            start = len(results) - count
+            result = _build(op, extra, results[start:], omit_empty)
+            del results[start:]
+            results.append(result)
+            if memo is not None:
+                frozen = _build(op, extra, shared[start:], omit_empty)
+                del shared[start:]
+                shared.append(frozen)
+                # keep the container itself, so its id is not reused while the memo is in use
+                memo[(id(item), omit_empty)] = (item, frozen)
+            continue
+
+        kind = _KINDS.get(type(item))
+        if kind is None:
+            kind, item = _classify(item)
+        if kind == _LAZY:
+            if id(item) in in_progress:
+                raise ValueError(f"Cannot resolve {item!r}, it produces a value that contains itself")
+            in_progress.add(id(item))
+            stack.append((_LEAVE, item, None))
+            stack.append((_VISIT, evaluate_lazy(item, args), None))
+            continue
+        if kind == _SCALAR:
+            results.append(item)
+            if memo is not None:
+                shared.append(item)
+            continue
+
+        if memo is not None:
+            entry = memo.get((id(item), omit_empty))
+            if entry is not None:
+                results.append(copy_tree(entry[1]))
+                shared.append(entry[1])
+                continue
+        if id(item) in in_progress:
+            raise ValueError("Cannot resolve a value that contains itself")
+        in_progress.add(id(item))
 
-    match value:
-        case None:
-            return None
-        case _ if is_resolvable(value):
-            return resolve(value.to_json(), options)
-        case re.Pattern():
-            if value.flags:
-                raise ValueError("RegExp with flags should be explicitly converted to a string")
-            return value.pattern
-        case set():
-            return resolve(list(value), options)
-        case dict():
-            result = {}
-            for k, v in value.items():
-                resolved = resolve(v, options)
-                if resolved is not None:
-                    result[k] = resolved
-            return None if omit_empty and not result else result
-        case list():
-            resolved = [x for x in (resolve(v, options) for v in value) if x is not None]
-            return None if omit_empty and not resolved else resolved
-        case _ if callable(value):
-            return resolve(value(*args), options)
-        case _:
-            return value
+        if kind == _DICT:
+            keys = list(item)
+            stack.append((_BUILD_DICT, item, keys))
+            children = [item[k] for k in keys]
+        else:
+            children = list(item)
+            stack.append((_BUILD_LIST, item, len(children)))
+        stack.extend((_VISIT, child, None) for child in reversed(children))
+
+    return results[0]
+
+
+def _classify(value: Any) -> Tuple[int, Any]:
+    """
+    Decide what to do with a value whose type is not in `_KINDS`.
+
+    Args:
+        value (Any): The value.
+
+    Returns:
+        Tuple[int, Any]: The kind of the value, and the value to continue with.
+    """
+    if is_resolvable(value):
+        return _LAZY, value
+    if isinstance(value, re.Pattern):
+        if value.flags:
+            raise ValueError("RegExp with flags should be explicitly converted to a string")
+        return _SCALAR, value.pattern
+    if isinstance(value, set):
+        return _SET, value
+    if isinstance(value, dict):
+        return _DICT, value
+    if isinstance(value, list):
+        return _LIST, value
+    if callable(value):
+        return _LAZY, value
+    return _SCALAR, value
+
+
+def _build(op: int, keys: Any, values: List[Any], omit_empty: bool) -> Any:
+    """
+    Build a resolved container, dropping members that resolved to None.
+
+    Args:
+        op (int): `_BUILD_DICT` or `_BUILD_LIST`.
+        keys (Any): The keys of a dict.
+        values (List): The resolved members.
+        omit_empty (bool): If True, an empty container is resolved to None.
+
+    Returns:
+        Any: The container.
+    """
+    if op == _BUILD_DICT:
+        result = {k: v for k, v in zip(keys, values) if v is not None}
+    else:
+        result = [v for v in values if v is not None]
+    return None if omit_empty and not result else result
@@ -0,0 +1,66 @@
+from typing import (
+    Any,
+    Optional,
+)
+
+from pyprojen.constructs import Construct
+from pyprojen.file import (
+    FileBase,
+    IResolver,
+)
+
+
+class BinaryFile(FileBase):
+    """
+    Represents a binary file, e.g. an image or a font, written exactly as given.
+    """
+
+    def __init__(
+        self,
+        scope: Construct,
+        file_path: str,
+        data: Any,
+        committed: Optional[bool] = None,
+        edit_gitignore: bool = True,
+        readonly: bool = True,
+        executable: bool = False,
+    ):
+        """
+        Initialize a BinaryFile.
+
+        :param scope: The scope in which to define this file
+        :param file_path: The file path
+        :param data: The content of the file as bytes, or a lazy value that produces it
+        :param committed: Whether the file should be committed
+        :param edit_gitignore: Whether to edit .gitignore
+        :param readonly: Whether the file should be readonly
+        :param executable: Whether the file should be executable
+        """
+        super().__init__(
+            scope,
+            file_path,
+            committed=committed,
+            edit_gitignore=edit_gitignore,
+            readonly=readonly,
+            executable=executable,
+            marker=False,
+        )
+        self._data = data
+
+    def set_data(self, data: Any):
+        """
+        Replace the content of the binary file.
+
+        :param data: The content of the file as bytes, or a lazy value that produces it
+        """
+        self._data = data
+        self.mark_dirty()
+
+    def synthesize_content(self, resolver: IResolver) -> Optional[bytes]:
+        """
+        Synthesize the content of the binary file.
+
+        :param resolver: The resolver to use
+        :return: The content, or None
+        """
+        return resolver.resolve(self._data)
@@ -0,0 +1,225 @@
+"""
+Check mode: verify that the generated files are up to date, without writing or removing anything.
+"""
+import os
+import runpy
+import stat
+import sys
+import threading
+from typing import (
+    List,
+    Optional,
+    Union,
+)
+
+from pyprojen.output_backend import (
+    DiskBackend,
+    FileStat,
+    OutputBackend,
+)
+from pyprojen.util import get_file_permissions
+
+_active_session: Optional["CheckSession"] = None
+
+
+class SynthReport:
+    """The files a synth would add, change or remove."""
+
+    def __init__(
+        self,
+        added: Optional[List[str]] = None,
+        changed: Optional[List[str]] = None,
+        orphaned: Optional[List[str]] = None,
+    ):
+        """
+        Initialize a SynthReport.
+
+        :param added: Paths of the files that do not exist yet
+        :param changed: Paths of the files whose content or permissions differ
+        :param orphaned: Paths of the files that are no longer generated and would be removed
+        """
+        self.added = added or []
+        self.changed = changed or []
+        self.orphaned = orphaned or []
+
+    @property
+    def up_to_date(self) -> bool:
+        """
+        Whether a synth would not touch any file.
+
+        :return: True if all generated files are up to date
+        """
+        return not (self.added or self.changed or self.orphaned)
+
+    def merge(self, other: "SynthReport") -> "SynthReport":
+        """
+        Combine two reports.
+
+        :param other: The other report
+        :return: A new report with the files of both
+        """
+        return SynthReport(
+            sorted(set(self.added) | set(other.added)),
+            sorted(set(self.changed) | set(other.changed)),
+            sorted(set(self.orphaned) | set(other.orphaned)),
+        )
+
+    def format(self) -> str:
+        """
+        Format the report for humans, one file per line.
+
+        :return: The formatted report
+        """
+        lines = (
+            [f"added: {path}" for path in self.added]
+            + [f"changed: {path}" for path in self.changed]
+            + [f"orphaned: {path}" for path in self.orphaned]
+        )
+        return "\n".join(lines)
+
+
+class CheckBackend(OutputBackend):
+    """
+    Compares the files of a synth against the local filesystem instead of writing them.
+
+    Reads go to disk, so unchanged files are detected as usual (by recorded digest or by content).
+    Writes and removals are only recorded in `report`, with paths relative to the outdir of the
+    project that started the synth.
+    """
+
+    stores_state = False
+
+    def __init__(self):
+        """
+        Initialize a CheckBackend.
+        """
+        self.report = SynthReport()
+        self._disk = DiskBackend()
+        self._root: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def begin(self, outdir: str):
+        self._root = outdir
+
+    def stat(self, path: str) -> Optional[os.stat_result]:
+        return self._disk.stat(path)
+
+    def read(self, path: str) -> Optional[str]:
+        return self._disk.read(path)
+
+    def digest(self, path: str) -> Optional[str]:
+        return self._disk.digest(path)
+
+    def content_equals(self, path: str, data: bytes) -> bool:
+        return self._disk.content_equals(path, data)
+
+    def write(self, path: str, data: Union[str, bytes], readonly: bool = False, executable: bool = False) -> FileStat:
+        size = len(data.encode("utf-8") if isinstance(data, str) else data)
+        return self._record(path, size, readonly, executable)
+
+    def copy(self, source: str, path: str, readonly: bool = False, executable: bool = False) -> FileStat:
+        return self._record(path, os.stat(source).st_size, readonly, executable)
+
+    def _record(self, path: str, size: int, readonly: bool, executable: bool) -> FileStat:
+        """
+        Record a file that would be written.
+
+        :param path: The absolute path of the file
+        :param size: The size it would have
+        :param readonly: Whether it would be readonly
+        :param executable: Whether it would be executable
+        :return: The stat it would have, keeping the mtime of the existing file
+        """
+        prev_stat = self._disk.stat(path)
+        with self._lock:
+            (self.report.added if prev_stat is None else self.report.changed).append(self._relative(path))
+        mtime_ns = prev_stat.st_mtime_ns if prev_stat is not None else 0
+        mode = int(get_file_permissions({"readonly": readonly, "executable": executable}), 8)
+        return FileStat(size, mtime_ns, stat.S_IFREG | mode)
+
+    def remove(self, path: str):
+        if os.path.lexists(path):
+            with self._lock:
+                self.report.orphaned.append(self._relative(path))
+
+    def finish(self):
+        self.report = SynthReport().merge(self.report)
+
+    def _relative(self, path: str) -> str:
+        """
+        The path of a file relative to the synthesized outdir.
+
+        :param path: The absolute path of the file
+        :return: The relative path, with forward slashes
+        """
+        return os.path.relpath(path, self._root).replace(os.sep, "/")
+
+
+class CheckSession:
+    """
+    Turns every top-level `Project.synth()` into a dry run while active, and collects the reports.
+
+    Used to check a config script that calls `synth()` itself, e.g. by `pyprojen check`.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        """
+        Initialize a CheckSession.
+
+        :param max_workers: Number of threads to compare files with, for synths that do not set `max_workers`
+        """
+        self.max_workers = max_workers
+        self.reports: List[SynthReport] = []
+
+    def __enter__(self) -> "CheckSession":
+        global _active_session
+        if _active_session is not None:
+            raise ValueError("a check session is already active")
+        _active_session = self
+        return self
+
+    def __exit__(self, *args):
+        global _active_session
+        _active_session = None
+
+    @property
+    def report(self) -> SynthReport:
+        """
+        The combined report of all synths run during the session.
+
+        :return: The report
+        """
+        report = SynthReport()
+        for r in self.reports:
+            report = report.merge(r)
+        return report
+
+
+def active_session() -> Optional[CheckSession]:
+    """
+    The check session in progress, if any.
+
+    :return: The session, or None
+    """
+    return _active_session
+
+
+def run_check(rc_file: str, max_workers: Optional[int] = None) -> SynthReport:
+    """
+    Run a config script as `__main__`, dry-running every synth it starts.
+
+    :param rc_file: Path to the config script
+    :param max_workers: Number of threads to compare files with, for synths that do not set `max_workers`
+    :return: The combined report of the synths
+    """
+    rc_file = os.path.abspath(rc_file)
+    root_dir = os.path.dirname(rc_file)
+    if root_dir not in sys.path:
+        sys.path.insert(0, root_dir)
+    with CheckSession(max_workers) as session:
+        try:
+            runpy.run_path(rc_file, run_name="__main__")
+        except SystemExit as e:
+            if e.code:
+                raise
+    return session.report
@@ -1,50 +1,261 @@
 import json
 import logging
 import os
-from typing import List
+import stat
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from pyprojen.common import (
+    FILE_STATE,
+    GENERATED_FILE_MARKER,
+)
+from pyprojen.output_backend import DiskBackend
+from pyprojen.util.ignore import IgnoreMatcher
+
+if TYPE_CHECKING:
+    from pyprojen.output_backend import OutputBackend
 
 FILE_MANIFEST = ".pyprojen/files.json"
 
+# number of files a worker removes per task
+REMOVE_BATCH_SIZE = 64
+
+# number of files a worker scans for the marker per task
+SCAN_BATCH_SIZE = 64
+
+# the marker is looked for in this many bytes at the start and at the end of each file; markers are written
+# at the top of a file, except in plain json, where the "//" key comes last
+MARKER_SCAN_BYTES = 4096
+
+# the first line of generated files with comments (yaml, toml, ignore files, json with comments), and the
+# line of the "//" key that closes the top-level object of generated plain json files
+MARKER_LINES = {f"# {GENERATED_FILE_MARKER}".encode("utf-8"), f"// {GENERATED_FILE_MARKER}".encode("utf-8")}
+MARKER_KEY_LINE = f'  "//": {json.dumps(GENERATED_FILE_MARKER)}'.encode("utf-8")
+
+# directories the legacy scan never enters: they hold files of other tools, which may well mention pyprojen,
+# e.g. pyprojen's own sources in a virtualenv. So do directories with a pyvenv.cfg, i.e. any virtualenv.
+SCAN_SKIPPED_DIRS = {".git", ".venv", "venv", ".tox", ".nox", "site-packages", "node_modules", "__pycache__"}
+
+
+class CleanupStats:
+    """What a cleanup did."""
+
+    def __init__(self):
+        """
+        Initialize CleanupStats.
+        """
+        self.files_removed: List[str] = []
+        self.dirs_pruned: List[str] = []
+        self.failures: Dict[str, str] = {}
+        self.seconds = 0.0
 
-def cleanup(dir: str, new_files: List[str], exclude: List[str]):
+
+def cleanup(
+    dir: str,
+    new_files: List[str],
+    exclude: List[str],
+    manifest: Optional[Dict[str, Any]] = None,
+    backend: Optional["OutputBackend"] = None,
+    max_workers: Optional[int] = None,
+) -> CleanupStats:
+    start = time.perf_counter()
+    stats = CleanupStats()
     try:
-        manifest_files = get_files_from_manifest(dir)
+        excluded = IgnoreMatcher(exclude)
+        manifest_files = get_files_from_manifest(dir, backend) if manifest is None else manifest.get("files", [])
         if manifest_files:
             # Use `FILE_MANIFEST` to remove files that are no longer managed by pyprojen
-            remove_files(find_orphaned_files(dir, manifest_files, new_files))
-        else:
+            files = find_orphaned_files(dir, manifest_files, new_files, excluded)
+        elif backend is None or isinstance(backend, DiskBackend):
             # Remove all files managed by pyprojen with legacy logic
-            remove_files(find_generated_files(dir, exclude))
+            files = find_generated_files(dir, excluded, max_workers)
+        else:
+            # other backends do not own the files on disk, so they neither scan nor report them
+            files = []
+        remove_files(files, backend, max_workers, stats)
+        prune_empty_dirs(dir, stats.files_removed, backend, stats)
     except Exception as e:
         logging.warning(f"warning: failed to clean up generated files: {str(e)}")
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+
+def remove_files(
+    files: List[str],
+    backend: Optional["OutputBackend"] = None,
+    max_workers: Optional[int] = None,
+    stats: Optional[CleanupStats] = None,
+) -> CleanupStats:
+    stats = stats if stats is not None else CleanupStats()
+
+    def remove_batch(batch: List[str]) -> List[Tuple[str, Optional[str]]]:
+        results = []
+        for file in batch:
+            try:
+                if backend is None:
+                    os.remove(file)
+                else:
+                    backend.remove_file(file)
+                results.append((file, None))
+            except Exception as e:
+                results.append((file, str(e)))
+        return results
+
+    batches = [files[i : i + REMOVE_BATCH_SIZE] for i in range(0, len(files), REMOVE_BATCH_SIZE)]
+    if not max_workers or max_workers <= 1 or len(batches) <= 1:
+        results = [remove_batch(batch) for batch in batches]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+            results = list(executor.map(remove_batch, batches))
+
+    for file, error in (result for batch in results for result in batch):
+        if error is None:
+            stats.files_removed.append(file)
+        else:
+            stats.failures[file] = error
+            logging.warning(f"Failed to remove file {file}: {error}")
+    return stats
+
+
+def prune_empty_dirs(
+    dir: str,
+    removed_files: List[str],
+    backend: Optional["OutputBackend"] = None,
+    stats: Optional[CleanupStats] = None,
+) -> CleanupStats:
+    # remove the directories below `dir` that became empty, deepest first; `dir` itself is kept
+    stats = stats if stats is not None else CleanupStats()
+    root = os.path.abspath(dir)
+    candidates: Set[str] = set()
+    for file in removed_files:
+        parent = os.path.dirname(os.path.abspath(file))
+        while parent != root and parent.startswith(root + os.sep) and parent not in candidates:
+            candidates.add(parent)
+            parent = os.path.dirname(parent)
+
+    # children before their parents, so a parent is only tried once its children are gone
+    for candidate in sorted(candidates, key=lambda d: d.count(os.sep), reverse=True):
+        if backend is not None:
+            pruned = backend.prune_dir(candidate)
+        else:
+            try:
+                os.rmdir(candidate)
+                pruned = True
+            except OSError:
+                pruned = False
+        if pruned:
+            stats.dirs_pruned.append(candidate)
+    return stats
+
+
+def find_orphaned_files(
+    dir: str,
+    old_files: List[str],
+    new_files: List[str],
+    exclude: Optional[IgnoreMatcher] = None,
+) -> List[str]:
+    orphaned = set(old_files).difference(new_files)
+    return [os.path.join(dir, f) for f in sorted(orphaned) if exclude is None or not exclude.is_ignored(f)]
+
+
+def find_generated_files(dir: str, exclude: IgnoreMatcher, max_workers: Optional[int] = None) -> List[str]:
+    candidates = list(_walk_files(dir, exclude))
+    batches = [candidates[i : i + SCAN_BATCH_SIZE] for i in range(0, len(candidates), SCAN_BATCH_SIZE)]
 
+    def scan_batch(batch: List[str]) -> List[str]:
+        return [file for file in batch if _is_generated(file)]
 
-def remove_files(files: List[str]):
-    for file in files:
+    if len(batches) <= 1 or max_workers == 1:
+        results = [scan_batch(batch) for batch in batches]
+    else:
+        # reading is I/O bound, so this uses a thread pool even for a serial synth
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(scan_batch, batches))
+    return sorted(file for batch in results for file in batch)
+
+
+def _walk_files(dir: str, exclude: IgnoreMatcher) -> Iterator[str]:
+    # iterative os.scandir walk that does not follow symlinks, and prunes skipped and excluded directories
+    stack = [("", dir)]
+    while stack:
+        relative_dir, absolute_dir = stack.pop()
         try:
-            os.remove(file)
-        except Exception as e:
-            logging.warning(f"Failed to remove file {file}: {str(e)}")
+            entries = list(os.scandir(absolute_dir))
+        except OSError:
+            continue
+        for entry in entries:
+            relative = f"{relative_dir}{entry.name}"
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if (
+                        entry.name not in SCAN_SKIPPED_DIRS
+                        and not exclude.is_ignored(relative, is_dir=True)
+                        and not os.path.exists(os.path.join(entry.path, "pyvenv.cfg"))
+                    ):
+                        stack.append((relative + "/", entry.path))
+                elif entry.is_file(follow_symlinks=False) and not exclude.is_ignored(relative):
+                    yield entry.path
+            except OSError:
+                continue
 
 
-def find_orphaned_files(dir: str, old_files: List[str], new_files: List[str]) -> List[str]:
-    return [os.path.join(dir, f) for f in old_files if f not in new_files]
+def _is_generated(file: str) -> bool:
+    # only readonly files with the marker where pyprojen writes it, so files that merely contain the marker
+    # text (e.g. tests of pyprojen) or that were made writable to be edited by hand are left alone
+    try:
+        with open(file, "rb") as f:
+            st = os.fstat(f.fileno())
+            if st.st_mode & stat.S_IWUSR:
+                return False
+            head = f.read(MARKER_SCAN_BYTES)
+            if head.split(b"\n", 1)[0].rstrip(b"\r") in MARKER_LINES:
+                return True
+            if not head.startswith(b"{"):
+                return False
+            f.seek(max(0, st.st_size - MARKER_SCAN_BYTES))
+            tail = f.read().rstrip().splitlines()
+            return len(tail) >= 2 and tail[-1].rstrip() == b"}" and tail[-2].rstrip() == MARKER_KEY_LINE
+    except OSError:
+        return False
 
 
-def find_generated_files(dir: str, exclude: List[str]) -> List[str]:
-    # Implement this function to find generated files based on a marker
-    # This is a placeholder and should be implemented based on your specific needs
-    return []
+def get_files_from_manifest(dir: str, backend: Optional["OutputBackend"] = None) -> List[str]:
+    return read_manifest(dir, backend).get("files", [])
 
 
-def get_files_from_manifest(dir: str) -> List[str]:
+def read_manifest(dir: str, backend: Optional["OutputBackend"] = None) -> Dict[str, Any]:
     try:
-        manifest_path = os.path.join(dir, FILE_MANIFEST)
-        if os.path.exists(manifest_path):
-            with open(manifest_path, "r") as f:
-                manifest = json.load(f)
-            if "files" in manifest:
-                return manifest["files"]
+        return _read_json_object(os.path.join(dir, FILE_MANIFEST), backend)
     except Exception as e:
         logging.warning(f"warning: unable to get files to clean from file manifest: {str(e)}")
-    return []
+    return {}
+
+
+def read_file_state(dir: str, backend: Optional["OutputBackend"] = None) -> Dict[str, Any]:
+    # the state is only a cache, so a missing or broken one just means that files are compared by content
+    try:
+        return _read_json_object(os.path.join(dir, FILE_STATE), backend)
+    except Exception:
+        return {}
+
+
+def _read_json_object(path: str, backend: Optional["OutputBackend"]) -> Dict[str, Any]:
+    if backend is not None:
+        content = backend.read(path)
+        obj = json.loads(content) if content is not None else None
+    elif os.path.exists(path):
+        with open(path, "r") as f:
+            obj = json.load(f)
+    else:
+        obj = None
+    return obj if isinstance(obj, dict) else {}
@@ -0,0 +1,61 @@
+"""Command line interface for pyprojen, e.g. `python -m pyprojen watch`."""
+import argparse
+import os
+import sys
+from typing import (
+    List,
+    Optional,
+)
+
+from pyprojen.check import run_check
+from pyprojen.watch import (
+    DEFAULT_RC_FILE,
+    create_watcher,
+    watch,
+)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Run the pyprojen command line interface.
+
+    :param argv: The command line arguments, defaults to `sys.argv[1:]`
+    :return: The exit code
+    """
+    parser = argparse.ArgumentParser(prog="pyprojen")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    watch_parser = subparsers.add_parser(
+        "watch", help="re-synthesize whenever the config or a local module it imports changes"
+    )
+    watch_parser.add_argument("rc_file", nargs="?", default=DEFAULT_RC_FILE, help="the config script to run")
+    watch_parser.add_argument("--poll", action="store_true", help="poll for changes instead of using inotify")
+    watch_parser.add_argument("--interval", type=float, default=0.5, help="seconds between polls")
+
+    check_parser = subparsers.add_parser(
+        "check", help="verify that the generated files are up to date, without writing anything"
+    )
+    check_parser.add_argument("rc_file", nargs="?", default=DEFAULT_RC_FILE, help="the config script to run")
+    check_parser.add_argument(
+        "--workers", type=int, default=os.cpu_count(), help="number of threads to compare files with"
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.command == "watch":
+        try:
+            watch(args.rc_file, create_watcher(poll=args.poll, interval=args.interval))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    if args.command == "check":
+        report = run_check(args.rc_file, args.workers)
+        if report.up_to_date:
+            print("all generated files are up to date")
+            return 0
+        print(report.format(), file=sys.stderr)
+        print(f"generated files are out of date, run 'python {args.rc_file}' to update them", file=sys.stderr)
+        return 1
+
+    return 1
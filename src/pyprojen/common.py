@@ -3,3 +3,14 @@ Common constants and utilities for pyprojen.
 """
 
 FILE_MANIFEST = ".pyprojen/files.json"
+
+# the size, mtime and digest of each file as last written; they differ between checkouts, so it is not committed
+FILE_STATE = ".pyprojen/cache/files.json"
+
+# included in the marker of every generated file, and looked for when cleaning up projects without a manifest
+PYPROJEN_MARKER = "Generated by pyprojen"
+
+# the marker line of generated files, see `FileBase.marker`
+GENERATED_FILE_MARKER = (
+    f"DO NOT EDIT. {PYPROJEN_MARKER}. To modify, edit .pyprojenrc.py and run 'python .pyprojenrc.py'."
+)
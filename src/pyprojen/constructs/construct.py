@@ -7,10 +7,15 @@ from abc import (
 from enum import Enum
 from typing import (
     Any,
+    Callable,
     Dict,
+    Iterator,
     List,
     Optional,
     Set,
+    Tuple,
+    Type,
+    TypeVar,
     Union,
 )
 
@@ -21,6 +26,8 @@ from .dependency import (
 
 CONSTRUCT_SYM = "constructs.Construct"
 
+T = TypeVar("T")
+
 
 class IConstruct(IDependable):
     """Interface for constructs."""
@@ -90,7 +97,7 @@ class Node:
         :param id: The ID
         """
         self._host = host
-        self.scope = scope
+        self._scope = scope
         self.id = self._sanitize_id(id or "")
         self._children: Dict[str, IConstruct] = {}
         self._context: Dict[str, Any] = {}
@@ -101,12 +108,50 @@ class Node:
         self._addr: Optional[str] = None
         self._locked = False
 
+        # ancestry caches, computed on first use and dropped if the tree changes shape
+        self._scopes: Optional[Tuple[IConstruct, ...]] = None
+        self._path: Optional[str] = None
+        self._closest: Dict[Callable[[Any], bool], Optional[IConstruct]] = {}
+
         if scope and not self.id:
             raise ValueError("Only root constructs may have an empty ID")
 
         if scope:
             scope.node._add_child(host, self.id)
 
+    @property
+    def scope(self) -> Optional[IConstruct]:
+        """
+        The parent scope of this construct.
+
+        :return: The parent scope, or None for the root
+        """
+        return self._scope
+
+    @scope.setter
+    def scope(self, scope: Optional[IConstruct]):
+        """
+        Re-parent this construct: moves it from the children of its old scope to those of the new one, and
+        invalidates the ancestry caches of this node and its descendants.
+
+        :param scope: The new parent scope
+        :raises ValueError: If the new scope already has a child with the ID of this construct
+        """
+        if scope is self._scope:
+            return
+        if scope is not None:
+            scope.node._add_child(self._host, self.id)
+        if self._scope is not None:
+            del self._scope.node._children[self.id]
+        self._scope = scope
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            node._scopes = None
+            node._path = None
+            node._closest = {}
+            stack.extend(child.node for child in node._children.values())
+
     @property
     def path(self) -> str:
         """
@@ -114,22 +159,30 @@ class Node:
 
         :return: The path
         """
-        components = [scope.node.id for scope in self.scopes if scope.node.id]
-        return self.PATH_SEP.join(components)
+        if self._path is None:
+            components = [scope.node.id for scope in self.scopes if scope.node.id]
+            self._path = self.PATH_SEP.join(components)
+        return self._path
+
+    @property
+    def scopes(self) -> Tuple[IConstruct, ...]:
+        """
+        All parent scopes of this construct, from the root down to (and including) this construct.
+
+        :return: Tuple of parent scopes
+        """
+        if self._scopes is None:
+            self._scopes = self._compute_scopes()
+        return self._scopes
 
     @property
-    def scopes(self) -> List[IConstruct]:
+    def depth(self) -> int:
         """
-        All parent scopes of this construct.
+        The number of ancestors of this construct. The root has a depth of 0.
 
-        :return: List of parent scopes
+        :return: The depth
         """
-        ret = []
-        curr: Optional[IConstruct] = self._host
-        while curr:
-            ret.insert(0, curr)
-            curr = curr.node.scope
-        return ret
+        return len(self.scopes) - 1
 
     @property
     def root(self) -> IConstruct:
@@ -140,6 +193,51 @@ class Node:
         """
         return self.scopes[0]
 
+    def find_closest(self, predicate: Callable[[Any], bool]) -> Optional[IConstruct]:
+        """
+        Returns the closest scope (including this construct) that matches the predicate.
+
+        Results are cached per predicate, so the predicate must be a stable, side-effect free function.
+
+        :param predicate: The predicate to match
+        :return: The closest matching scope, or None
+        """
+        if predicate not in self._closest:
+            # walk up until an ancestor has a cached answer, then fill in the caches on the way back down
+            pending: List["Node"] = []
+            node: Optional["Node"] = self
+            found: Optional[IConstruct] = None
+            while node is not None:
+                if predicate in node._closest:
+                    found = node._closest[predicate]
+                    break
+                if predicate(node._host):
+                    found = node._host
+                    node._closest[predicate] = found
+                    break
+                pending.append(node)
+                node = node.scope.node if node.scope else None
+            for n in pending:
+                n._closest[predicate] = found
+        return self._closest[predicate]
+
+    def _compute_scopes(self) -> Tuple[IConstruct, ...]:
+        """
+        Build the ancestor chain, reusing the cached chain of the nearest cached ancestor.
+
+        :return: Tuple of scopes from the root to this construct
+        """
+        pending: List["Node"] = []
+        node: Optional["Node"] = self
+        while node is not None and node._scopes is None:
+            pending.append(node)
+            node = node.scope.node if node.scope else None
+        scopes: Tuple[IConstruct, ...] = node._scopes if node is not None else ()
+        for n in reversed(pending):
+            scopes = scopes + (n._host,)
+            n._scopes = scopes
+        return scopes
+
     @property
     def children(self) -> List[IConstruct]:
         """
@@ -228,16 +326,69 @@ class Node:
                 hash_object.update(b"\n")
         return "c8" + hash_object.hexdigest()
 
-    def find_all(self) -> List[IConstruct]:
+    def find_all(self, order: ConstructOrder = ConstructOrder.PREORDER) -> Iterator[IConstruct]:
+        """
+        Lazily yields all constructs in the tree, including this node's host and all its descendants.
+
+        :param order: Whether to yield parents before (PREORDER) or after (POSTORDER) their children
+        :return: Iterator over all constructs
+        """
+        return self._walk(order)
+
+    def find_all_matching(
+        self,
+        predicate: Callable[[IConstruct], bool],
+        order: ConstructOrder = ConstructOrder.PREORDER,
+        descend: Optional[Callable[[IConstruct], bool]] = None,
+    ) -> Iterator[IConstruct]:
+        """
+        Lazily yields the constructs in the tree that match a predicate.
+
+        :param predicate: Only constructs for which this returns True are yielded
+        :param order: Whether to yield parents before (PREORDER) or after (POSTORDER) their children
+        :param descend: If given, the children of a descendant are only visited when this returns True for it
+        :return: Iterator over the matching constructs
+        """
+        return (c for c in self._walk(order, descend) if predicate(c))
+
+    def find_all_of_type(
+        self,
+        construct_type: Type[T],
+        order: ConstructOrder = ConstructOrder.PREORDER,
+    ) -> Iterator[T]:
+        """
+        Lazily yields the constructs in the tree that are instances of the given type.
+
+        :param construct_type: The type to look for
+        :param order: Whether to yield parents before (PREORDER) or after (POSTORDER) their children
+        :return: Iterator over the matching constructs
+        """
+        return (c for c in self._walk(order) if isinstance(c, construct_type))
+
+    def _walk(
+        self,
+        order: ConstructOrder,
+        descend: Optional[Callable[[IConstruct], bool]] = None,
+    ) -> Iterator[IConstruct]:
         """
-        Returns a list of all constructs in the tree, including this node's host and all its descendants.
+        Iterative depth-first traversal of the tree, so deep trees do not hit the recursion limit.
 
-        :return: List of all constructs
+        :param order: Whether to yield parents before (PREORDER) or after (POSTORDER) their children
+        :param descend: If given, the children of a descendant are only visited when this returns True for it
+        :return: Iterator over the visited constructs
         """
-        result = [self._host]
-        for child in self._children.values():
-            result.extend(child.node.find_all())
-        return result
+        stack = [(self._host, False)]
+        while stack:
+            construct, expanded = stack.pop()
+            if expanded:
+                yield construct
+                continue
+            if order == ConstructOrder.PREORDER:
+                yield construct
+            else:
+                stack.append((construct, True))
+            if descend is None or construct is self._host or descend(construct):
+                stack.extend((child, False) for child in reversed(construct.node._children.values()))
 
     def try_find_child(self, id: str) -> Optional[IConstruct]:
         """
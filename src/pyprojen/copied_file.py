@@ -0,0 +1,196 @@
+import os
+import stat
+from typing import (
+    List,
+    Optional,
+    Tuple,
+)
+
+from pyprojen.component import Component
+from pyprojen.constructs import Construct
+from pyprojen.file import (
+    FileBase,
+    IResolver,
+)
+from pyprojen.output_backend import OutputBackend
+from pyprojen.util import file_digest
+from pyprojen.util.ignore import IgnoreMatcher
+
+
+class CopiedFile(FileBase):
+    """
+    Represents a copy of a file from the local filesystem, e.g. an asset of a project template.
+
+    The file is copied by the kernel, without reading it into Python, and only if the existing copy differs.
+    """
+
+    def __init__(
+        self,
+        scope: Construct,
+        file_path: str,
+        source: str,
+        committed: Optional[bool] = None,
+        edit_gitignore: bool = True,
+        readonly: bool = True,
+        executable: Optional[bool] = None,
+    ):
+        """
+        Initialize a CopiedFile.
+
+        :param scope: The scope in which to define this file
+        :param file_path: The file path
+        :param source: The path of the file to copy, relative to the working directory if not absolute
+        :param committed: Whether the file should be committed
+        :param edit_gitignore: Whether to edit .gitignore
+        :param readonly: Whether the file should be readonly
+        :param executable: Whether the file should be executable, defaults to whether the source is
+        :raises FileNotFoundError: If the source does not exist
+        """
+        source = os.path.abspath(source)
+        if executable is None:
+            executable = bool(os.stat(source).st_mode & stat.S_IXUSR)
+        super().__init__(
+            scope,
+            file_path,
+            committed=committed,
+            edit_gitignore=edit_gitignore,
+            readonly=readonly,
+            executable=executable,
+            marker=False,
+        )
+        self.source = source
+
+    def synthesize_content(self, resolver: IResolver) -> Optional[bytes]:
+        """
+        The content of the source file. Not used by `synthesize`, which copies the file without reading it.
+
+        :param resolver: The resolver to use
+        :return: The content of the source file
+        """
+        with open(self.source, "rb") as f:
+            return f.read()
+
+    def synthesize(self):
+        """
+        Copy the source file, unless the existing file is already a copy of it.
+        """
+        file_path = os.path.join(self.project.outdir, self.path)
+        backend = self._output_backend()
+        source_stat = os.stat(self.source)
+
+        prev_stat = backend.stat(file_path)
+        up_to_date, digest = (
+            self._is_copy_up_to_date(backend, file_path, prev_stat, source_stat)
+            if prev_stat is not None
+            else (False, None)
+        )
+        if up_to_date:
+            print(f"no change in {file_path}")
+            self._changed = False
+        else:
+            prev_stat = backend.copy(self.source, file_path, readonly=bool(self.readonly), executable=self.executable)
+            self._changed = True
+
+        self._manifest_entry = {"size": prev_stat.st_size, "mtime": prev_stat.st_mtime_ns}
+        if digest is not None:
+            self._manifest_entry["sha256"] = digest
+        self._dirty = False
+
+    def synthesize_if_changed(self):
+        """
+        Synthesize the file. The source may have changed without marking the file dirty, and checking
+        whether it did is what `synthesize` does.
+        """
+        self.synthesize()
+
+    def _is_copy_up_to_date(
+        self,
+        backend: OutputBackend,
+        file_path: str,
+        prev_stat: os.stat_result,
+        source_stat: os.stat_result,
+    ) -> Tuple[bool, Optional[str]]:
+        """
+        Whether the existing file is already a copy of the source, with the right permissions.
+
+        Copies keep the mtime of their source, so a file with the size and mtime of the source is not read.
+        Otherwise a file of the same size is compared by digest, reusing the digest the previous synth
+        recorded if the file was not touched since.
+
+        :param backend: The output backend
+        :param file_path: The path of the existing file
+        :param prev_stat: The stat of the existing file
+        :param source_stat: The stat of the source
+        :return: Whether the file does not need to be copied, and its digest, if known
+        """
+        prev_readonly = not prev_stat.st_mode & stat.S_IWUSR
+        if prev_readonly != bool(self.readonly) or prev_stat.st_size != source_stat.st_size:
+            return False, None
+
+        entry = self.project._previous_manifest_entry(self)
+        recorded = (
+            entry.get("sha256")
+            if entry is not None
+            and entry.get("size") == prev_stat.st_size
+            and entry.get("mtime") == prev_stat.st_mtime_ns
+            else None
+        )
+        if prev_stat.st_mtime_ns == source_stat.st_mtime_ns:
+            return True, recorded
+
+        digest = file_digest(self.source)
+        existing = recorded if recorded is not None else backend.digest(file_path)
+        return existing == digest, digest
+
+
+class CopiedDirectory(Component):
+    """
+    Copies the files of a directory from the local filesystem, e.g. a project template.
+
+    Each file becomes a `CopiedFile` of the project, so it is only copied if it changed, and removed
+    once it is no longer in the source directory. The files are listed when the component is created.
+    """
+
+    def __init__(
+        self,
+        scope: Construct,
+        dir_path: str,
+        source: str,
+        exclude: Optional[List[str]] = None,
+        committed: Optional[bool] = None,
+        readonly: bool = True,
+    ):
+        """
+        Initialize a CopiedDirectory.
+
+        :param scope: The scope in which to define this component
+        :param dir_path: The path of the copy
+        :param source: The path of the directory to copy, relative to the working directory if not absolute
+        :param exclude: gitignore-style patterns of files not to copy, relative to the source directory
+        :param committed: Whether the files should be committed
+        :param readonly: Whether the files should be readonly
+        :raises FileNotFoundError: If the source directory does not exist
+        """
+        super().__init__(scope)
+        self.source = os.path.abspath(source)
+        if not os.path.isdir(self.source):
+            raise FileNotFoundError(f"{self.source} is not a directory")
+
+        matcher = IgnoreMatcher(exclude or [])
+        self.files: List[CopiedFile] = []
+        for root, dirs, files in os.walk(self.source):
+            relative_root = os.path.relpath(root, self.source)
+            prefix = "" if relative_root == "." else relative_root.replace(os.sep, "/") + "/"
+            dirs[:] = sorted(d for d in dirs if not matcher.is_ignored(prefix + d, is_dir=True))
+            for name in sorted(files):
+                if matcher.is_ignored(prefix + name):
+                    continue
+                self.files.append(
+                    CopiedFile(
+                        self.project,
+                        os.path.join(dir_path, prefix + name),
+                        os.path.join(root, name),
+                        committed=committed,
+                        readonly=readonly,
+                    )
+                )
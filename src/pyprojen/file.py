@@ -1,21 +1,34 @@
 import os
-import shutil
+import stat
+import threading
 from abc import (
     ABC,
     abstractmethod,
 )
 from typing import (
+    IO,
     Any,
+    Callable,
     Dict,
+    List,
     Optional,
+    Tuple,
+    Union,
 )
 
+from pyprojen._resolve import (
+    evaluate,
+    resolve,
+)
+from pyprojen.common import GENERATED_FILE_MARKER
 from pyprojen.component import Component
+from pyprojen.output_backend import (
+    DiskBackend,
+    OutputBackend,
+)
 from pyprojen.util import (
-    is_writable,
+    content_digest,
     normalize_persisted_path,
-    try_read_file_sync,
-    write_file,
 )
 from pyprojen.util.constructs import find_closest_project
 
@@ -34,6 +47,7 @@ class FileBase(Component, ABC):
         readonly: bool = True,
         executable: bool = False,
         marker: Optional[bool] = None,
+        stream: bool = False,
     ):
         """
         Initialize a FileBase.
@@ -45,6 +59,8 @@ class FileBase(Component, ABC):
         :param readonly: Whether the file should be readonly
         :param executable: Whether the file should be executable
         :param marker: Whether to add a marker to the file
+        :param stream: Whether to write the content in chunks while it is synthesized, instead of building
+            it in memory first. For very large files.
         """
         project = find_closest_project(scope)
         root = project.root
@@ -55,18 +71,21 @@ class FileBase(Component, ABC):
         root_project_path = normalize_persisted_path(relative_project_path)
         auto_id = f"{self.__class__.__name__}@{project_path}"
 
-        if root.try_find_file(absolute_path) or scope.node.try_find_child(auto_id):
+        if absolute_path in root._files_by_path or scope.node.try_find_child(auto_id):
             raise ValueError(f"There is already a file under {root_project_path}")
 
         super().__init__(scope, auto_id)
+        self.absolute_path = absolute_path
+        self._root_project_path = root_project_path
+        root._register_file(self)
         self.node.add_metadata("type", "file")
         self.node.add_metadata("path", root_project_path)
 
         self.readonly = not project.ejected and readonly  # Use the ejected property
         self.executable = executable
         self.path = project_path
-        self.absolute_path = absolute_path
         self._should_add_marker = marker if marker is not None else True
+        self.stream = stream
 
         glob_pattern = self.path
         committed = (
@@ -86,6 +105,8 @@ class FileBase(Component, ABC):
             raise ValueError('"gitignore" is disabled, so it does not make sense to specify "committed"')
 
         self._changed = None
+        self._manifest_entry: Optional[Dict[str, Any]] = None
+        self._dirty = True
 
         if self.readonly:
             project._add_to_manifest(self.path)
@@ -99,39 +120,217 @@ class FileBase(Component, ABC):
         """
         if self.project.ejected or not self._should_add_marker:
             return None
-        return f"DO NOT EDIT. Generated by pyprojen. To modify, edit .pyprojenrc.py and run 'python .pyprojenrc.py'."
+        return GENERATED_FILE_MARKER
 
     @abstractmethod
-    def synthesize_content(self, resolver: "IResolver") -> Optional[str]:
+    def synthesize_content(self, resolver: "IResolver") -> Optional[Union[str, bytes]]:
         """
         Synthesize the content of the file.
 
         :param resolver: The resolver to use
-        :return: The synthesized content or None
+        :return: The synthesized content, as bytes for binary files, or None
+        """
+
+    def synthesize_stream(self, resolver: "IResolver", out: IO[str]) -> bool:
         """
+        Synthesize the content of the file into a text stream. Used instead of `synthesize_content` if
+        `stream` is set. By default, writes the content synthesized by `synthesize_content` in one go.
+
+        :param resolver: The resolver to use
+        :param out: The stream to write the content to
+        :return: False if the file has no content and should be removed
+        """
+        content = self.synthesize_content(resolver)
+        if content is None:
+            return False
+        out.write(content)
+        return True
 
     def synthesize(self):
         """
         Synthesize the file.
         """
+        resolver = self._resolver()
+        if self.stream:
+            self._write_stream(lambda out: self.synthesize_stream(resolver, out))
+        else:
+            self._write_content(self.synthesize_content(resolver))
+
+    def _write_content(self, content: Optional[Union[str, bytes]]):
+        """
+        Write the synthesized content to disk, unless the file is already up to date.
+
+        :param content: The synthesized content, text or bytes, or None to remove the file
+        """
         outdir = self.project.outdir
         file_path = os.path.join(outdir, self.path)
-        resolver = IResolver()
-        content = self.synthesize_content(resolver)
+        backend = self._output_backend()
 
         if content is None:
-            shutil.rmtree(file_path, ignore_errors=True)
+            backend.remove(file_path)
+            self._manifest_entry = None
+            self._dirty = False
             return
 
-        prev = try_read_file_sync(file_path)
-        prev_readonly = not is_writable(file_path)
-        if prev is not None and content == prev and prev_readonly == self.readonly:
+        digest = content_digest(content)
+        prev_stat = backend.stat(file_path)
+        if prev_stat is not None and self._is_up_to_date(backend, file_path, prev_stat, content, digest):
             print(f"no change in {file_path}")
             self._changed = False
+        else:
+            prev_stat = backend.write(file_path, content, readonly=bool(self.readonly), executable=self.executable)
+            self._changed = True
+
+        self._manifest_entry = {"size": prev_stat.st_size, "mtime": prev_stat.st_mtime_ns, "sha256": digest}
+        self._dirty = False
+
+    def _write_stream(self, produce: Callable[[IO[str]], bool]):
+        """
+        Write the content to a pending file while it is produced, and keep the existing file instead if it
+        turns out to have the same digest. Only the digests are compared, so neither the new nor the old
+        content is held in memory.
+
+        :param produce: Writes the content to the given stream, and returns False if there is none
+        """
+        file_path = os.path.join(self.project.outdir, self.path)
+        backend = self._output_backend()
+
+        pending = backend.open_write(file_path, readonly=bool(self.readonly), executable=self.executable)
+        try:
+            has_content = produce(pending)
+            digest = pending.digest if has_content else None
+            prev_stat = backend.stat(file_path)
+            unchanged = prev_stat is not None and has_content
+            if unchanged and self._is_up_to_date(backend, file_path, prev_stat, None, digest, pending.size):
+                pending.discard()
+                print(f"no change in {file_path}")
+                self._changed = False
+            elif has_content:
+                prev_stat = pending.commit()
+                self._changed = True
+            else:
+                pending.discard()
+        except BaseException:
+            pending.discard()
+            raise
+
+        if not has_content:
+            backend.remove(file_path)
+            self._manifest_entry = None
+        else:
+            self._manifest_entry = {"size": prev_stat.st_size, "mtime": prev_stat.st_mtime_ns, "sha256": digest}
+        self._dirty = False
+
+    def synthesize_if_changed(self):
+        """
+        Synthesize the file only if it was modified since it was last synthesized by this process.
+
+        Used by `Project.synth(incremental=True)`. A file is re-synthesized if it was marked dirty,
+        if it was never written, or if its output was touched on disk since it was written. Otherwise its
+        content is synthesized again, since lazy values may change without marking the file dirty, and
+        only written if its digest differs. Streamed files are not digested up front, so they are
+        synthesized again.
+        """
+        if self._dirty or self.stream or not self._output_unchanged():
+            self.synthesize()
+            return
+
+        content = self.synthesize_content(self._resolver())
+        if content is not None and content_digest(content) == self._manifest_entry.get("sha256"):
+            self._changed = False
             return
 
-        write_file(file_path, content, options={"readonly": self.readonly, "executable": self.executable})
-        self._changed = True
+        self._write_content(content)
+
+    def mark_dirty(self):
+        """
+        Mark the file as modified, so it is re-synthesized by the next incremental synth.
+        """
+        self._dirty = True
+
+    @property
+    def dirty(self) -> bool:
+        """
+        Whether the file was modified since it was last synthesized.
+
+        :return: True if the file needs to be synthesized again
+        """
+        return self._dirty
+
+    def _output_unchanged(self) -> bool:
+        """
+        Whether the output file still has the size and mtime recorded when it was last synthesized.
+
+        :return: True if the output was written by this process and not touched since
+        """
+        entry = self._manifest_entry
+        if entry is None:
+            return False
+        prev_stat = self._output_backend().stat(os.path.join(self.project.outdir, self.path))
+        return prev_stat is not None and prev_stat.st_size == entry["size"] and prev_stat.st_mtime_ns == entry["mtime"]
+
+    def _resolver(self) -> "SynthResolver":
+        """
+        The resolver of the synth in progress, or a new one if the file is synthesized on its own.
+
+        :return: The resolver
+        """
+        return self.project._find_resolver() or SynthResolver()
+
+    def _output_backend(self) -> OutputBackend:
+        """
+        The backend of the synth in progress, or the local filesystem if the file is synthesized on its own.
+
+        :return: The output backend
+        """
+        return self.project._find_backend() or DiskBackend()
+
+    def _is_up_to_date(
+        self,
+        backend: OutputBackend,
+        file_path: str,
+        prev_stat: os.stat_result,
+        content: Optional[Union[str, bytes]],
+        digest: str,
+        size: Optional[int] = None,
+    ) -> bool:
+        """
+        Whether the existing file already has the synthesized content and permissions.
+
+        If the manifest of the previous synth recorded the same digest, and the file was not touched since
+        (same size and mtime), the file is not read at all. Neither is a file of another size.
+
+        :param backend: The output backend
+        :param file_path: The path of the existing file
+        :param prev_stat: The stat of the existing file
+        :param content: The synthesized content, or None to compare the digest of the existing file instead
+        :param digest: The digest of the synthesized content
+        :param size: The size of the synthesized content in bytes, required if `content` is None
+        :return: True if the file does not need to be written
+        """
+        prev_readonly = not prev_stat.st_mode & stat.S_IWUSR
+        if prev_readonly != bool(self.readonly):
+            return False
+
+        data = None
+        if content is not None:
+            data = content.encode("utf-8") if isinstance(content, str) else content
+            size = len(data)
+        if prev_stat.st_size != size:
+            return False
+
+        entry = self.project._previous_manifest_entry(self)
+        if (
+            entry is not None
+            and entry.get("sha256") == digest
+            and entry.get("size") == prev_stat.st_size
+            and entry.get("mtime") == prev_stat.st_mtime_ns
+        ):
+            return True
+
+        if data is None:
+            return backend.digest(file_path) == digest
+        return backend.content_equals(file_path, data)
 
     @property
     def changed(self) -> Optional[bool]:
@@ -150,13 +349,13 @@ class IResolver:
 
     def resolve(self, value: Any, options: Optional[Dict[str, Any]] = None) -> Any:
         """
-        Resolve a value.
+        Resolve a value, without sharing anything with other calls.
 
         :param value: The value to resolve
-        :param options: Options for resolution
+        :param options: Options for resolution, see `pyprojen._resolve.resolve`
         :return: The resolved value
         """
-        return value
+        return resolve(value, options or {})
 
 
 class ResolveOptions:
@@ -187,3 +386,97 @@ class IResolvable(ABC):
 
         :return: The JSON representation of the object
         """
+
+
+class Lazy(IResolvable):
+    """
+    A value that is only computed when a file needs it, e.g. from the output of a command.
+
+    During a synth, a Lazy is evaluated at most once, by the first file that resolves it, and every
+    file of the synth shares its value. Outside of a synth, it is evaluated whenever it is resolved.
+    """
+
+    def __init__(self, producer: Callable[[], Any], name: Optional[str] = None):
+        """
+        Initialize a Lazy.
+
+        :param producer: Computes the value, which may itself contain lazy values
+        :param name: A name for error messages, defaults to the producer
+        """
+        self.producer = producer
+        self.name = name
+
+    def to_json(self) -> Any:
+        return self.producer()
+
+    def __repr__(self) -> str:
+        return f"Lazy({self.name})" if self.name else f"Lazy({self.producer!r})"
+
+
+class SynthResolver(IResolver):
+    """
+    Resolves the values of all files of one synth, sharing the results between them.
+
+    Lazy values (`Lazy` tokens and other `IResolvable`s, and callables) are evaluated at most once, and
+    containers that several files reference are resolved once. Lazy values are evaluated one at a time,
+    even when files are synthesized on several threads, so a value that needs itself is detected as a
+    cycle instead of a deadlock.
+    """
+
+    def __init__(self):
+        """
+        Initialize a SynthResolver.
+        """
+        self._memo: Dict[Tuple[int, bool], Any] = {}
+        self._values: Dict[int, Tuple[Any, Any]] = {}
+        self._evaluating: List[Any] = []
+        self._lock = threading.RLock()
+
+    def resolve(self, value: Any, options: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        Resolve a value.
+
+        :param value: The value to resolve
+        :param options: Options for resolution, see `pyprojen._resolve.resolve`
+        :return: The resolved value, owned by the caller
+        """
+        return resolve(value, {**(options or {}), "memo": self._memo, "evaluate": self.evaluate})
+
+    def evaluate(self, lazy: Any, args: List[Any]) -> Any:
+        """
+        Evaluate a lazy value, unless it was already evaluated by this resolver.
+
+        :param lazy: The `IResolvable` or callable
+        :param args: Arguments to pass to callables. Values evaluated with arguments are not shared.
+        :return: The value it produces, still to be resolved
+        :raises ValueError: If the value needs itself to be evaluated
+        """
+        if args:
+            return evaluate(lazy, args)
+        entry = self._values.get(id(lazy))
+        if entry is not None:
+            return entry[1]
+
+        with self._lock:
+            entry = self._values.get(id(lazy))
+            if entry is not None:
+                return entry[1]
+            for i, item in enumerate(self._evaluating):
+                if item is lazy:
+                    cycle = self._evaluating[i:] + [lazy]
+                    raise ValueError(f"Cycle between lazy values: {' -> '.join(repr(item) for item in cycle)}")
+            self._evaluating.append(lazy)
+            try:
+                value = evaluate(lazy, args)
+            finally:
+                self._evaluating.pop()
+            # keep the lazy value itself, so its id is not reused during the synth
+            self._values[id(lazy)] = (lazy, value)
+            return value
+
+    def invalidate_containers(self):
+        """
+        Forget the resolved containers, e.g. after hooks that may have modified them. Evaluated lazy
+        values are kept.
+        """
+        self._memo.clear()
@@ -1,7 +1,9 @@
 from typing import (
     TYPE_CHECKING,
+    Dict,
     List,
     Optional,
+    Set,
 )
 
 from pyprojen.file import (
@@ -9,6 +11,7 @@ from pyprojen.file import (
     IResolver,
 )
 from pyprojen.util import normalize_persisted_path
+from pyprojen.util.ignore import IgnoreMatcher
 
 if TYPE_CHECKING:
     from pyprojen.project import Project
@@ -26,7 +29,15 @@ class IgnoreFile(FileBase):
         super().__init__(project, file_path, edit_gitignore=False)
         self.filter_comment_lines = filter_comment_lines
         self.filter_empty_lines = filter_empty_lines
-        self._patterns: List[str] = ignore_patterns.copy() if ignore_patterns else []
+        # patterns in output order, keyed by an insertion sequence number, plus indexes into them, so
+        # that adding a pattern does not scan all previous ones
+        self._next_id = 0
+        self._patterns_by_id: Dict[int, str] = {}
+        self._ids_by_pattern: Dict[str, List[int]] = {}
+        self._ids_by_dir_prefix: Dict[str, Set[int]] = {}
+        self._matcher: Optional[IgnoreMatcher] = None
+        for pattern in ignore_patterns or []:
+            self._append(pattern)
 
     def add_patterns(self, *patterns: str):
         for pattern in patterns:
@@ -40,7 +51,8 @@ class IgnoreFile(FileBase):
                 self._normalize_patterns(pattern)
 
             normalized_pattern = normalize_persisted_path(pattern)
-            self._patterns.append(normalized_pattern)
+            self._append(normalized_pattern)
+        self.mark_dirty()
 
     def _normalize_patterns(self, pattern: str):
         opposite = "!" + pattern[1:] if pattern.startswith("!") else "!" + pattern
@@ -49,11 +61,13 @@ class IgnoreFile(FileBase):
 
         if pattern.endswith("/"):
             prefix = opposite
-            self._patterns = [p for p in self._patterns if not p.startswith(prefix)]
+            for pattern_id in list(self._ids_by_dir_prefix.get(prefix, ())):
+                self._discard(pattern_id)
 
     def remove_patterns(self, *patterns: str):
         for p in patterns:
             self._remove(p)
+        self.mark_dirty()
 
     def exclude(self, *patterns: str):
         return self.add_patterns(*patterns)
@@ -64,16 +78,55 @@ class IgnoreFile(FileBase):
                 pattern = "!" + pattern
             self.add_patterns(pattern)
 
+    def is_ignored(self, path: str, is_dir: bool = False) -> bool:
+        """
+        Whether a path is ignored by the current patterns, with gitignore semantics.
+
+        :param path: The path, relative to the directory of this file, with forward slashes
+        :param is_dir: Whether the path is a directory
+        :return: True if the path is ignored
+        """
+        if self._matcher is None:
+            self._matcher = IgnoreMatcher(self._patterns_by_id.values())
+        return self._matcher.is_ignored(path, is_dir)
+
     def synthesize_content(self, resolver: IResolver) -> Optional[str]:
         lines = []
         if self.marker:
             lines.append(f"# {self.marker}")
-        lines.extend(self._patterns)
+        lines.extend(self._patterns_by_id.values())
         resolved_lines = resolver.resolve(lines)
         return "\n".join(resolved_lines) + "\n"
 
     def _remove(self, value: str):
-        try:
-            self._patterns.remove(value)
-        except ValueError:
-            pass
+        # removes the first occurrence only, like list.remove
+        ids = self._ids_by_pattern.get(value)
+        if ids:
+            self._discard(ids[0])
+
+    def _append(self, pattern: str):
+        pattern_id = self._next_id
+        self._next_id += 1
+        self._matcher = None
+        self._patterns_by_id[pattern_id] = pattern
+        self._ids_by_pattern.setdefault(pattern, []).append(pattern_id)
+        for prefix in self._dir_prefixes(pattern):
+            self._ids_by_dir_prefix.setdefault(prefix, set()).add(pattern_id)
+
+    def _discard(self, pattern_id: int):
+        pattern = self._patterns_by_id.pop(pattern_id)
+        self._matcher = None
+        ids = self._ids_by_pattern[pattern]
+        ids.remove(pattern_id)
+        if not ids:
+            del self._ids_by_pattern[pattern]
+        for prefix in self._dir_prefixes(pattern):
+            prefixed = self._ids_by_dir_prefix[prefix]
+            prefixed.discard(pattern_id)
+            if not prefixed:
+                del self._ids_by_dir_prefix[prefix]
+
+    @staticmethod
+    def _dir_prefixes(pattern: str) -> List[str]:
+        # the prefixes ending in "/", the only ones a directory pattern can remove by
+        return [pattern[: i + 1] for i, c in enumerate(pattern) if c == "/"]
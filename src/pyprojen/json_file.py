@@ -1,6 +1,8 @@
 import json
 from typing import (
+    IO,
     Any,
+    Dict,
     Optional,
 )
 
@@ -19,31 +21,46 @@ class JsonFile(ObjectFile):
         *,
         committed: bool = True,
         readonly: bool = True,
+        stream: bool = False,
     ):
-        super().__init__(scope, file_path, obj, omit_empty, committed=committed, readonly=readonly)
+        super().__init__(scope, file_path, obj, omit_empty, committed=committed, readonly=readonly, stream=stream)
         self.newline = newline
         self.supports_comments = (
             allow_comments if allow_comments is not None else file_path.lower().endswith(("json5", "jsonc"))
         )
 
-    def synthesize_content(self, resolver: Any) -> Optional[str]:
-        content = super().synthesize_content(resolver)
-        if content is None:
-            return None
+    def serializer_options(self) -> Dict[str, Any]:
+        return {"newline": self.newline, "supports_comments": self.supports_comments}
 
-        json_obj = json.loads(content)
+    @classmethod
+    def render_object(cls, obj: Any, marker: Optional[str], options: Dict[str, Any]) -> str:
+        if marker:
+            if options["supports_comments"]:
+                return f"// {marker}\n{cls.dumps(obj, options)}"
+            else:
+                obj["//"] = marker
+
+        return cls.dumps(obj, options)
 
-        if self.marker:
-            if self.supports_comments:
-                return f"// {self.marker}\n{self.serialize(json_obj)}"
+    @classmethod
+    def render_object_to(cls, obj: Any, marker: Optional[str], options: Dict[str, Any], out: IO[str]):
+        if marker:
+            if options["supports_comments"]:
+                out.write(f"// {marker}\n")
             else:
-                json_obj["//"] = self.marker
-                return self.serialize(json_obj)
+                obj["//"] = marker
 
-        return self.serialize(json_obj)
+        for chunk in json.JSONEncoder(indent=2).iterencode(obj):
+            out.write(chunk)
+        if options["newline"]:
+            out.write("\n")
 
     def serialize(self, obj: Any) -> str:
+        return self.dumps(obj, self.serializer_options())
+
+    @staticmethod
+    def dumps(obj: Any, options: Dict[str, Any]) -> str:
         content = json.dumps(obj, indent=2)
-        if self.newline:
+        if options["newline"]:
             content += "\n"
         return content
@@ -1,10 +1,23 @@
+import copy
+import re
 from enum import Enum
 from typing import (
     Any,
     Dict,
+    Iterable,
+    Optional,
+    Tuple,
 )
 
-import jsonpatch
+from jsonpatch import (
+    InvalidJsonPatch,
+    JsonPatchConflict,
+    JsonPatchTestFailed,
+    JsonPointerException,
+)
+
+# a "~" that does not start one of the two escapes of RFC 6901
+_INVALID_ESCAPE = re.compile(r"~(?![01])")
 
 
 class JsonPatchOperation(Enum):
@@ -19,7 +32,12 @@ class JsonPatchOperation(Enum):
 
 
 class JsonPatch:
-    """Represents a JSON Patch operation."""
+    """
+    Represents a JSON Patch operation.
+
+    Pointers are parsed when the patch is created, so a patch that is applied on every synth does
+    not parse them again. Errors are reported with the exception types of the `jsonpatch` library.
+    """
 
     def __init__(self, operation: str, path: str, value: Any = None, from_: str = None):
         """
@@ -29,12 +47,27 @@ class JsonPatch:
         :param path: The path to apply the operation
         :param value: The value for the operation (if applicable)
         :param from_: The source path for move and copy operations
+        :raises InvalidJsonPatch: If the operation is unknown, or a move or copy has no source path
+        :raises JsonPointerException: If a path is not a valid JSON Pointer
         """
         self.operation = operation
         self.path = path
         self.value = value
         self.from_ = from_
 
+        try:
+            self._op = JsonPatchOperation(operation)
+        except ValueError:
+            raise InvalidJsonPatch(f"unknown operation {operation!r}") from None
+        self._path = _parse_pointer(path)
+        self._from: Optional[Tuple[str, ...]] = None
+        if self._op in (JsonPatchOperation.MOVE, JsonPatchOperation.COPY):
+            if from_ is None:
+                raise InvalidJsonPatch(f"{self._op.value} operation requires a 'from' path")
+            self._from = _parse_pointer(from_)
+        if self._path[-1:] == ("-",) and self._op in (JsonPatchOperation.REPLACE, JsonPatchOperation.TEST):
+            raise InvalidJsonPatch(f"'path' with '-' can't be applied to '{self._op.value}' operation")
+
     @staticmethod
     def add(path: str, value: Any) -> "JsonPatch":
         """
@@ -116,11 +149,220 @@ class JsonPatch:
     @staticmethod
     def apply(obj: Any, *patches: "JsonPatch") -> Any:
         """
-        Apply JSON Patch operations to an object.
+        Apply JSON Patch operations to a copy of an object.
 
-        :param obj: The object to patch
+        :param obj: The object to patch, which is left unchanged
         :param patches: The patches to apply
         :return: The patched object
         """
-        patch_list = [patch.to_dict() for patch in patches]
-        return jsonpatch.apply_patch(obj, patch_list)
+        return JsonPatch.apply_in_place(copy.deepcopy(obj), patches)
+
+    @staticmethod
+    def apply_in_place(obj: Any, patches: Iterable["JsonPatch"]) -> Any:
+        """
+        Apply JSON Patch operations to an object in one pass, modifying it instead of copying it.
+
+        Values taken from the patches are copied into the object, so the patches can be applied again.
+
+        :param obj: The object to patch
+        :param patches: The patches to apply, in order
+        :return: The patched object, which is a different object only if a patch replaced the root
+        """
+        for patch in patches:
+            obj = patch._apply(obj)
+        return obj
+
+    def _apply(self, doc: Any) -> Any:
+        """
+        Apply this patch in place.
+
+        :param doc: The document
+        :return: The document, or its replacement if the patch targets the root
+        """
+        op = self._op
+        if op is JsonPatchOperation.ADD:
+            return _add(doc, self._path, _copy_value(self.value))
+
+        if op is JsonPatchOperation.REMOVE:
+            _remove(doc, self._path)
+            return doc
+
+        if op is JsonPatchOperation.REPLACE:
+            if not self._path:
+                return _copy_value(self.value)
+            parent, key = _parent(doc, self._path)
+            if isinstance(parent, dict):
+                if key not in parent:
+                    raise JsonPatchConflict(f"can't replace a non-existent object {key!r}")
+            elif isinstance(parent, list):
+                key = _list_index(key)
+                if key >= len(parent):
+                    raise JsonPatchConflict("can't replace outside of list")
+            else:
+                raise JsonPatchConflict(f"can't replace {key!r} in a {type(parent).__name__}")
+            parent[key] = _copy_value(self.value)
+            return doc
+
+        if op is JsonPatchOperation.MOVE:
+            try:
+                _get(doc, self._from)
+            except JsonPointerException as e:
+                raise JsonPatchConflict(str(e)) from None
+            if self._from == self._path:
+                return doc
+            if self._path[: len(self._from)] == self._from:
+                raise JsonPatchConflict("Cannot move values into their own children")
+            return _add(doc, self._path, _remove(doc, self._from))
+
+        if op is JsonPatchOperation.COPY:
+            try:
+                value = _get(doc, self._from)
+            except JsonPointerException as e:
+                raise JsonPatchConflict(str(e)) from None
+            return _add(doc, self._path, _copy_value(value))
+
+        try:
+            value = _get(doc, self._path)
+        except JsonPointerException as e:
+            raise JsonPatchTestFailed(str(e)) from None
+        if value != self.value:
+            raise JsonPatchTestFailed(
+                f"{value!r} ({type(value).__name__}) is not equal to tested value {self.value!r}"
+            )
+        return doc
+
+
+def _parse_pointer(pointer: str) -> Tuple[str, ...]:
+    """
+    Parse a JSON Pointer (RFC 6901) into its unescaped reference tokens.
+
+    :param pointer: The pointer
+    :return: The tokens, empty for the whole document
+    :raises JsonPointerException: If the pointer is not valid
+    """
+    if not isinstance(pointer, str):
+        raise JsonPointerException(f"location must be a string, got {pointer!r}")
+    if pointer == "":
+        return ()
+    if not pointer.startswith("/"):
+        raise JsonPointerException(f"location must start with /: {pointer!r}")
+    if _INVALID_ESCAPE.search(pointer):
+        raise JsonPointerException(f"found invalid escape sequence in {pointer!r}")
+    return tuple(token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/"))
+
+
+def _list_index(token: str) -> int:
+    """
+    Convert a reference token into an array index.
+
+    :param token: The token
+    :return: The index
+    :raises JsonPointerException: If the token is not a canonical non-negative integer
+    """
+    if not (token.isascii() and token.isdigit()) or (token[0] == "0" and len(token) > 1):
+        raise JsonPointerException(f"{token!r} is not a valid sequence index")
+    return int(token)
+
+
+def _get(doc: Any, tokens: Tuple[str, ...]) -> Any:
+    """
+    Get the value a pointer refers to.
+
+    :param doc: The document
+    :param tokens: The parsed pointer
+    :return: The value
+    :raises JsonPointerException: If there is no such value
+    """
+    for token in tokens:
+        if isinstance(doc, dict):
+            try:
+                doc = doc[token]
+            except KeyError:
+                raise JsonPointerException(f"member {token!r} not found in {doc}") from None
+        elif isinstance(doc, list):
+            index = _list_index(token)
+            if index >= len(doc):
+                raise JsonPointerException(f"index {token!r} is out of bounds")
+            doc = doc[index]
+        else:
+            raise JsonPointerException(f"can't resolve {token!r} in a {type(doc).__name__}")
+    return doc
+
+
+def _parent(doc: Any, tokens: Tuple[str, ...]) -> Tuple[Any, str]:
+    """
+    Get the container a pointer refers into.
+
+    :param doc: The document
+    :param tokens: The parsed pointer, not empty
+    :return: The container and the last token
+    """
+    return _get(doc, tokens[:-1]), tokens[-1]
+
+
+def _add(doc: Any, tokens: Tuple[str, ...], value: Any) -> Any:
+    """
+    Add a value, replacing an existing member of an object or inserting into an array.
+
+    :param doc: The document
+    :param tokens: The parsed pointer
+    :param value: The value, which is added as is
+    :return: The document, or the value if the pointer refers to the root
+    """
+    if not tokens:
+        return value
+    parent, key = _parent(doc, tokens)
+    if isinstance(parent, dict):
+        parent[key] = value
+    elif isinstance(parent, list):
+        if key == "-":
+            parent.append(value)
+        else:
+            index = _list_index(key)
+            if index > len(parent):
+                raise JsonPatchConflict("can't insert outside of list")
+            parent.insert(index, value)
+    else:
+        raise JsonPatchConflict(f"can't add {key!r} to a {type(parent).__name__}")
+    return doc
+
+
+def _remove(doc: Any, tokens: Tuple[str, ...]) -> Any:
+    """
+    Remove a value.
+
+    :param doc: The document
+    :param tokens: The parsed pointer
+    :return: The removed value
+    :raises JsonPatchConflict: If there is no such value
+    """
+    if not tokens:
+        raise JsonPatchConflict("can't remove the whole document")
+    parent, key = _parent(doc, tokens)
+    if isinstance(parent, dict):
+        if key not in parent:
+            raise JsonPatchConflict(f"can't remove a non-existent object {key!r}")
+        return parent.pop(key)
+    if isinstance(parent, list):
+        index = _list_index(key)
+        if index >= len(parent):
+            raise JsonPatchConflict(f"can't remove a non-existent object {key!r}")
+        return parent.pop(index)
+    raise JsonPatchConflict(f"can't remove {key!r} from a {type(parent).__name__}")
+
+
+def _copy_value(value: Any) -> Any:
+    """
+    Copy a value before it is added to a document, so later patches and the serializer can modify
+    the document without changing the patch itself.
+
+    :param value: The value
+    :return: The copy
+    """
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if type(value) is dict:
+        return {k: _copy_value(v) for k, v in value.items()}
+    if type(value) is list:
+        return [_copy_value(v) for v in value]
+    return copy.deepcopy(value)
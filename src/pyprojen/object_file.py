@@ -1,17 +1,77 @@
+import functools
 from abc import ABC
 from typing import (
+    IO,
     Any,
+    Dict,
     List,
     Optional,
+    Tuple,
+    Type,
 )
 
-from pyprojen._resolve import resolve
 from pyprojen.file import (
     FileBase,
     IResolver,
 )
 from pyprojen.json_patch import JsonPatch
-from pyprojen.util import deep_merge
+from pyprojen.render_cache import RenderCache
+from pyprojen.util import (
+    APPEND_KEY,
+    deep_merge,
+)
+
+
+class _OverrideNode(dict):
+    """
+    A node of the override trie of an ObjectFile, keyed by path segment.
+
+    Nodes are created by the file itself. A dict passed as an override value is never a node, so it
+    is copied before overrides are added below it, instead of being modified.
+    """
+
+
+class RenderJob:
+    """
+    A picklable description of how to render an ObjectFile.
+
+    Holds everything that is needed after resolution, so the CPU-bound part of rendering
+    (merging overrides, patching and serializing) can run in another process.
+    """
+
+    def __init__(
+        self,
+        file_type: Type["ObjectFile"],
+        obj: Any,
+        overrides: Dict[str, Any],
+        patches: List[JsonPatch],
+        marker: Optional[str],
+        options: Dict[str, Any],
+    ):
+        """
+        Initialize a RenderJob.
+
+        :param file_type: The ObjectFile subclass that knows how to serialize the object
+        :param obj: The resolved object
+        :param overrides: The raw overrides to merge into the object
+        :param patches: The JSON patches to apply after merging
+        :param marker: The marker to add to the file, if any
+        :param options: Serializer options, see `ObjectFile.serializer_options`
+        """
+        self.file_type = file_type
+        self.obj = obj
+        self.overrides = overrides
+        self.patches = patches
+        self.marker = marker
+        self.options = options
+
+    def render(self) -> Optional[str]:
+        """
+        Render the file content.
+
+        :return: The rendered content, or None if the file should not exist
+        """
+        return self.file_type.render(self)
 
 
 class ObjectFile(FileBase, ABC):
@@ -31,9 +91,12 @@ class ObjectFile(FileBase, ABC):
         """
         super().__init__(scope, file_path, **kwargs)
         self._obj = obj
+        self.mark_dirty()
         self._omit_empty = omit_empty
-        self._raw_overrides = {}
-        self._patch_operations: List[List[JsonPatch]] = []
+        self._raw_overrides = _OverrideNode()
+        self._patch_operations: List[JsonPatch] = []
+        self._render_cacheable = True
+        self._last_render_key: Optional[str] = None
 
     def synthesize_content(self, resolver: IResolver) -> Optional[str]:
         """
@@ -42,19 +105,165 @@ class ObjectFile(FileBase, ABC):
         :param resolver: The resolver to use
         :return: The synthesized content as a string, or None
         """
+        job = self.create_render_job(resolver)
+        if job is None:
+            self._last_render_key = None
+            return None
+
+        cache = self.project.root.render_cache if self._render_cacheable else None
+        return self._render(job, cache.fingerprint(job) if cache is not None else None)
+
+    def synthesize_stream(self, resolver: IResolver, out: IO[str]) -> bool:
+        """
+        Synthesize the content of the object file into a text stream. Streamed files do not go through
+        the render cache, which would hold their content in memory.
+
+        :param resolver: The resolver to use
+        :param out: The stream to write the content to
+        :return: False if the object resolves to nothing
+        """
+        job = self.create_render_job(resolver)
+        return job is not None and self.render_to(job, out)
+
+    def synthesize_if_changed(self):
+        """
+        Synthesize the file only if it was modified since it was last synthesized by this process.
+
+        Besides the checks of `FileBase.synthesize_if_changed`, the object is resolved again, since
+        lazy values (callables and resolvables) may change without marking the file dirty. Streamed
+        files are not fingerprinted, so they are synthesized again.
+        """
+        if self._dirty or self.stream or not self._output_unchanged():
+            self.synthesize()
+            return
+
+        job = self.create_render_job(self._resolver())
+        key = RenderCache.fingerprint(job) if job is not None else None
+        if key is not None and key == self._last_render_key:
+            self._changed = False
+            return
+
+        self._write_content(self._render(job, key) if job is not None else None)
+
+    def _render(self, job: RenderJob, key: Optional[str]) -> Optional[str]:
+        """
+        Render a job, going through the render cache if there is one. Synths that store no state, like
+        dry runs, read the cache but leave it unchanged.
+
+        :param job: The render job
+        :param key: The fingerprint of the job, if known
+        :return: The rendered content
+        """
+        cache = self.project.root.render_cache if self._render_cacheable else None
+        stores_state = self._output_backend().stores_state
+        content = cache.get(key, touch=stores_state) if cache is not None and key is not None else None
+        if content is None:
+            content = job.render()
+            if cache is not None and key is not None and content is not None and stores_state:
+                cache.put(key, content)
+        self._last_render_key = key
+        return content
+
+    def create_render_job(self, resolver: Optional[IResolver] = None) -> Optional[RenderJob]:
+        """
+        Resolve the object and capture everything else needed to render this file.
+
+        :param resolver: The resolver to use, defaults to the one of the synth in progress
+        :return: The render job, or None if the object resolves to nothing
+        """
         obj = self._obj() if callable(self._obj) else self._obj
-        resolved = resolve(obj, {"omit_empty": self._omit_empty})
+        resolved = (resolver or self._resolver()).resolve(obj, {"omit_empty": self._omit_empty})
 
         if resolved is None:
             return None
 
-        deep_merge([resolved, self._raw_overrides], True)
+        return RenderJob(
+            type(self),
+            resolved,
+            self._raw_overrides,
+            self._patch_operations,
+            self.marker,
+            self.serializer_options(),
+        )
+
+    def serializer_options(self) -> Dict[str, Any]:
+        """
+        Picklable options that `render_object` needs to serialize this file.
+
+        :return: The serializer options
+        """
+        return {}
 
-        patched = resolved
-        for patch in self._patch_operations:
-            patched = JsonPatch.apply(patched, patch)
+    @classmethod
+    def render(cls, job: RenderJob) -> Optional[str]:
+        """
+        Merge overrides, apply patches and serialize a render job.
+
+        :param job: The render job
+        :return: The rendered content, or None
+        """
+        deep_merge([job.obj, job.overrides], True)
 
-        return self.serialize(patched) if patched else None
+        # the resolved object is built for this render alone, so it is patched in place
+        patched = JsonPatch.apply_in_place(job.obj, job.patches)
+
+        return cls.render_object(patched, job.marker, job.options) if patched else None
+
+    @classmethod
+    def render_to(cls, job: RenderJob, out: IO[str]) -> bool:
+        """
+        Like `render`, but serializes into a text stream.
+
+        :param job: The render job
+        :param out: The stream to write the content to
+        :return: False if the file should not exist
+        """
+        deep_merge([job.obj, job.overrides], True)
+        patched = JsonPatch.apply_in_place(job.obj, job.patches)
+        if not patched:
+            return False
+        cls.render_object_to(patched, job.marker, job.options, out)
+        return True
+
+    @classmethod
+    def render_object_to(cls, obj: Any, marker: Optional[str], options: Dict[str, Any], out: IO[str]):
+        """
+        Serialize the final object into a text stream. By default, writes the content rendered by
+        `render_object` in one go. Subclasses with an incremental serializer override this.
+
+        :param obj: The merged and patched object, owned by the caller and safe to modify
+        :param marker: The marker to add, if any
+        :param options: The serializer options
+        :param out: The stream to write the content to
+        """
+        out.write(cls.render_object(obj, marker, options))
+
+    @classmethod
+    def render_object(cls, obj: Any, marker: Optional[str], options: Dict[str, Any]) -> str:
+        """
+        Serialize the final object, including the marker. Called exactly once per rendered file.
+
+        :param obj: The merged and patched object, owned by the caller and safe to modify
+        :param marker: The marker to add, if any
+        :param options: The serializer options
+        :return: The file content
+        """
+        raise NotImplementedError("Subclasses must implement this method")
+
+    def renders_out_of_process(self) -> bool:
+        """
+        Whether this file can be rendered from a `RenderJob` in another process.
+
+        Subclasses that customize `synthesize` or `synthesize_content` are always rendered in-process,
+        and so are streamed files.
+
+        :return: True if the file can be rendered in another process
+        """
+        return (
+            not self.stream
+            and type(self).synthesize is ObjectFile.synthesize
+            and type(self).synthesize_content is ObjectFile.synthesize_content
+        )
 
     def serialize(self, obj: Any) -> str:
         """
@@ -69,19 +278,13 @@ class ObjectFile(FileBase, ABC):
         """
         Adds an override to the synthesized object file.
 
-        :param path: The path of the property
+        :param path: The path of the property, with periods between keys. A period that is part of a
+            key is escaped with a backslash.
         :param value: The value to set
         """
-        parts = self._split_on_periods(path)
-        curr = self._raw_overrides
-
-        while len(parts) > 1:
-            key = parts.pop(0)
-            if key not in curr or not isinstance(curr[key], dict):
-                curr[key] = {}
-            curr = curr[key]
-
-        curr[parts[0]] = value
+        parts = _parse_override_path(path)
+        self._override_node(path, parts)[parts[-1]] = value
+        self.mark_dirty()
 
     def add_deletion_override(self, path: str):
         """
@@ -91,6 +294,46 @@ class ObjectFile(FileBase, ABC):
         """
         self.add_override(path, None)
 
+    def add_to_array(self, path: str, *values: Any):
+        """
+        Adds values to the end of an array, creating it if needed.
+
+        :param path: The path of the array, like for `add_override`
+        :param values: The values to append
+        """
+        parts = _parse_override_path(path)
+        node = self._override_node(path, parts)
+        key = parts[-1]
+        current = node.get(key)
+        if isinstance(current, list):
+            node[key] = current + list(values)
+        elif type(current) is _OverrideNode and isinstance(current.get(APPEND_KEY), list):
+            current[APPEND_KEY].extend(values)
+        else:
+            node[key] = _OverrideNode({APPEND_KEY: list(values)})
+        self.mark_dirty()
+
+    def _override_node(self, path: str, parts: Tuple[str, ...]) -> _OverrideNode:
+        """
+        Find the node of the override trie that holds the last part of a path, creating it if needed.
+
+        :param path: The path, for error messages
+        :param parts: The parsed path
+        :return: The node
+        :raises ValueError: If the path is empty
+        """
+        if not parts:
+            raise ValueError(f"invalid override path {path!r}")
+        node = self._raw_overrides
+        for key in parts[:-1]:
+            child = node.get(key)
+            if type(child) is not _OverrideNode:
+                # anything but a dict is replaced, and a dict value is copied so the caller's dict is not modified
+                child = _OverrideNode(child) if isinstance(child, dict) else _OverrideNode()
+                node[key] = child
+            node = child
+        return node
+
     def patch(self, *patches: JsonPatch):
         """
         Applies JSON patches to the synthesized object file.
@@ -98,6 +341,7 @@ class ObjectFile(FileBase, ABC):
         :param patches: The patches to apply
         """
         self._patch_operations.extend(patches)
+        self.mark_dirty()
 
     @staticmethod
     def _split_on_periods(x: str) -> List[str]:
@@ -107,16 +351,7 @@ class ObjectFile(FileBase, ABC):
         :param x: The string to split
         :return: A list of split string parts
         """
-        ret = [""]
-        for i, char in enumerate(x):
-            if char == "\\" and i + 1 < len(x):
-                ret[-1] += x[i + 1]
-                i += 1
-            elif char == ".":
-                ret.append("")
-            else:
-                ret[-1] += char
-        return [part for part in ret if part]
+        return list(_parse_override_path(x))
 
     def get_object(self) -> Any:
         """
@@ -133,3 +368,35 @@ class ObjectFile(FileBase, ABC):
         :param obj: The new object to set
         """
         self._obj = obj
+        self.mark_dirty()
+
+
+@functools.lru_cache(maxsize=65536)
+def _parse_override_path(path: str) -> Tuple[str, ...]:
+    """
+    Split an override path on periods, where a backslash escapes the next character. Cached, since
+    components tend to override the same paths in many files.
+
+    :param path: The path
+    :return: The non-empty parts of the path
+    """
+    if "\\" not in path:
+        return tuple(part for part in path.split(".") if part)
+
+    parts = []
+    current = []
+    i = 0
+    while i < len(path):
+        char = path[i]
+        if char == "\\" and i + 1 < len(path):
+            current.append(path[i + 1])
+            i += 2
+            continue
+        if char == ".":
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+        i += 1
+    parts.append("".join(current))
+    return tuple(part for part in parts if part)
@@ -0,0 +1,454 @@
+import io
+import mmap
+import os
+import shutil
+import stat
+import tarfile
+import threading
+import time
+import zipfile
+from abc import (
+    ABC,
+    abstractmethod,
+)
+from typing import (
+    IO,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from pyprojen.synth_writer import (
+    FsyncPolicy,
+    PendingWrite,
+    SynthWriter,
+)
+from pyprojen.util import (
+    content_digest,
+    file_digest,
+    get_file_permissions,
+    try_stat,
+)
+
+# existing files at least this big are mapped into memory to compare them, smaller ones are just read
+MMAP_THRESHOLD = 64 * 1024
+
+# the archive formats supported by ArchiveBackend, mapped to their tarfile stream modes
+ARCHIVE_FORMATS = {"tar": "w|", "tar.gz": "w|gz", "tar.bz2": "w|bz2", "tar.xz": "w|xz", "zip": None}
+
+
+class FileStat:
+    """The subset of `os.stat_result` that synthesis relies on, for backends that do not use the filesystem."""
+
+    def __init__(self, st_size: int, st_mtime_ns: int, st_mode: int):
+        """
+        Initialize a FileStat.
+
+        :param st_size: Size of the file in bytes
+        :param st_mtime_ns: Modification time in nanoseconds
+        :param st_mode: File type and permission bits
+        """
+        self.st_size = st_size
+        self.st_mtime_ns = st_mtime_ns
+        self.st_mode = st_mode
+
+
+class OutputBackend(ABC):
+    """
+    Where a synth writes its files.
+
+    Paths are absolute, as computed from the project outdirs. Backends that do not write to the
+    filesystem store files relative to the outdir of the project that started the synth.
+    Implementations must be safe to use from multiple threads.
+    """
+
+    # whether a synth stores the state of the files it wrote, so the next synth can skip comparing
+    # unchanged files; pointless for backends that do not write, or that start out empty every time
+    stores_state = True
+
+    def begin(self, outdir: str):
+        """
+        Called by the project that starts a synth, before any file is written.
+
+        :param outdir: The outdir of that project
+        """
+
+    def finish(self):
+        """
+        Called once all files of a synth have been written.
+        """
+
+    @abstractmethod
+    def stat(self, path: str) -> Optional[Union[os.stat_result, FileStat]]:
+        """
+        Stat an existing file.
+
+        :param path: The absolute path of the file
+        :return: The stat, or None if there is no such file
+        """
+
+    @abstractmethod
+    def read(self, path: str) -> Optional[Union[str, bytes]]:
+        """
+        Read an existing file.
+
+        :param path: The absolute path of the file
+        :return: The content, or None if there is no such file. Backends that keep files in memory return
+            binary files as bytes.
+        """
+
+    @abstractmethod
+    def write(
+        self, path: str, data: Union[str, bytes], readonly: bool = False, executable: bool = False
+    ) -> Union[os.stat_result, FileStat]:
+        """
+        Write a file, replacing any previous version.
+
+        :param path: The absolute path of the file
+        :param data: The content, text or bytes
+        :param readonly: Whether the file should be readonly
+        :param executable: Whether the file should be executable
+        :return: The stat of the written file
+        """
+
+    @abstractmethod
+    def remove(self, path: str):
+        """
+        Remove a file, or a directory with everything in it, if it exists.
+
+        :param path: The absolute path of the file
+        """
+
+    def remove_file(self, path: str):
+        """
+        Remove a file, if it exists. Unlike `remove`, never removes a directory, e.g. for cleaning up
+        paths listed in a manifest that may have been replaced by a directory since.
+
+        :param path: The absolute path of the file
+        :raises IsADirectoryError: If the path is a directory
+        """
+        st = self.stat(path)
+        if st is not None and stat.S_ISDIR(st.st_mode):
+            raise IsADirectoryError(f"{path} is a directory")
+        self.remove(path)
+
+    def open_write(self, path: str, readonly: bool = False, executable: bool = False) -> PendingWrite:
+        """
+        Start writing a file in chunks, see `PendingWrite`. By default, the chunks are collected in
+        memory and passed to `write` on commit.
+
+        :param path: The absolute path of the file
+        :param readonly: Whether the file should be readonly
+        :param executable: Whether the file should be executable
+        :return: The pending write
+        """
+        return BufferedWrite(self, path, readonly, executable)
+
+    def copy(
+        self, source: str, path: str, readonly: bool = False, executable: bool = False
+    ) -> Union[os.stat_result, FileStat]:
+        """
+        Write a copy of a file from the local filesystem, replacing any previous version. By default, the
+        source is read into memory and passed to `write`.
+
+        :param source: The path of the file to copy
+        :param path: The absolute path of the copy
+        :param readonly: Whether the copy should be readonly
+        :param executable: Whether the copy should be executable
+        :return: The stat of the copy
+        """
+        with open(source, "rb") as f:
+            data = f.read()
+        return self.write(path, data, readonly=readonly, executable=executable)
+
+    def digest(self, path: str) -> Optional[str]:
+        """
+        The digest of an existing file, like `content_digest` of its content.
+
+        :param path: The absolute path of the file
+        :return: The hex sha256 digest, or None if there is no such file
+        """
+        content = self.read(path)
+        return content_digest(content) if content is not None else None
+
+    def content_equals(self, path: str, data: bytes) -> bool:
+        """
+        Whether an existing file has exactly the given content. A file of another size is not read.
+
+        :param path: The absolute path of the file
+        :param data: The UTF-8 encoded content
+        :return: True if the file exists and has the content
+        """
+        prev_stat = self.stat(path)
+        if prev_stat is None or prev_stat.st_size != len(data):
+            return False
+        content = self.read(path)
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        return content == data
+
+    def prune_dir(self, path: str) -> bool:
+        """
+        Remove a directory if it is empty. Backends without directories have nothing to prune.
+
+        :param path: The absolute path of the directory
+        :return: True if the directory was removed
+        """
+        return False
+
+
+class DiskBackend(OutputBackend):
+    """Writes files to the local filesystem, atomically, through a `SynthWriter`."""
+
+    def __init__(self, fsync: FsyncPolicy = FsyncPolicy.NONE):
+        """
+        Initialize a DiskBackend.
+
+        :param fsync: When to flush the written files to stable storage
+        """
+        self.writer = SynthWriter(fsync)
+
+    def finish(self):
+        self.writer.finish()
+
+    def stat(self, path: str) -> Optional[os.stat_result]:
+        return try_stat(path)
+
+    def read(self, path: str) -> Optional[str]:
+        try:
+            with open(path, "r") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write(
+        self, path: str, data: Union[str, bytes], readonly: bool = False, executable: bool = False
+    ) -> os.stat_result:
+        return self.writer.write(path, data, readonly=readonly, executable=executable)
+
+    def open_write(self, path: str, readonly: bool = False, executable: bool = False) -> PendingWrite:
+        return self.writer.open(path, readonly=readonly, executable=executable)
+
+    def copy(self, source: str, path: str, readonly: bool = False, executable: bool = False) -> os.stat_result:
+        return self.writer.copy(source, path, readonly=readonly, executable=executable)
+
+    def digest(self, path: str) -> Optional[str]:
+        return file_digest(path)
+
+    def content_equals(self, path: str, data: bytes) -> bool:
+        try:
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size != len(data):
+                    return False
+                if size < MMAP_THRESHOLD:
+                    return f.read() == data
+                # compares the mapped pages with the content, without copying or decoding the file
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+                    return view == data
+        except FileNotFoundError:
+            return False
+
+    def remove(self, path: str):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            self.remove_file(path)
+
+    def remove_file(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def prune_dir(self, path: str) -> bool:
+        try:
+            os.rmdir(path)
+        except OSError:
+            return False
+        return True
+
+
+class MemoryBackend(OutputBackend):
+    """
+    Keeps files in memory, so a project can be synthesized without any disk I/O, e.g. in tests.
+
+    A MemoryBackend can be reused across synths of the same project, which then sees the files of
+    the previous synth, like it would on disk.
+    """
+
+    def __init__(self):
+        """
+        Initialize a MemoryBackend.
+        """
+        self._files: Dict[str, Tuple[Union[str, bytes], FileStat]] = {}
+        self._lock = threading.Lock()
+
+    def stat(self, path: str) -> Optional[FileStat]:
+        entry = self._files.get(os.path.normpath(path))
+        return entry[1] if entry is not None else None
+
+    def read(self, path: str) -> Optional[Union[str, bytes]]:
+        entry = self._files.get(os.path.normpath(path))
+        return entry[0] if entry is not None else None
+
+    def write(self, path: str, data: Union[str, bytes], readonly: bool = False, executable: bool = False) -> FileStat:
+        mode = stat.S_IFREG | _file_mode(readonly, executable)
+        st = FileStat(len(data.encode("utf-8") if isinstance(data, str) else data), time.time_ns(), mode)
+        with self._lock:
+            self._files[os.path.normpath(path)] = (data, st)
+        return st
+
+    def remove(self, path: str):
+        path = os.path.normpath(path)
+        prefix = path + os.sep
+        with self._lock:
+            for key in [k for k in self._files if k == path or k.startswith(prefix)]:
+                del self._files[key]
+
+    def remove_file(self, path: str):
+        path = os.path.normpath(path)
+        with self._lock:
+            if path not in self._files and any(k.startswith(path + os.sep) for k in self._files):
+                raise IsADirectoryError(f"{path} is a directory")
+            self._files.pop(path, None)
+
+    def files_under(self, root: str) -> Dict[str, str]:
+        """
+        The files under a directory.
+
+        :param root: The absolute path of the directory
+        :return: Map of path relative to `root`, with forward slashes, to content, as bytes for binary files
+        """
+        prefix = os.path.normpath(root) + os.sep
+        with self._lock:
+            items = list(self._files.items())
+        return {
+            os.path.relpath(path, root).replace(os.sep, "/"): content
+            for path, (content, _) in sorted(items)
+            if path.startswith(prefix)
+        }
+
+
+class ArchiveBackend(OutputBackend):
+    """
+    Streams files into a tar or zip archive instead of writing them to disk.
+
+    The archive starts out empty, so every file is written and nothing is cleaned up. Files are
+    stored relative to the outdir of the project that started the synth, and the archive is closed
+    when the synth finishes. An ArchiveBackend can only be used for a single synth.
+    """
+
+    stores_state = False
+
+    def __init__(self, target: Union[str, IO[bytes]], format: str = "tar.gz"):
+        """
+        Initialize an ArchiveBackend.
+
+        :param target: The path of the archive to create, or a binary stream to write it to.
+            tar formats only write sequentially, so they can stream to pipes and sockets.
+        :param format: One of "tar", "tar.gz", "tar.bz2", "tar.xz" and "zip"
+        :raises ValueError: If the format is not supported
+        """
+        if format not in ARCHIVE_FORMATS:
+            raise ValueError(f"unsupported archive format {format}, expected one of {', '.join(ARCHIVE_FORMATS)}")
+        self.target = target
+        self.format = format
+        self._root: Optional[str] = None
+        self._archive: Optional[Union[tarfile.TarFile, zipfile.ZipFile]] = None
+        self._lock = threading.Lock()
+
+    def begin(self, outdir: str):
+        if self._root is not None:
+            raise ValueError("an ArchiveBackend can only be used for a single synth")
+        self._root = outdir
+        if self.format == "zip":
+            self._archive = zipfile.ZipFile(self.target, "w", compression=zipfile.ZIP_DEFLATED)
+        elif isinstance(self.target, str):
+            self._archive = tarfile.open(self.target, mode=ARCHIVE_FORMATS[self.format])
+        else:
+            self._archive = tarfile.open(fileobj=self.target, mode=ARCHIVE_FORMATS[self.format])
+
+    def finish(self):
+        with self._lock:
+            if self._archive is not None:
+                self._archive.close()
+                self._archive = None
+
+    def stat(self, path: str) -> None:
+        return None
+
+    def read(self, path: str) -> None:
+        return None
+
+    def write(self, path: str, data: Union[str, bytes], readonly: bool = False, executable: bool = False) -> FileStat:
+        if self._archive is None:
+            raise ValueError("the archive is not open, files can only be written during a synth")
+        name = os.path.relpath(path, self._root).replace(os.sep, "/")
+        if name.startswith("../"):
+            raise ValueError(f"{path} is outside of the archived outdir {self._root}")
+
+        encoded = data.encode("utf-8") if isinstance(data, str) else data
+        mode = _file_mode(readonly, executable)
+        mtime_ns = time.time_ns()
+        with self._lock:
+            if isinstance(self._archive, zipfile.ZipFile):
+                info = zipfile.ZipInfo(name, date_time=time.localtime(mtime_ns // 1_000_000_000)[:6])
+                info.external_attr = (stat.S_IFREG | mode) << 16
+                info.compress_type = zipfile.ZIP_DEFLATED
+                self._archive.writestr(info, encoded)
+            else:
+                info = tarfile.TarInfo(name)
+                info.size = len(encoded)
+                info.mode = mode
+                info.mtime = mtime_ns // 1_000_000_000
+                self._archive.addfile(info, io.BytesIO(encoded))
+        return FileStat(len(encoded), mtime_ns, stat.S_IFREG | mode)
+
+    def remove(self, path: str):
+        # nothing is in the archive before the synth, so there is nothing to clean up
+        pass
+
+
+class BufferedWrite(PendingWrite):
+    """A `PendingWrite` that collects the content in memory, for backends that do not write to disk."""
+
+    def __init__(self, backend: OutputBackend, path: str, readonly: bool, executable: bool):
+        """
+        Initialize a BufferedWrite.
+
+        :param backend: The backend to write the content to on commit
+        :param path: The absolute path of the file
+        :param readonly: Whether the file should be readonly
+        :param executable: Whether the file should be executable
+        """
+        super().__init__(path)
+        self._backend = backend
+        self._readonly = readonly
+        self._executable = executable
+        self._data: List[bytes] = []
+
+    def _write_bytes(self, data: bytes):
+        self._data.append(data)
+
+    def commit(self) -> Union[os.stat_result, FileStat]:
+        self.flush()
+        content = b"".join(self._data).decode("utf-8")
+        self._data = []
+        return self._backend.write(self.file_path, content, readonly=self._readonly, executable=self._executable)
+
+    def discard(self):
+        self._data = []
+
+
+def _file_mode(readonly: bool, executable: bool) -> int:
+    """
+    The permission bits of a synthesized file.
+
+    :param readonly: Whether the file should be readonly
+    :param executable: Whether the file should be executable
+    :return: The permission bits
+    """
+    return int(get_file_permissions({"readonly": readonly, "executable": executable}), 8)
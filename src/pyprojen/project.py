@@ -1,23 +1,62 @@
+import json
+import logging
 import os
 from abc import ABC
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
 from typing import (
     Any,
+    Callable,
     Dict,
+    Iterator,
     List,
     Optional,
 )
 
+from pyprojen.check import (
+    CheckBackend,
+    CheckSession,
+    SynthReport,
+    active_session,
+)
 from pyprojen.cleanup import (
-    FILE_MANIFEST,
+    CleanupStats,
     cleanup,
+    read_file_state,
+    read_manifest,
+)
+from pyprojen.common import (
+    FILE_MANIFEST,
+    FILE_STATE,
 )
-from pyprojen.common import FILE_MANIFEST
 from pyprojen.component import Component
-from pyprojen.constructs import Construct
-from pyprojen.file import FileBase
+from pyprojen.constructs import (
+    Construct,
+    ConstructOrder,
+)
+from pyprojen.file import (
+    FileBase,
+    SynthResolver,
+)
 from pyprojen.ignore_file import IgnoreFile
 from pyprojen.json_file import JsonFile
 from pyprojen.object_file import ObjectFile
+from pyprojen.output_backend import (
+    DiskBackend,
+    OutputBackend,
+)
+from pyprojen.render_cache import (
+    DEFAULT_MAX_BYTES,
+    RENDER_CACHE_DIR,
+    RenderCache,
+)
+from pyprojen.synth_writer import FsyncPolicy
+from pyprojen.util import (
+    normalize_persisted_path,
+    rebase_pattern,
+)
 from pyprojen.util.constructs import tag_as_project
 
 # from pyprojen.gitattributes import GitAttributesFile
@@ -45,6 +84,9 @@ class Project(Construct, ABC):
         git_ignore_filter_comment_lines: bool = True,
         git_ignore_filter_empty_lines: bool = True,
         git_ignore_patterns: Optional[List[str]] = None,
+        render_cache: bool = False,
+        render_cache_max_bytes: int = DEFAULT_MAX_BYTES,
+        consolidated_manifest: bool = False,
     ):
         """
         Initialize a Project.
@@ -57,6 +99,12 @@ class Project(Construct, ABC):
         :param git_ignore_filter_comment_lines: Whether to filter comment lines in .gitignore
         :param git_ignore_filter_empty_lines: Whether to filter empty lines in .gitignore
         :param git_ignore_patterns: Initial patterns for .gitignore
+        :param render_cache: Whether to cache rendered object files in `.pyprojen/cache/` across runs.
+            Only applies to root projects; subprojects use the cache of their root.
+        :param render_cache_max_bytes: The size the render cache is trimmed to after each synth
+        :param consolidated_manifest: Whether to keep a single manifest for the whole tree in the outdir of
+            this project, and clean up all subprojects in a single pass, instead of one manifest and cleanup
+            per subproject. Only applies to root projects.
         """
         super().__init__(parent, f"{self.__class__.__name__}#{name}@{outdir}")
         tag_as_project(self)
@@ -68,6 +116,16 @@ class Project(Construct, ABC):
         self._ejected = False  # Changed from self.ejected to self._ejected
         self._manifest_files = set()
         self._exclude_from_cleanup: List[str] = []
+        self._files_by_path: Dict[str, FileBase] = {}
+        self._render_pool: Optional[ProcessPoolExecutor] = None
+        self._backend: Optional[OutputBackend] = None
+        self._resolver: Optional[SynthResolver] = None
+        self._manifest: Optional[JsonFile] = None
+        self._previous_manifest_entries: Dict[str, Dict[str, Any]] = {}
+        self._last_manifest: Optional[Dict[str, Any]] = None
+        self._last_state: Optional[Dict[str, Any]] = None
+        self.cleanup_stats: Optional[CleanupStats] = None
+        self.consolidated_manifest = consolidated_manifest and parent is None
         self.gitignore = IgnoreFile(
             self,
             ".gitignore",
@@ -75,6 +133,13 @@ class Project(Construct, ABC):
             filter_empty_lines=git_ignore_filter_empty_lines,
             ignore_patterns=git_ignore_patterns,
         )
+        # holds the file state and the render cache, which are never committed
+        self.add_git_ignore(f"/{os.path.dirname(FILE_STATE)}/")
+        self.render_cache: Optional[RenderCache] = None
+        if render_cache and parent is None:
+            self.render_cache = RenderCache(os.path.join(self.outdir, RENDER_CACHE_DIR), render_cache_max_bytes)
+            if RENDER_CACHE_DIR != os.path.dirname(FILE_STATE):
+                self.add_git_ignore(f"/{RENDER_CACHE_DIR}/")
 
     @staticmethod
     def is_project(x: Any) -> bool:
@@ -137,6 +202,28 @@ class Project(Construct, ABC):
         """
         return sorted([c for c in self.components if isinstance(c, FileBase)], key=lambda f: f.path)
 
+    def find_all_components(self, order: ConstructOrder = ConstructOrder.PREORDER) -> Iterator[Component]:
+        """
+        Lazily yields all components of this project, including nested ones, but not those of subprojects.
+
+        :param order: The traversal order
+        :return: Iterator over the components
+        """
+        return self.node.find_all_matching(
+            lambda c: isinstance(c, Component) and c.project is self,
+            order=order,
+            descend=lambda c: not Project.is_project(c),
+        )
+
+    def find_all_files(self, order: ConstructOrder = ConstructOrder.PREORDER) -> Iterator[FileBase]:
+        """
+        Lazily yields all files within this project and all its subprojects.
+
+        :param order: The traversal order
+        :return: Iterator over the files
+        """
+        return self.node.find_all_of_type(FileBase, order=order)
+
     def try_find_file(self, file_path: str) -> Optional[FileBase]:
         """
         Finds a file at the specified relative path within this project and all its subprojects.
@@ -144,8 +231,36 @@ class Project(Construct, ABC):
         :param file_path: The file path to search for
         :return: The found file or None
         """
-        absolute = os.path.abspath(file_path) if os.path.isabs(file_path) else os.path.join(self.outdir, file_path)
-        return next((c for c in self.node.find_all() if isinstance(c, FileBase) and c.absolute_path == absolute), None)
+        absolute = os.path.abspath(os.path.join(self.outdir, file_path))
+        file = self.root._files_by_path.get(absolute)
+        if file is None or not self._owns(file):
+            return None
+        return file
+
+    def _owns(self, file: FileBase) -> bool:
+        """
+        Whether the file belongs to this project or one of its subprojects.
+
+        :param file: The file to check
+        :return: True if the file is defined within this project's subtree
+        """
+        project = file.project
+        while project is not None:
+            if project is self:
+                return True
+            project = project.parent
+        return False
+
+    def _register_file(self, file: FileBase):
+        """
+        Index a file by its absolute path. Must be called on the root project.
+
+        :param file: The file to register
+        :raises ValueError: If another file is already registered under the same path
+        """
+        if file.absolute_path in self._files_by_path:
+            raise ValueError(f"There is already a file under {file.absolute_path}")
+        self._files_by_path[file.absolute_path] = file
 
     def try_find_object_file(self, file_path: str) -> Optional[ObjectFile]:
         """
@@ -179,35 +294,451 @@ class Project(Construct, ABC):
         """
         # Implement this method in derived classes
 
-    def synth(self):
+    def synth(
+        self,
+        max_workers: Optional[int] = None,
+        render_processes: Optional[int] = None,
+        incremental: bool = False,
+        fsync: FsyncPolicy = FsyncPolicy.NONE,
+        backend: Optional[OutputBackend] = None,
+        dry_run: bool = False,
+    ) -> Optional[SynthReport]:
         """
         Synthesize all project files into `outdir`.
-        """
-        # Generate file manifest
-        manifest_files = sorted(list(self._manifest_files))
-        JsonFile(self, FILE_MANIFEST, {"files": manifest_files}, omit_empty=True)
 
-        # Cleanup orphaned files
-        cleanup(self.outdir, manifest_files, self._exclude_from_cleanup)
+        The pre-synthesize, synthesize and post-synthesize phases always run one after the other.
+        With `max_workers`, the components of the synthesize phase (rendering and writing files)
+        run concurrently on a thread pool, and sibling subprojects are synthesized concurrently.
+        Components must then not depend on each other in their `synthesize()`.
+
+        With `render_processes`, object files are resolved in this process, but merged, patched and
+        serialized on a process pool shared by all subprojects. The writes stay in this process.
+        Worker processes may re-import the `__main__` module, so the synth must then be guarded by
+        `if __name__ == "__main__":` on platforms that do not fork.
+
+        With `incremental`, a project that was already synthesized by this process only re-renders and
+        rewrites files that were modified since (see `FileBase.synthesize_if_changed`), and reuses the
+        manifest it keeps in memory instead of reading it back. Files are then rendered in-process.
+
+        Files are written to `backend`, shared by all subprojects. By default, they are written to
+        disk, atomically, by a `DiskBackend`.
+
+        With `dry_run`, or while a `CheckSession` is active, everything is rendered and compared against
+        the files on disk, but nothing is written or removed, and the post-synthesize phase is skipped.
+        The returned report lists the files a real synth would add, change or remove. A dry run does
+        not count as a synth for a later incremental synth.
+
+        Orphaned files are removed first, on `max_workers` threads; what was removed is kept in `cleanup_stats`.
+
+        :param max_workers: Number of threads to use, or None to synthesize serially
+        :param render_processes: Number of processes to render object files with, or None to render in-process
+        :param incremental: Whether to only synthesize the files that changed since the last synth
+        :param fsync: When to flush the written files to stable storage, if writing to disk
+        :param backend: Where to write the files, defaults to the local filesystem. Ignored by subprojects,
+            which use the backend of the project that started the synth.
+        :param dry_run: Whether to only check which files would change
+        :return: With `dry_run`, the report of the files that are out of date
+        """
+        if self._find_backend() is None:
+            session = active_session()
+            if dry_run or session is not None:
+                if max_workers is None and session is not None:
+                    max_workers = session.max_workers
+                return self._dry_run(max_workers, render_processes, session)
+            self._backend = backend or DiskBackend(fsync)
+            self._backend.begin(self.outdir)
+            self._resolver = SynthResolver()
+            try:
+                self.synth(max_workers, render_processes, incremental)
+                self._backend.finish()
+            finally:
+                self._backend = None
+                self._resolver = None
+            return None
+
+        if render_processes and self._find_render_pool() is None:
+            with ProcessPoolExecutor(max_workers=render_processes) as pool:
+                self._render_pool = pool
+                try:
+                    self.synth(max_workers, render_processes, incremental)
+                finally:
+                    self._render_pool = None
+            return None
+
+        checking = isinstance(self._find_backend(), CheckBackend)
+
+        # In a consolidated tree, the root keeps the manifest and cleans up for all subprojects
+        keeps_manifest = not self._is_consolidated_subproject()
+
+        if keeps_manifest:
+            # Generate file manifest; it lists the files of all components, so it is written last
+            if self._manifest is None:
+                self._manifest = JsonFile(self, FILE_MANIFEST, self._manifest_content, omit_empty=True)
+            manifest_files = self._manifest_file_list()
+
+            # Cleanup orphaned files
+            if incremental and self._last_manifest is not None:
+                previous_manifest = self._last_manifest
+                previous_state = self._last_state or {}
+            else:
+                previous_manifest = read_manifest(self.outdir, self._find_backend())
+                previous_state = read_file_state(self.outdir, self._find_backend())
+                if self.consolidated_manifest and not previous_manifest.get("consolidated"):
+                    previous_manifest = self._merge_subproject_manifests(previous_manifest)
+            # manifests written before the state was split off still carry the entries
+            self._previous_manifest_entries = previous_state.get("entries", previous_manifest.get("entries", {}))
+            self.cleanup_stats = cleanup(
+                self.outdir,
+                manifest_files,
+                self._cleanup_excludes(),
+                previous_manifest,
+                self._find_backend(),
+                max_workers,
+            )
 
         # self.logger.debug("Synthesizing project...")
         self.pre_synthesize()
 
         for comp in self.components:
             comp.pre_synthesize()
+        self._invalidate_resolved_containers()
 
-        for subproject in self.subprojects:
-            subproject.synth()
-
-        for comp in self.components:
-            comp.synthesize()
+        self._synth_subprojects(max_workers, render_processes, incremental)
+        self._synthesize_components(
+            max_workers,
+            self._find_render_pool() if render_processes else None,
+            incremental,
+        )
+        if keeps_manifest:
+            if incremental:
+                self._manifest.synthesize_if_changed()
+            else:
+                self._manifest.synthesize()
+        if checking:
+            return None
+        if keeps_manifest:
+            self._last_manifest = self._manifest_content()
+            self._last_state = {"entries": self._manifest_entries()}
+            self._write_file_state(self._last_state)
 
         for comp in self.components:
             comp.post_synthesize()
 
         self.post_synthesize()
 
+        if self.render_cache is not None:
+            self.render_cache.evict()
+
         # self.logger.debug("Synthesis complete")
+        return None
+
+    def check(self, max_workers: Optional[int] = None) -> SynthReport:
+        """
+        Check whether the generated files are up to date, without writing or removing anything.
+
+        :param max_workers: Number of threads to compare files with, or None to compare serially
+        :return: The report of the files a synth would add, change or remove
+        """
+        return self.synth(max_workers=max_workers, dry_run=True)
+
+    def _dry_run(
+        self,
+        max_workers: Optional[int],
+        render_processes: Optional[int],
+        session: Optional[CheckSession],
+    ) -> SynthReport:
+        """
+        Synthesize into a `CheckBackend`, then restore the state a real synth would have updated.
+
+        :param max_workers: Number of threads to use, or None to synthesize serially
+        :param render_processes: Number of processes to render object files with, or None to render in-process
+        :param session: The active check session, which collects the report
+        :return: The report
+        """
+        backend = CheckBackend()
+        self._backend = backend
+        backend.begin(self.outdir)
+        self._resolver = SynthResolver()
+        try:
+            self.synth(max_workers, render_processes)
+            backend.finish()
+        finally:
+            self._backend = None
+            self._resolver = None
+            # nothing was written, so the next incremental synth must not skip any file
+            for file in self.find_all_files():
+                file.mark_dirty()
+        if session is not None:
+            session.reports.append(backend.report)
+        return backend.report
+
+    def _render_out_of_process(self, file: ObjectFile, render_pool: ProcessPoolExecutor) -> Callable[[], None]:
+        """
+        Submit the rendering of an object file to the process pool, unless it is in the render cache.
+
+        :param file: The object file
+        :param render_pool: The process pool
+        :return: A task that writes the rendered content once it is available
+        """
+        job = file.create_render_job(file._resolver())
+        if job is None:
+            return lambda: file._write_content(None)
+
+        cache = self.root.render_cache
+        stores_state = file._output_backend().stores_state
+        key = cache.fingerprint(job) if cache is not None else None
+        content = cache.get(key, touch=stores_state) if key is not None else None
+        if content is not None:
+            file._last_render_key = key
+            return lambda: file._write_content(content)
+
+        future = render_pool.submit(job.render)
+
+        def write():
+            rendered = future.result()
+            if key is not None and rendered is not None and stores_state:
+                cache.put(key, rendered)
+            file._last_render_key = key
+            file._write_content(rendered)
+
+        return write
+
+    def _manifest_file_list(self) -> List[str]:
+        """
+        The files managed by this project, i.e. the files that are cleaned up once they are no longer defined.
+        With a consolidated manifest, the root also lists the files of all subprojects.
+
+        :return: Sorted list of paths, relative to this project
+        """
+        if not self.consolidated_manifest:
+            return sorted(f for f in self._manifest_files if f != FILE_MANIFEST)
+
+        files = []
+        for project in self.node.find_all_of_type(Project):
+            prefix = self._relative_prefix(project)
+            files.extend(f"{prefix}{f}" for f in project._manifest_files if f != FILE_MANIFEST)
+        return sorted(files)
+
+    def _manifest_content(self) -> Dict[str, Any]:
+        """
+        The content of the file manifest: the managed files, which only change when files are added or
+        removed, so the committed manifest is the same in every checkout.
+
+        :return: The manifest object
+        """
+        content: Dict[str, Any] = {"files": self._manifest_file_list()}
+        if self.consolidated_manifest:
+            content["consolidated"] = True
+        return content
+
+    def _write_file_state(self, state: Dict[str, Any]):
+        """
+        Store the state of the written files in the uncommitted `FILE_STATE`, so the next synth can skip
+        reading files that are unchanged.
+
+        :param state: The state
+        """
+        backend = self._find_backend()
+        if backend is None or not backend.stores_state:
+            return
+        try:
+            backend.write(os.path.join(self.outdir, FILE_STATE), json.dumps(state, separators=(",", ":")))
+        except OSError as e:
+            logging.warning(f"warning: failed to write the file state: {str(e)}")
+
+    def _manifest_entries(self) -> Dict[str, Dict[str, Any]]:
+        """
+        The size, mtime and digest of each file of this project, as last synthesized, for `FILE_STATE`.
+        With a consolidated manifest, the root also records the files of all subprojects.
+
+        :return: Map of path, relative to this project, to manifest entry
+        """
+        if not self.consolidated_manifest:
+            return {f.path: f._manifest_entry for f in self.files if f is not self._manifest and f._manifest_entry}
+        return {
+            f._root_project_path: f._manifest_entry
+            for f in self.find_all_files()
+            if f is not self._manifest and f._manifest_entry
+        }
+
+    def _previous_manifest_entry(self, file: FileBase) -> Optional[Dict[str, Any]]:
+        """
+        The manifest entry the previous synth recorded for a file of this project.
+
+        :param file: The file
+        :return: The entry, or None
+        """
+        root = self.root
+        if root.consolidated_manifest:
+            return root._previous_manifest_entries.get(file._root_project_path)
+        return self._previous_manifest_entries.get(file.path)
+
+    def _is_consolidated_subproject(self) -> bool:
+        """
+        Whether this is a subproject whose files are tracked by the consolidated manifest of its root.
+
+        :return: True if the root keeps the manifest of this project
+        """
+        return self.parent is not None and self.root.consolidated_manifest
+
+    def _relative_prefix(self, project: "Project") -> str:
+        """
+        The path of a project's outdir relative to this project's outdir, as a prefix for its file paths.
+
+        :param project: A project of this project's tree
+        :return: The prefix, with a trailing slash, or "" for this project
+        """
+        if project is self:
+            return ""
+        return normalize_persisted_path(os.path.relpath(project.outdir, self.outdir)) + "/"
+
+    def _cleanup_excludes(self) -> List[str]:
+        """
+        The globs to exclude from cleanup. With a consolidated manifest, the root also applies the globs
+        of all subprojects, rebased onto its outdir.
+
+        :return: The globs, relative to this project
+        """
+        if not self.consolidated_manifest:
+            return self._exclude_from_cleanup
+        return [
+            rebase_pattern(glob, self._relative_prefix(project))
+            for project in self.node.find_all_of_type(Project)
+            for glob in project._exclude_from_cleanup
+        ]
+
+    def _merge_subproject_manifests(self, manifest: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Fold the per-subproject manifests of an earlier synth into the manifest of the root, so switching
+        to a consolidated manifest still cleans up their orphaned files, and removes their manifests.
+
+        :param manifest: The previous manifest of the root
+        :return: The combined manifest
+        """
+        files = list(manifest.get("files", []))
+        for project in self.node.find_all_of_type(Project):
+            if project is self:
+                continue
+            sub_manifest = read_manifest(project.outdir, self._find_backend())
+            if not sub_manifest:
+                continue
+            prefix = self._relative_prefix(project)
+            files.extend(f"{prefix}{f}" for f in sub_manifest.get("files", []))
+            files.append(f"{prefix}{FILE_MANIFEST}")
+            files.append(f"{prefix}{FILE_STATE}")
+        return {**manifest, "files": files}
+
+    def _find_render_pool(self) -> Optional[ProcessPoolExecutor]:
+        """
+        Find the render pool of the closest project that is synthesizing with `render_processes`.
+
+        :return: The process pool, or None
+        """
+        project: Optional[Project] = self
+        while project is not None:
+            if project._render_pool is not None:
+                return project._render_pool
+            project = project.parent
+        return None
+
+    def _find_backend(self) -> Optional[OutputBackend]:
+        """
+        Find the output backend of the closest project that is synthesizing.
+
+        :return: The backend, or None if no synth is in progress
+        """
+        project: Optional[Project] = self
+        while project is not None:
+            if project._backend is not None:
+                return project._backend
+            project = project.parent
+        return None
+
+    def _find_resolver(self) -> Optional[SynthResolver]:
+        """
+        Find the resolver that all files of the synth in progress share.
+
+        :return: The resolver, or None if no synth is in progress
+        """
+        project: Optional[Project] = self
+        while project is not None:
+            if project._resolver is not None:
+                return project._resolver
+            project = project.parent
+        return None
+
+    def _invalidate_resolved_containers(self):
+        """
+        Forget the containers resolved so far in this synth, if this project has pre-synthesize hooks.
+
+        Subprojects run their pre-synthesize phase after other projects of the tree were synthesized,
+        so their hooks may modify objects that were already resolved. Lazy values are still evaluated
+        only once per synth.
+        """
+        resolver = self._find_resolver()
+        if resolver is None:
+            return
+        if type(self).pre_synthesize is not Project.pre_synthesize or any(
+            type(comp).pre_synthesize is not Component.pre_synthesize for comp in self.components
+        ):
+            resolver.invalidate_containers()
+
+    def _synth_subprojects(self, max_workers: Optional[int], render_processes: Optional[int], incremental: bool):
+        """
+        Synthesize all subprojects, concurrently if `max_workers` allows it.
+
+        :param max_workers: Number of threads to use, or None to synthesize serially
+        :param render_processes: Number of processes to render object files with, or None to render in-process
+        :param incremental: Whether to only synthesize the files that changed since the last synth
+        """
+        subprojects = self.subprojects
+        if not max_workers or max_workers <= 1 or len(subprojects) <= 1:
+            for subproject in subprojects:
+                subproject.synth(max_workers, render_processes, incremental)
+            return
+
+        # subprojects get their own pool: they wait on their own file pools, so sharing one could deadlock
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(subprojects))) as executor:
+            futures = [
+                executor.submit(subproject.synth, max_workers, render_processes, incremental)
+                for subproject in subprojects
+            ]
+            for future in futures:
+                future.result()
+
+    def _synthesize_components(
+        self,
+        max_workers: Optional[int],
+        render_pool: Optional[ProcessPoolExecutor],
+        incremental: bool,
+    ):
+        """
+        Run the synthesize phase of all components, concurrently if `max_workers` allows it.
+
+        :param max_workers: Number of threads to use, or None to synthesize serially
+        :param render_pool: Process pool to render object files on, or None to render in-process
+        :param incremental: Whether to only synthesize the files that changed since the last synth
+        """
+        tasks: List[Callable[[], None]] = []
+        for comp in self.components:
+            if comp is self._manifest:
+                continue
+            if incremental and isinstance(comp, FileBase):
+                tasks.append(comp.synthesize_if_changed)
+            elif render_pool is not None and isinstance(comp, ObjectFile) and comp.renders_out_of_process():
+                tasks.append(self._render_out_of_process(comp, render_pool))
+            else:
+                tasks.append(comp.synthesize)
+
+        if not max_workers or max_workers <= 1 or len(tasks) <= 1:
+            for task in tasks:
+                task()
+            return
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(task) for task in tasks]
+            for future in futures:
+                future.result()
 
     def pre_synthesize(self):
         """
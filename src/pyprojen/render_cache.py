@@ -0,0 +1,166 @@
+import functools
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import (
+    TYPE_CHECKING,
+    List,
+    Optional,
+    Tuple,
+)
+
+if TYPE_CHECKING:
+    from pyprojen.object_file import RenderJob
+
+RENDER_CACHE_DIR = ".pyprojen/cache"
+
+# bump whenever the rendered output for the same inputs changes, to invalidate existing caches
+RENDER_CACHE_VERSION = 1
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# the distributions that render object files, so upgrading any of them invalidates existing caches
+RENDER_LIBRARIES = ("pyprojen", "PyYAML", "tomlkit", "jsonpatch")
+
+
+class RenderCache:
+    """
+    On-disk, content-addressed cache of rendered object files.
+
+    Entries are keyed by a fingerprint of everything that goes into rendering a file: the resolved
+    object, the overrides, the patches, the marker, the serializer options, the file type and the
+    versions of the libraries that render it.
+    Least recently used entries are evicted once the cache grows beyond `max_bytes`.
+    """
+
+    def __init__(self, dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Initialize a RenderCache.
+
+        :param dir: The directory to store cache entries in
+        :param max_bytes: The size the cache is trimmed to by `evict`
+        """
+        self.dir = dir
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def fingerprint(job: "RenderJob") -> Optional[str]:
+        """
+        Compute the cache key of a render job.
+
+        :param job: The render job
+        :return: The cache key, or None if the job contains values that cannot be fingerprinted
+        """
+        # a canonical serialization, so equal data has the same key regardless of which objects are shared
+        # (unlike pickle, which references objects it has seen before instead of repeating them)
+        key = (
+            RENDER_CACHE_VERSION,
+            _library_versions(),
+            f"{job.file_type.__module__}.{job.file_type.__qualname__}",
+            job.obj,
+            job.overrides,
+            [(patch.operation, patch.path, patch.value, patch.from_) for patch in job.patches],
+            job.marker,
+            job.options,
+        )
+        try:
+            data = json.dumps(key, default=repr, separators=(",", ":"))
+        except (TypeError, ValueError):
+            return None
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, touch: bool = True) -> Optional[str]:
+        """
+        Get a cached rendering, marking it as recently used.
+
+        :param key: The cache key
+        :param touch: Whether to mark the entry as recently used, False to leave the cache unchanged
+        :return: The cached content, or None on a miss
+        """
+        path = self._entry_path(key)
+        try:
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                content = f.read()
+            if touch:
+                os.utime(path)
+        except OSError:
+            return None
+        return content
+
+    def put(self, key: str, content: str):
+        """
+        Store a rendering. Entries are written atomically, so concurrent readers never see partial entries.
+
+        :param key: The cache key
+        :param content: The rendered content
+        """
+        path = self._entry_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"warning: failed to write render cache entry {path}: {str(e)}")
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache fits in `max_bytes`.
+        """
+        entries: List[Tuple[float, int, str]] = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.dir):
+            # entries live in shard directories; other files next to them are not part of the cache
+            if dirpath == self.dir:
+                continue
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError as e:
+                logging.warning(f"warning: failed to evict render cache entry {path}: {str(e)}")
+
+    def _entry_path(self, key: str) -> str:
+        """
+        The path of a cache entry, sharded by the first two characters of the key.
+
+        :param key: The cache key
+        :return: The path
+        """
+        return os.path.join(self.dir, key[:2], key)
+
+
+@functools.lru_cache(maxsize=None)
+def _library_versions() -> Tuple[Tuple[str, Optional[str]], ...]:
+    """
+    The installed versions of the `RENDER_LIBRARIES`.
+
+    :return: Pairs of distribution name and version, None if the version is unknown
+    """
+    try:
+        from importlib import metadata
+    except ImportError:  # Python < 3.8
+        return tuple((name, None) for name in RENDER_LIBRARIES)
+
+    versions = []
+    for name in RENDER_LIBRARIES:
+        try:
+            versions.append((name, metadata.version(name)))
+        except metadata.PackageNotFoundError:
+            versions.append((name, None))
+    return tuple(versions)
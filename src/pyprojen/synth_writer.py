@@ -0,0 +1,413 @@
+import errno
+import hashlib
+import os
+import stat
+import tempfile
+import threading
+from abc import (
+    ABC,
+    abstractmethod,
+)
+from enum import Enum
+from typing import (
+    BinaryIO,
+    Callable,
+    List,
+    Set,
+    Union,
+)
+
+from pyprojen.util import get_file_permissions
+
+TEMP_FILE_PREFIX = ".pyprojen-tmp-"
+
+# characters collected before they are encoded, hashed and written, so tiny chunks do not cost a call each
+WRITE_BUFFER_CHARS = 64 * 1024
+
+# bytes copied at a time when the kernel cannot copy a file by itself
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# errors of copy_file_range and sendfile that mean they cannot copy between these files, e.g. across
+# filesystems on older kernels, or to a regular file on platforms where sendfile only writes to sockets
+_UNSUPPORTED_COPY_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSOCK}
+
+# on Windows, os.replace cannot replace a readonly file
+_REPLACE_NEEDS_WRITABLE_TARGET = os.name == "nt"
+
+
+class FsyncPolicy(Enum):
+    """When synthesized files are flushed to stable storage."""
+
+    # leave it to the OS
+    NONE = "none"
+    # fsync every file before it replaces the previous version
+    PER_FILE = "per-file"
+    # fsync all written files once the synth is done
+    AT_END = "at-end"
+
+
+class PendingWrite(ABC):
+    """
+    A file that is written in chunks, e.g. by a streaming serializer.
+
+    Keeps the size and a rolling sha256 digest of the UTF-8 encoded content, so it can be compared
+    with the existing file without holding the content in memory. The previous version of the file is
+    only replaced by `commit`. Has the `write` method of a text stream.
+    """
+
+    def __init__(self, file_path: str):
+        """
+        Initialize a PendingWrite.
+
+        :param file_path: The absolute path of the file
+        """
+        self.file_path = file_path
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+        self._chunks: List[str] = []
+        self._buffered = 0
+
+    def write(self, data: str) -> int:
+        """
+        Append to the content.
+
+        :param data: The text to append
+        :return: The number of characters written
+        """
+        self._chunks.append(data)
+        self._buffered += len(data)
+        if self._buffered >= WRITE_BUFFER_CHARS:
+            self.flush()
+        return len(data)
+
+    def write_binary(self, data: bytes):
+        """
+        Append content that is already encoded, e.g. a binary file.
+
+        :param data: The bytes to append
+        """
+        self.flush()
+        self._sha256.update(data)
+        self.size += len(data)
+        self._write_bytes(data)
+
+    def flush(self):
+        """
+        Encode, hash and write what was buffered.
+        """
+        if not self._chunks:
+            return
+        data = "".join(self._chunks).encode("utf-8")
+        self._chunks = []
+        self._buffered = 0
+        self._sha256.update(data)
+        self.size += len(data)
+        self._write_bytes(data)
+
+    @property
+    def digest(self) -> str:
+        """
+        The digest of everything written so far, like `content_digest` of the whole content.
+
+        :return: The hex sha256 digest
+        """
+        self.flush()
+        return self._sha256.hexdigest()
+
+    @abstractmethod
+    def _write_bytes(self, data: bytes):
+        """
+        Store encoded content.
+
+        :param data: The encoded content
+        """
+
+    @abstractmethod
+    def commit(self):
+        """
+        Replace the previous version of the file with what was written.
+
+        :return: The stat of the written file
+        """
+
+    @abstractmethod
+    def discard(self):
+        """
+        Drop what was written, leaving the previous version of the file as it is.
+        """
+
+
+class TempFileWrite(PendingWrite):
+    """A `PendingWrite` into a temp file next to the target, which is moved into place on commit."""
+
+    def __init__(self, writer: "SynthWriter", file_path: str, mode: int):
+        """
+        Initialize a TempFileWrite.
+
+        :param writer: The writer that opened it
+        :param file_path: The absolute path of the file
+        :param mode: The permission bits of the file
+        """
+        super().__init__(file_path)
+        self._writer = writer
+        self._mode = mode
+        fd, self._tmp_path = tempfile.mkstemp(dir=os.path.dirname(file_path), prefix=TEMP_FILE_PREFIX)
+        self._file: BinaryIO = os.fdopen(fd, "wb")
+
+    def _write_bytes(self, data: bytes):
+        self._file.write(data)
+
+    def commit(self) -> os.stat_result:
+        try:
+            self.flush()
+            self._file.flush()
+            _set_mode(self._file.fileno(), self._tmp_path, self._mode)
+            if self._writer.fsync == FsyncPolicy.PER_FILE:
+                os.fsync(self._file.fileno())
+            st = os.fstat(self._file.fileno())
+            self._file.close()
+            _replace(self._tmp_path, self.file_path)
+        except BaseException:
+            self.discard()
+            raise
+        self._writer._written_file(self.file_path)
+        return st
+
+    def discard(self):
+        self._file.close()
+        try:
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
+
+
+class SynthWriter:
+    """
+    Writes the files of a synth.
+
+    Every file is written to a temp file next to it and moved into place with `os.replace`, so readers
+    of the outdir never see a partially written file. Each parent directory is created at most once per
+    synth, and the final mode is set on the open descriptor. Safe to use from multiple threads.
+    """
+
+    def __init__(self, fsync: FsyncPolicy = FsyncPolicy.NONE):
+        """
+        Initialize a SynthWriter.
+
+        :param fsync: When to flush the written files to stable storage
+        """
+        self.fsync = fsync
+        self._created_dirs: Set[str] = set()
+        self._written: List[str] = []
+        self._lock = threading.Lock()
+
+    def write(
+        self, file_path: str, data: Union[str, bytes], readonly: bool = False, executable: bool = False
+    ) -> os.stat_result:
+        """
+        Atomically replace a file.
+
+        :param file_path: The absolute path of the file
+        :param data: The content to write, text or bytes
+        :param readonly: Whether the file should be readonly
+        :param executable: Whether the file should be executable
+        :return: The stat of the written file
+        """
+        pending = self.open(file_path, readonly=readonly, executable=executable)
+        try:
+            if isinstance(data, bytes):
+                pending.write_binary(data)
+            else:
+                pending.write(data)
+        except BaseException:
+            pending.discard()
+            raise
+        return pending.commit()
+
+    def open(self, file_path: str, readonly: bool = False, executable: bool = False) -> TempFileWrite:
+        """
+        Start writing a file in chunks. Nothing replaces the previous version until it is committed.
+
+        :param file_path: The absolute path of the file
+        :param readonly: Whether the file should be readonly
+        :param executable: Whether the file should be executable
+        :return: The pending write
+        """
+        self._ensure_dir(os.path.dirname(file_path))
+        mode = int(get_file_permissions({"readonly": readonly, "executable": executable}), 8)
+        return TempFileWrite(self, file_path, mode)
+
+    def copy(self, source: str, file_path: str, readonly: bool = False, executable: bool = False) -> os.stat_result:
+        """
+        Atomically replace a file with a copy of another file.
+
+        The data is copied by the kernel, without passing through Python. The copy keeps the mtime of
+        the source, so an unchanged copy can be recognized by its size and mtime alone.
+
+        :param source: The path of the file to copy
+        :param file_path: The absolute path of the copy
+        :param readonly: Whether the copy should be readonly
+        :param executable: Whether the copy should be executable
+        :return: The stat of the copy
+        """
+        directory = os.path.dirname(file_path)
+        self._ensure_dir(directory)
+        mode = int(get_file_permissions({"readonly": readonly, "executable": executable}), 8)
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=TEMP_FILE_PREFIX)
+        try:
+            with open(source, "rb") as src:
+                source_stat = os.fstat(src.fileno())
+                copy_file_data(src.fileno(), fd, source_stat.st_size)
+            # the times are set first, setting them by path needs a writable file on some platforms
+            times = (source_stat.st_atime_ns, source_stat.st_mtime_ns)
+            os.utime(fd if os.utime in os.supports_fd else tmp_path, ns=times)
+            _set_mode(fd, tmp_path, mode)
+            if self.fsync == FsyncPolicy.PER_FILE:
+                os.fsync(fd)
+            st = os.fstat(fd)
+            os.close(fd)
+            fd = -1
+            _replace(tmp_path, file_path)
+        except BaseException:
+            if fd != -1:
+                os.close(fd)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        self._written_file(file_path)
+        return st
+
+    def _written_file(self, file_path: str):
+        """
+        Record a file that was moved into place, to flush it when the synth finishes.
+
+        :param file_path: The absolute path of the file
+        """
+        if self.fsync != FsyncPolicy.NONE:
+            with self._lock:
+                self._written.append(file_path)
+
+    def finish(self):
+        """
+        Complete the synth: with `FsyncPolicy.AT_END` the written files are flushed, and with any fsync
+        policy the directories containing them are flushed, so the renames survive a crash.
+        """
+        with self._lock:
+            written, self._written = self._written, []
+        if self.fsync == FsyncPolicy.NONE:
+            return
+
+        if self.fsync == FsyncPolicy.AT_END:
+            for file_path in written:
+                self._fsync_path(file_path)
+        for directory in sorted({os.path.dirname(p) for p in written}):
+            self._fsync_path(directory)
+
+    def _ensure_dir(self, directory: str):
+        """
+        Create a directory, unless this writer already did.
+
+        :param directory: The absolute path of the directory
+        """
+        if directory in self._created_dirs:
+            return
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            self._created_dirs.add(directory)
+
+    @staticmethod
+    def _fsync_path(path: str):
+        """
+        Flush a file or directory to stable storage.
+
+        :param path: The path to flush
+        """
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _set_mode(fd: int, path: str, mode: int):
+    """
+    Set the permission bits of an open file, by path where the platform cannot do it by descriptor.
+
+    :param fd: The descriptor of the file
+    :param path: The path of the file
+    :param mode: The permission bits
+    """
+    # os.fchmod is missing on Windows before Python 3.13
+    if hasattr(os, "fchmod"):
+        os.fchmod(fd, mode)
+    else:
+        os.chmod(path, mode)
+
+
+def _replace(tmp_path: str, file_path: str):
+    """
+    Move a temp file into place, replacing any previous version of the file, even a readonly one.
+
+    :param tmp_path: The path of the temp file
+    :param file_path: The path of the file
+    """
+    if _REPLACE_NEEDS_WRITABLE_TARGET:
+        try:
+            os.chmod(file_path, stat.S_IREAD | stat.S_IWRITE)
+        except FileNotFoundError:
+            pass
+    os.replace(tmp_path, file_path)
+
+
+def _copy_file_range(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    return os.copy_file_range(src_fd, dst_fd, count, offset, offset)
+
+
+def _sendfile(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    os.lseek(dst_fd, offset, os.SEEK_SET)
+    return os.sendfile(dst_fd, src_fd, offset, count)
+
+
+# the ways to copy data between files in the kernel, in order of preference: copy_file_range can share
+# blocks on copy-on-write filesystems, sendfile at least avoids copying the data into user space
+_KERNEL_COPIES: List[Callable[[int, int, int, int], int]] = [
+    *([_copy_file_range] if hasattr(os, "copy_file_range") else []),
+    *([_sendfile] if hasattr(os, "sendfile") else []),
+]
+
+
+def copy_file_data(src_fd: int, dst_fd: int, size: int):
+    """
+    Copy the data of one file into another, in the kernel where the platform allows it, and with a
+    read/write loop otherwise.
+
+    :param src_fd: The descriptor of the file to copy, open for reading
+    :param dst_fd: The descriptor of the copy, open for writing
+    :param size: The number of bytes to copy, usually the size of the source
+    """
+    offset = 0
+    for kernel_copy in _KERNEL_COPIES:
+        try:
+            while offset < size:
+                copied = kernel_copy(src_fd, dst_fd, offset, size - offset)
+                if copied == 0:
+                    # the source was truncated while it was copied
+                    return
+                offset += copied
+            return
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED_COPY_ERRNOS:
+                raise
+
+    os.lseek(dst_fd, offset, os.SEEK_SET)
+    while offset < size:
+        chunk = os.pread(src_fd, min(COPY_CHUNK_SIZE, size - offset), offset)
+        if not chunk:
+            return
+        view = memoryview(chunk)
+        while view:
+            view = view[os.write(dst_fd, view) :]
+        offset += len(chunk)
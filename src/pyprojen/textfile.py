@@ -1,4 +1,5 @@
 from typing import (
+    IO,
     List,
     Optional,
 )
@@ -25,6 +26,7 @@ class TextFile(FileBase):
         readonly: Optional[bool] = None,
         executable: bool = False,
         marker: Optional[bool] = None,
+        stream: bool = False,
     ):
         """
         Initialize a TextFile.
@@ -37,6 +39,7 @@ class TextFile(FileBase):
         :param readonly: Whether the file should be readonly
         :param executable: Whether the file should be executable
         :param marker: Whether to add a marker to the file
+        :param stream: Whether to write the lines one by one instead of joining them in memory first
         """
         super().__init__(
             scope,
@@ -46,6 +49,7 @@ class TextFile(FileBase):
             readonly=readonly,
             executable=executable,
             marker=marker,
+            stream=stream,
         )
         self._lines: List[str] = lines or []
 
@@ -56,6 +60,7 @@ class TextFile(FileBase):
         :param line: the line to add (can use tokens)
         """
         self._lines.append(line)
+        self.mark_dirty()
 
     def synthesize_content(self, resolver: IResolver) -> Optional[str]:
         """
@@ -64,4 +69,19 @@ class TextFile(FileBase):
         :param resolver: The resolver to use
         :return: The synthesized content as a string, or None
         """
-        return "\n".join(self._lines)
+        return "\n".join(resolver.resolve(self._lines))
+
+    def synthesize_stream(self, resolver: IResolver, out: IO[str]) -> bool:
+        """
+        Write the lines of the text file into a text stream, one by one.
+
+        :param resolver: The resolver to use
+        :param out: The stream to write the content to
+        :return: Always True, a text file without lines is empty
+        """
+        separator = ""
+        for line in resolver.resolve(self._lines):
+            out.write(separator)
+            out.write(line)
+            separator = "\n"
+        return True
@@ -3,6 +3,7 @@
 
 from typing import (
     Any,
+    Dict,
     Optional,
 )
 
@@ -24,16 +25,17 @@ class TomlFile(ObjectFile):
     ):
         super().__init__(scope, file_path, obj, omit_empty, committed=committed, readonly=readonly)
 
-    def synthesize_content(self, resolver: Any) -> Optional[str]:
-        content = super().synthesize_content(resolver)
-        if content is None:
-            return None
+    @classmethod
+    def render_object(cls, obj: Any, marker: Optional[str], options: Dict[str, Any]) -> str:
+        toml_content = cls.dumps(obj, options)
 
-        toml_content = self.serialize(tomlkit.loads(content))
-
-        if self.marker:
-            return f"# {self.marker}\n\n{toml_content}"
+        if marker:
+            return f"# {marker}\n\n{toml_content}"
         return toml_content
 
     def serialize(self, obj: Any) -> str:
+        return self.dumps(obj, self.serializer_options())
+
+    @staticmethod
+    def dumps(obj: Any, options: Dict[str, Any]) -> str:
         return tomlkit.dumps(obj)
@@ -9,6 +9,12 @@ from .constructs import (
     try_find_closest,
 )
 
+# Import and export from ignore.py
+from .ignore import (
+    IgnoreMatcher,
+    rebase_pattern,
+)
+
 # Import and export from name.py
 from .name import (
     file_safe_name,
@@ -16,7 +22,10 @@ from .name import (
 )
 
 # Import and export from object.py
-from .object import remove_null_or_undefined_properties
+from .object import (
+    copy_tree,
+    remove_null_or_undefined_properties,
+)
 
 # Import and export from path.py
 from .path import ensure_relative_path_starts_with_dot
@@ -36,6 +45,7 @@ from .semver import (
 from .synth import (
     SnapshotOptions,
     directory_snapshot,
+    memory_snapshot,
     synth_snapshot,
 )
 
@@ -45,14 +55,17 @@ from .tasks import make_cross_platform
 # Add these new imports
 from .util import deep_merge  # Add this line
 from .util import (
+    APPEND_KEY,
     any_selected,
     assert_executable_permissions,
+    content_digest,
     decamelize,
     decamelize_keys_recursively,
     dedup_array,
     exec,
     exec_capture,
     exec_or_undefined,
+    file_digest,
     find_up,
     format_as_python_module,
     get_file_permissions,
@@ -70,6 +83,7 @@ from .util import (
     sorted_dict_or_list,
     try_read_file,
     try_read_file_sync,
+    try_stat,
     write_file,
 )
 
@@ -93,20 +107,30 @@ __all__ = [
     "parse_version",
     # object.py
     "remove_null_or_undefined_properties",
+    "copy_tree",
     # tasks.py
     "make_cross_platform",
     # synth.py
     "SnapshotOptions",
     "synth_snapshot",
     "directory_snapshot",
+    "memory_snapshot",
     # path.py
     "ensure_relative_path_starts_with_dot",
+    # ignore.py
+    "IgnoreMatcher",
+    "rebase_pattern",
     # name.py
     "workflow_name_for_project",
     "file_safe_name",
     # util.py
+    "APPEND_KEY",
+    "deep_merge",
     "is_writable",
     "normalize_persisted_path",
     "try_read_file_sync",
+    "try_stat",
+    "content_digest",
+    "file_digest",
     "write_file",
 ]
@@ -19,13 +19,8 @@ def try_find_closest(predicate: Callable[[Any], bool]) -> Callable[[Optional[Any
     def finder(construct: Optional[Any] = None) -> Optional[T]:
         if construct is None:
             return None
-        scopes = []
         if node := getattr(construct, "node", None):
-            scopes = node.scopes
-        # scopes = getattr(construct, 'node', {}).get('scopes', [])
-        for scope in reversed(scopes):
-            if predicate(scope):
-                return scope
+            return node.find_closest(predicate)
         return None
 
     return finder
@@ -0,0 +1,223 @@
+import re
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Pattern,
+    Tuple,
+)
+
+
+class IgnoreMatcher:
+    """
+    Matches paths against a list of gitignore-style patterns, compiled once into a single regex.
+
+    Supports comments, negation (`!`), directory-only patterns (trailing `/`), anchoring (a `/` at the
+    start or in the middle), `*`, `?`, character classes and `**`. As in git, the last matching pattern
+    wins, and a path inside an ignored directory cannot be re-included.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        """
+        Initialize an IgnoreMatcher.
+
+        :param patterns: The patterns, in the order they would appear in a .gitignore
+        """
+        parsed = [p for p in (self._parse(line) for line in patterns) if p is not None]
+        self._negated = [negated for _, negated, _ in parsed]
+        # files can only be matched by patterns that are not directory-only
+        self._file_regex = self._combine([(i, regex) for i, (regex, _, dir_only) in enumerate(parsed) if not dir_only])
+        self._dir_regex = self._combine([(i, regex) for i, (regex, _, _) in enumerate(parsed)])
+        self._file_groups = [i for i, (_, _, dir_only) in enumerate(parsed) if not dir_only]
+        self._dir_groups = list(range(len(parsed)))
+        self._dir_cache: Dict[str, bool] = {}
+
+    def is_ignored(self, path: str, is_dir: bool = False) -> bool:
+        """
+        Whether a path is ignored.
+
+        :param path: The path, relative to the directory of the patterns, with forward slashes
+        :param is_dir: Whether the path is a directory
+        :return: True if the path is ignored
+        """
+        path = path.strip("/")
+        if path.startswith("./"):
+            path = path[2:]
+        if not path:
+            return False
+
+        # a path inside an ignored directory is ignored, whatever the patterns say about the path itself
+        end = path.find("/")
+        while end != -1:
+            if self._is_dir_ignored(path[:end]):
+                return True
+            end = path.find("/", end + 1)
+
+        if is_dir:
+            return self._is_dir_ignored(path)
+        return self._decide(self._file_regex, self._file_groups, path) or False
+
+    def _is_dir_ignored(self, path: str) -> bool:
+        """
+        Whether a directory is ignored by its own patterns, not considering its parents. Cached, since
+        many paths share the same directories.
+
+        :param path: The directory path
+        :return: True if the directory is ignored
+        """
+        ignored = self._dir_cache.get(path)
+        if ignored is None:
+            ignored = self._decide(self._dir_regex, self._dir_groups, path) or False
+            self._dir_cache[path] = ignored
+        return ignored
+
+    def _decide(self, regex: Optional[Pattern], groups: List[int], path: str) -> Optional[bool]:
+        """
+        Apply the last pattern that matches a path.
+
+        :param regex: The combined regex, with one group per pattern, last pattern first
+        :param groups: The pattern index of each group, in pattern order
+        :param path: The path
+        :return: True if ignored, False if re-included, None if no pattern matches
+        """
+        if regex is None:
+            return None
+        match = regex.fullmatch(path)
+        if match is None:
+            return None
+        # groups are numbered from the last pattern, so the first alternative that matched is the last pattern
+        pattern_index = groups[len(groups) - match.lastindex]
+        return not self._negated[pattern_index]
+
+    @staticmethod
+    def _combine(regexes: List[Tuple[int, str]]) -> Optional[Pattern]:
+        """
+        Combine pattern regexes into one alternation, last pattern first, so the first alternative that
+        matches is the pattern that wins.
+
+        :param regexes: The pattern index and regex of each pattern
+        :return: The compiled regex, or None if there are no patterns
+        """
+        if not regexes:
+            return None
+        return re.compile("|".join(f"({regex})" for _, regex in reversed(regexes)))
+
+    @staticmethod
+    def _parse(line: str) -> Optional[Tuple[str, bool, bool]]:
+        """
+        Parse a gitignore line.
+
+        :param line: The line
+        :return: The regex, whether the pattern is negated and whether it only matches directories,
+            or None for comments and blank lines
+        """
+        # trailing spaces are ignored unless escaped
+        stripped = line.rstrip(" ")
+        if stripped.endswith("\\") and len(stripped) < len(line):
+            stripped += " "
+        line = stripped
+        if not line or line.startswith("#"):
+            return None
+
+        negated = line.startswith("!")
+        if negated:
+            line = line[1:]
+        elif line.startswith("\\!") or line.startswith("\\#"):
+            line = line[1:]
+
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            return None
+
+        # a pattern with a slash at the start or in the middle is relative to the root
+        anchored = "/" in line
+        line = line.lstrip("/")
+        body = _translate(line)
+        if anchored or body.startswith("(?:.*/)?"):
+            return body, negated, dir_only
+        return "(?:.*/)?" + body, negated, dir_only
+
+
+def _translate(pattern: str) -> str:
+    """
+    Translate the body of a gitignore pattern into a regex without capturing groups.
+
+    :param pattern: The pattern, without negation, leading or trailing slashes
+    :return: The regex
+    """
+    out = []
+    i = 0
+    n = len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            j = i
+            while j < n and pattern[j] == "*":
+                j += 1
+            at_start = i == 0 or pattern[i - 1] == "/"
+            at_end = j == n or pattern[j] == "/"
+            if j - i == 2 and at_start and at_end:
+                if j == n:
+                    # "/**" at the end, or "**" alone: everything inside
+                    out.append(".*")
+                else:
+                    # "**/" at the start or "/**/" in the middle: zero or more directories
+                    out.append("(?:.*/)?")
+                    j += 1
+            else:
+                out.append("[^/]*")
+            i = j
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[":
+            j = i + 1
+            if j < n and pattern[j] in "!^":
+                j += 1
+            if j < n and pattern[j] == "]":
+                j += 1
+            while j < n and pattern[j] != "]":
+                j += 1
+            if j >= n:
+                # no closing bracket, so it is a literal "["
+                out.append(re.escape(c))
+                i += 1
+            else:
+                content = pattern[i + 1 : j]
+                if content[0] in "!^":
+                    content = "^" + content[1:]
+                content = content.replace("\\", "\\\\")
+                out.append(f"[{content}]")
+                i = j + 1
+        elif c == "\\" and i + 1 < n:
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
+
+
+def rebase_pattern(pattern: str, prefix: str) -> str:
+    """
+    Rewrite a gitignore pattern of a subdirectory so it matches the same paths from a parent directory.
+
+    :param pattern: The pattern, relative to the subdirectory
+    :param prefix: The path of the subdirectory, relative to the parent directory, with forward slashes
+    :return: The pattern, relative to the parent directory
+    """
+    prefix = prefix.strip("/")
+    if not prefix or prefix == "." or not pattern.strip() or pattern.startswith("#"):
+        return pattern
+
+    negation = "!" if pattern.startswith("!") else ""
+    body = pattern[len(negation) :]
+    if "/" in body.rstrip("/"):
+        # anchored to the subdirectory
+        body = body.lstrip("/")
+    else:
+        # matches at any depth below the subdirectory
+        body = "**/" + body
+    return f"{negation}{prefix}/{body}"
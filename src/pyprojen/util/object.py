@@ -12,3 +12,29 @@ def remove_null_or_undefined_properties(obj: Dict[str, Any]) -> Dict[str, Any]:
     :return: A new dictionary with null or undefined properties removed
     """
     return {k: v for k, v in obj.items() if v is not None}
+
+
+def copy_tree(value: Any) -> Any:
+    """
+    Copy the dicts and lists of a JSON-like value, without recursion, so documents of any depth can be copied.
+
+    :param value: The value
+    :return: The copy, which shares everything but its dicts and lists with the value
+    """
+    if type(value) is not dict and type(value) is not list:
+        return value
+    root = {} if type(value) is dict else []
+    stack = [(value, root)]
+    while stack:
+        source, target = stack.pop()
+        items = source.items() if type(source) is dict else enumerate(source)
+        for k, v in items:
+            if type(v) is dict or type(v) is list:
+                child = {} if type(v) is dict else []
+                stack.append((v, child))
+                v = child
+            if type(target) is dict:
+                target[k] = v
+            else:
+                target.append(v)
+    return root
@@ -5,23 +5,32 @@ import tempfile
 from typing import (
     TYPE_CHECKING,
     Any,
+    Callable,
     Dict,
+    List,
+    Union,
 )
 
 if TYPE_CHECKING:
+    from pyprojen.output_backend import MemoryBackend
     from pyprojen.project import Project
 
 
 class SnapshotOptions:
     """Options for creating a snapshot."""
 
-    def __init__(self, parse_json: bool = True):
+    def __init__(self, parse_json: bool = True, incremental: bool = False, in_memory: bool = False):
         """
         Initialize SnapshotOptions.
 
         :param parse_json: Whether to parse JSON files
+        :param incremental: Whether to allow snapshotting a project that was already synthesized,
+            re-synthesizing only the files that changed since
+        :param in_memory: Whether to synthesize into a `MemoryBackend` instead of the outdir, skipping all disk I/O
         """
         self.parse_json = parse_json
+        self.incremental = incremental
+        self.in_memory = in_memory
 
 
 def synth_snapshot(project: "Project", options: SnapshotOptions = SnapshotOptions()) -> Dict[str, Any]:
@@ -33,13 +42,16 @@ def synth_snapshot(project: "Project", options: SnapshotOptions = SnapshotOption
     :return: A dictionary representing the snapshot
     """
     from pyprojen.json_file import JsonFile
+    from pyprojen.output_backend import MemoryBackend
 
-    if not project.outdir.startswith(tempfile.gettempdir()) and "project-temp-dir" not in project.outdir:
+    in_tmpdir = project.outdir.startswith(tempfile.gettempdir()) or "project-temp-dir" in project.outdir
+    if not options.in_memory and not in_tmpdir:
         raise ValueError(
-            "Trying to capture a snapshot of a project outside of tmpdir, which implies this test might corrupt an existing project"
+            "Trying to capture a snapshot of a project outside of tmpdir, "
+            "which implies this test might corrupt an existing project"
         )
 
-    if hasattr(project, "_synthed"):
+    if hasattr(project, "_synthed") and not options.incremental:
         raise ValueError("duplicate synth()")
 
     project._synthed = True
@@ -47,18 +59,23 @@ def synth_snapshot(project: "Project", options: SnapshotOptions = SnapshotOption
     old_env = os.environ.get("PROJEN_DISABLE_POST")
     try:
         os.environ["PROJEN_DISABLE_POST"] = "true"
-        project.synth()
+        backend = None
+        if options.in_memory:
+            # keep the backend, so an incremental snapshot sees the files of the previous one
+            backend = getattr(project, "_snapshot_backend", None) or MemoryBackend()
+            project._snapshot_backend = backend
+        project.synth(incremental=options.incremental, backend=backend)
         ignore_exts = ["png", "ico"]
-        return directory_snapshot(
-            project.outdir,
-            {
-                **options.__dict__,
-                "exclude_globs": [f"**/*.{ext}" for ext in ignore_exts],
-                "support_json_comments": any(
-                    getattr(file, "supports_comments", False) for file in project.files if isinstance(file, JsonFile)
-                ),
-            },
-        )
+        snapshot_options = {
+            **options.__dict__,
+            "exclude_globs": [f"**/*.{ext}" for ext in ignore_exts],
+            "support_json_comments": any(
+                getattr(file, "supports_comments", False) for file in project.files if isinstance(file, JsonFile)
+            ),
+        }
+        if backend is not None:
+            return memory_snapshot(backend, project.outdir, snapshot_options)
+        return directory_snapshot(project.outdir, snapshot_options)
     finally:
         if old_env is None:
             del os.environ["PROJEN_DISABLE_POST"]
@@ -74,29 +91,74 @@ def directory_snapshot(root: str, options: Dict[str, Any] = {}) -> Dict[str, Any
     :param options: Options for creating the snapshot
     :return: A dictionary representing the snapshot
     """
-    output = {}
     files = glob.glob("**", recursive=True, root_dir=root)
-    files = [
-        f
-        for f in files
-        if not f.startswith(".git/") and not any(f.endswith(ext) for ext in options.get("exclude_globs", []))
-    ]
 
+    def read(file: str) -> Union[str, bytes]:
+        path = os.path.join(root, file)
+        try:
+            with open(path, "r") as f:
+                return f.read()
+        except UnicodeDecodeError:
+            # binary files, like memory_snapshot returns them
+            with open(path, "rb") as f:
+                return f.read()
+
+    return _snapshot(
+        [f for f in files if os.path.isfile(os.path.join(root, f)) and not _is_excluded(f, options)],
+        read,
+        options,
+    )
+
+
+def memory_snapshot(backend: "MemoryBackend", root: str, options: Dict[str, Any] = {}) -> Dict[str, Any]:
+    """
+    Create a snapshot of the files a `MemoryBackend` holds under a directory, like `directory_snapshot`
+    would for the same files on disk.
+
+    :param backend: The backend holding the files
+    :param root: The root directory to snapshot
+    :param options: Options for creating the snapshot
+    :return: A dictionary representing the snapshot
+    """
+    files = backend.files_under(root)
+    # like the "**" glob of directory_snapshot, skip hidden files and directories
+    visible = [f for f in files if not any(part.startswith(".") for part in f.split("/"))]
+    return _snapshot([f for f in visible if not _is_excluded(f, options)], files.__getitem__, options)
+
+
+def _is_excluded(file: str, options: Dict[str, Any]) -> bool:
+    """
+    Whether a file is excluded from snapshots.
+
+    :param file: The path of the file, relative to the snapshot root
+    :param options: Options for creating the snapshot
+    :return: True if the file is excluded
+    """
+    return file.startswith(".git/") or any(file.endswith(ext) for ext in options.get("exclude_globs", []))
+
+
+def _snapshot(files: List[str], read: Callable[[str], Union[str, bytes]], options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Create a snapshot of a list of files.
+
+    :param files: The paths of the files, relative to the snapshot root
+    :param read: Returns the content of a file
+    :param options: Options for creating the snapshot
+    :return: A dictionary representing the snapshot
+    """
+    output = {}
     parse_json = options.get("parse_json", True)
 
     for file in files:
-        file_path = os.path.join(root, file)
-        if os.path.isfile(file_path):
-            if options.get("only_file_names", False):
-                output[file] = True
-            else:
-                with open(file_path, "r") as f:
-                    content = f.read()
-                    if parse_json and file.lower().endswith((".json", ".json5", ".jsonc")):
-                        try:
-                            content = json.loads(content)
-                        except json.JSONDecodeError:
-                            pass  # Keep content as string if it's not valid JSON
-                output[file] = content
+        if options.get("only_file_names", False):
+            output[file] = True
+        else:
+            content = read(file)
+            if parse_json and file.lower().endswith((".json", ".json5", ".jsonc")):
+                try:
+                    content = json.loads(content)
+                except json.JSONDecodeError:
+                    pass  # Keep content as string if it's not valid JSON
+            output[file] = content
 
     return output
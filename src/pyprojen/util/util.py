@@ -1,3 +1,4 @@
+import hashlib
 import os
 import platform
 import re
@@ -7,10 +8,17 @@ from typing import (
     Dict,
     List,
     Optional,
+    Tuple,
+    Union,
 )
 
+from .object import copy_tree
+
 MAX_BUFFER = 10 * 1024 * 1024
 
+# bytes read at a time to compute the digest of a file
+DIGEST_CHUNK_SIZE = 1024 * 1024
+
 
 def exec(command: str, options: Dict[str, Any]) -> None:
     # logging.debug(command)
@@ -110,42 +118,81 @@ def is_object(x: Any) -> bool:
     return isinstance(x, dict) and x.__class__ == dict
 
 
+# an override value of the form {APPEND_KEY: [...]} appends to an array instead of replacing it
+APPEND_KEY = "__$APPEND"
+
+
 def deep_merge(objects: List[Optional[Dict[str, Any]]], destructive: bool = False) -> Dict[str, Any]:
     """
-    Recursively merge objects together.
+    Merge objects together, in a single pass over each source, without recursion.
+
+    The first object is updated in place. Dicts are merged key by key, other values replace what is
+    there, and `{"__$APPEND": [...]}` appends to an existing array (or sets it). Values are copied from
+    the other objects, so the result never shares dicts or lists with them.
 
     :param objects: List of objects to merge
-    :param destructive: Whether to delete keys with None values
+    :param destructive: Whether to delete keys with None values, and dicts that end up empty
     :return: Merged dictionary
     """
-
-    def merge_one(target: Dict[str, Any], source: Dict[str, Any]) -> None:
-        for key, value in source.items():
-            if isinstance(value, dict):
-                if not isinstance(target.get(key), dict):
-                    target[key] = value
-                if "__$APPEND" in value and isinstance(value["__$APPEND"], list):
-                    if isinstance(target.get(key), list):
-                        target[key].extend(value["__$APPEND"])
-                    else:
-                        target[key] = value["__$APPEND"]
-                merge_one(target[key], value)
-                if isinstance(target[key], dict) and len(target[key]) == 0 and destructive:
-                    del target[key]
-            elif value is None and destructive:
-                del target[key]
-            elif value is not None:
-                target[key] = value
-
     others = [obj for obj in objects if obj is not None]
     if not others:
         return {}
     into, *rest = others
     for other in rest:
-        merge_one(into, other)
+        _merge_one(into, other, destructive)
     return into
 
 
+def _merge_one(target: Dict[str, Any], source: Dict[str, Any], destructive: bool):
+    """
+    Merge a source object into a target object.
+
+    :param target: The object to update
+    :param source: The object to merge into it
+    :param destructive: Whether to delete keys with None values, and dicts that end up empty
+    """
+    # (False, target dict, source dict, whether the target was created by this merge) to merge, or
+    # (True, parent, key, None) to delete a merged dict that ended up empty
+    stack: List[Tuple[bool, Any, Any, Any]] = [(False, target, source, False)]
+    while stack:
+        prune, a, b, created = stack.pop()
+        if prune:
+            merged = a.get(b)
+            if isinstance(merged, dict) and not merged:
+                del a[b]
+            continue
+
+        target, source = a, b
+        nested = []
+        for key, value in source.items():
+            if isinstance(value, dict):
+                appended = value.get(APPEND_KEY)
+                if isinstance(appended, list):
+                    if isinstance(target.get(key), list):
+                        target[key].extend(copy_tree(appended))
+                    else:
+                        target[key] = copy_tree(appended)
+                    continue
+                existing = target.get(key)
+                if not isinstance(existing, dict):
+                    target[key] = {}
+                nested.append((key, target[key], value, created or not isinstance(existing, dict)))
+            elif value is None:
+                if destructive:
+                    target.pop(key, None)
+                elif created:
+                    # a new subtree is a copy of the source, None values included
+                    target[key] = None
+            else:
+                target[key] = copy_tree(value)
+
+        # merge nested dicts in order, each one before the next, like a recursive merge would
+        for key, child_target, child_source, child_created in reversed(nested):
+            if destructive:
+                stack.append((True, target, key, None))
+            stack.append((False, child_target, child_source, child_created))
+
+
 def dedup_array(array: List[Any]) -> List[Any]:
     return list(dict.fromkeys(array))
 
@@ -216,6 +263,34 @@ def try_read_file_sync(file: str) -> Optional[str]:
         return f.read()
 
 
+def try_stat(file: str) -> Optional[os.stat_result]:
+    try:
+        return os.stat(file)
+    except FileNotFoundError:
+        return None
+
+
+def content_digest(content: Union[str, bytes]) -> str:
+    return hashlib.sha256(content.encode("utf-8") if isinstance(content, str) else content).hexdigest()
+
+
+def file_digest(file: str) -> Optional[str]:
+    """
+    The digest of a file, like `content_digest` of its content, read in chunks.
+
+    :param file: The path of the file
+    :return: The hex sha256 digest, or None if there is no such file
+    """
+    sha256 = hashlib.sha256()
+    try:
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(DIGEST_CHUNK_SIZE), b""):
+                sha256.update(chunk)
+    except FileNotFoundError:
+        return None
+    return sha256.hexdigest()
+
+
 def is_writable(file: str) -> bool:
     return os.access(file, os.W_OK)
 
@@ -0,0 +1,330 @@
+"""
+Watch mode: re-run `.pyprojenrc.py` in a warm interpreter whenever it or a local module it imports changes.
+
+Third-party modules (pyyaml, tomlkit, pyprojen itself, ...) stay imported between runs. Only the changed
+local modules, and the local modules that import from them, are re-imported before the config runs again.
+"""
+import ast
+import ctypes
+import ctypes.util
+import logging
+import os
+import runpy
+import select
+import struct
+import sys
+import time
+import traceback
+from abc import (
+    ABC,
+    abstractmethod,
+)
+from types import ModuleType
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+)
+
+DEFAULT_RC_FILE = ".pyprojenrc.py"
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_INOTIFY_EVENT = struct.Struct("iIII")
+_INOTIFY_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+# time to wait for more events after the first one, so an editor's save counts as one change
+DEBOUNCE_SECONDS = 0.05
+
+
+class Watcher(ABC):
+    """Waits for changes to a set of files."""
+
+    @abstractmethod
+    def wait(self, paths: Set[str], timeout: Optional[float] = None) -> Set[str]:
+        """
+        Block until at least one of the files changes.
+
+        :param paths: Absolute paths of the files to watch
+        :param timeout: Seconds to wait at most, or None to wait forever
+        :return: The changed files, empty if the timeout expired
+        """
+
+    def close(self):
+        """
+        Release the resources of the watcher.
+        """
+
+
+class PollingWatcher(Watcher):
+    """Detects changes by comparing file mtimes at a fixed interval."""
+
+    def __init__(self, interval: float = 0.5):
+        """
+        Initialize a PollingWatcher.
+
+        :param interval: Seconds between two polls
+        """
+        self.interval = interval
+        self._mtimes: Dict[str, Optional[int]] = {}
+
+    def wait(self, paths: Set[str], timeout: Optional[float] = None) -> Set[str]:
+        for path in paths - self._mtimes.keys():
+            self._mtimes[path] = _mtime(path)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = set()
+            for path in paths:
+                mtime = _mtime(path)
+                if mtime != self._mtimes.get(path):
+                    self._mtimes[path] = mtime
+                    changed.add(path)
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            time.sleep(self.interval)
+
+
+class InotifyWatcher(Watcher):
+    """
+    Detects changes with Linux inotify, watching the directories of the files so atomic saves are seen.
+
+    A single inotify instance is kept for the lifetime of the watcher, so changes made between two calls
+    to `wait` (e.g. while the config runs) are reported by the next call.
+    """
+
+    def __init__(self):
+        """
+        Initialize an InotifyWatcher.
+
+        :raises OSError: If inotify is not available
+        """
+        libc_name = ctypes.util.find_library("c")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True) if libc_name else None
+        if self._libc is None or not hasattr(self._libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watched_dirs: Dict[int, str] = {}
+
+    @staticmethod
+    def is_available() -> bool:
+        """
+        Whether inotify can be used on this platform.
+
+        :return: True if inotify is available
+        """
+        if not sys.platform.startswith("linux"):
+            return False
+        try:
+            InotifyWatcher().close()
+        except OSError:
+            return False
+        return True
+
+    def wait(self, paths: Set[str], timeout: Optional[float] = None) -> Set[str]:
+        if self._fd < 0:
+            raise ValueError("wait on a closed watcher")
+        watched = set(self._watched_dirs.values())
+        for directory in {os.path.dirname(p) for p in paths} - watched:
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _INOTIFY_MASK)
+            if wd >= 0:
+                self._watched_dirs[wd] = directory
+
+        # events that queued up since the last call come first
+        changed = {p for p in self._read_events(self._fd, self._watched_dirs) if p in paths}
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not changed:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not select.select([self._fd], [], [], remaining)[0]:
+                return set()
+            time.sleep(DEBOUNCE_SECONDS)
+            changed = {p for p in self._read_events(self._fd, self._watched_dirs) if p in paths}
+        return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    @staticmethod
+    def _read_events(fd: int, watched_dirs: Dict[int, str]) -> Iterable[str]:
+        """
+        Drain the pending inotify events.
+
+        :param fd: The inotify file descriptor
+        :param watched_dirs: Map of watch descriptor to directory
+        :return: The paths named by the events
+        """
+        paths = []
+        while True:
+            try:
+                data = os.read(fd, 64 * 1024)
+            except BlockingIOError:
+                return paths
+            offset = 0
+            while offset < len(data):
+                wd, _, _, name_len = _INOTIFY_EVENT.unpack_from(data, offset)
+                offset += _INOTIFY_EVENT.size
+                name = data[offset : offset + name_len].rstrip(b"\0")
+                offset += name_len
+                if wd in watched_dirs and name:
+                    paths.append(os.path.join(watched_dirs[wd], os.fsdecode(name)))
+
+
+def create_watcher(poll: bool = False, interval: float = 0.5) -> Watcher:
+    """
+    Create the best available watcher.
+
+    :param poll: Whether to force polling
+    :param interval: Seconds between two polls, if polling
+    :return: An inotify watcher where available, a polling watcher otherwise
+    """
+    if not poll and InotifyWatcher.is_available():
+        return InotifyWatcher()
+    return PollingWatcher(interval)
+
+
+def local_modules(root_dir: str) -> Dict[str, ModuleType]:
+    """
+    The imported modules whose source lives in `root_dir`, excluding installed packages and virtual envs.
+
+    :param root_dir: The project directory
+    :return: Map of module name to module
+    """
+    root_dir = os.path.abspath(root_dir) + os.sep
+    result = {}
+    for name, module in list(sys.modules.items()):
+        file = getattr(module, "__file__", None)
+        if not file:
+            continue
+        file = os.path.abspath(file)
+        if file.startswith(root_dir) and "site-packages" not in file and name != "__main__":
+            result[name] = module
+    return result
+
+
+def invalidate_modules(changed_files: Set[str], root_dir: str) -> List[str]:
+    """
+    Remove the local modules defined in the changed files from `sys.modules`, along with the local
+    modules that (transitively) import from them, so the next import loads them fresh.
+
+    :param changed_files: Absolute paths of the changed source files
+    :param root_dir: The project directory
+    :return: The names of the removed modules
+    """
+    modules = local_modules(root_dir)
+    stale = {name for name, module in modules.items() if os.path.abspath(module.__file__) in changed_files}
+
+    # a module that imported from a stale module would keep using the old code
+    imports = {name: _imported_module_names(module) for name, module in modules.items()}
+    grew = True
+    while grew:
+        grew = False
+        for name in modules:
+            if name not in stale and not imports[name].isdisjoint(stale):
+                stale.add(name)
+                grew = True
+
+    for name in stale:
+        sys.modules.pop(name, None)
+    return sorted(stale)
+
+
+def run_config(rc_file: str) -> Set[str]:
+    """
+    Run the config script as `__main__` and collect the files to watch.
+
+    :param rc_file: Path to the config script
+    :return: Absolute paths of the config script and the local modules it imported
+    """
+    rc_file = os.path.abspath(rc_file)
+    root_dir = os.path.dirname(rc_file)
+    if root_dir not in sys.path:
+        sys.path.insert(0, root_dir)
+    try:
+        runpy.run_path(rc_file, run_name="__main__")
+    except SystemExit:
+        pass
+    except Exception:
+        traceback.print_exc()
+    return {rc_file} | {os.path.abspath(m.__file__) for m in local_modules(root_dir).values()}
+
+
+def watch(rc_file: str = DEFAULT_RC_FILE, watcher: Optional[Watcher] = None, max_runs: Optional[int] = None):
+    """
+    Synthesize the project, then re-synthesize whenever the config or a local module it imports changes.
+
+    :param rc_file: Path to the config script
+    :param watcher: The watcher to use, defaults to `create_watcher()`
+    :param max_runs: Stop after this many runs, or None to watch until interrupted
+    """
+    owns_watcher = watcher is None
+    watcher = watcher or create_watcher()
+    root_dir = os.path.dirname(os.path.abspath(rc_file))
+    runs = 0
+    try:
+        paths = run_config(rc_file)
+        runs += 1
+        while max_runs is None or runs < max_runs:
+            changed = watcher.wait(paths)
+            start = time.perf_counter()
+            reimported = invalidate_modules(changed, root_dir)
+            logging.info(f"changed: {', '.join(sorted(changed))}; re-importing: {', '.join(reimported) or '-'}")
+            paths = run_config(rc_file)
+            runs += 1
+            print(f"re-synthesized in {(time.perf_counter() - start) * 1000:.0f}ms")
+    finally:
+        if owns_watcher:
+            watcher.close()
+
+
+def _mtime(path: str) -> Optional[int]:
+    """
+    The mtime of a file, or None if it does not exist.
+
+    :param path: The file path
+    :return: The mtime in nanoseconds
+    """
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _imported_module_names(module: ModuleType) -> Set[str]:
+    """
+    The names of the modules that a module imports, according to its source.
+
+    :param module: The module to inspect
+    :return: The imported module names, including the candidate submodules of `from x import y`
+    """
+    try:
+        with open(module.__file__, "r") as f:
+            tree = ast.parse(f.read())
+    except (OSError, SyntaxError, ValueError):
+        return set()
+
+    package = module.__package__ or ""
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = node.module or ""
+            if node.level:
+                parent = package.rsplit(".", node.level - 1)[0] if node.level > 1 else package
+                base = f"{parent}.{base}" if base else parent
+            names.add(base)
+            names.update(f"{base}.{alias.name}" for alias in node.names)
+    return names
@@ -2,7 +2,9 @@
 # SPDX-License-Identifier: MPL-2.0
 
 from typing import (
+    IO,
     Any,
+    Dict,
     Optional,
 )
 
@@ -26,20 +28,31 @@ class YamlFile(ObjectFile):
         *,
         committed: bool = True,
         readonly: bool = True,
+        stream: bool = False,
     ):
-        super().__init__(scope, file_path, obj, omit_empty, committed=committed, readonly=readonly)
+        super().__init__(scope, file_path, obj, omit_empty, committed=committed, readonly=readonly, stream=stream)
         self.line_width = line_width
 
-    def synthesize_content(self, resolver: Any) -> Optional[str]:
-        content = super().synthesize_content(resolver)
-        if content is None:
-            return None
+    def serializer_options(self) -> Dict[str, Any]:
+        return {"line_width": self.line_width}
 
-        yaml_content = self.serialize(yaml.safe_load(content))
+    @classmethod
+    def render_object(cls, obj: Any, marker: Optional[str], options: Dict[str, Any]) -> str:
+        yaml_content = cls.dumps(obj, options)
 
-        if self.marker:
-            return f"# {self.marker}\n\n{yaml_content}"
+        if marker:
+            return f"# {marker}\n\n{yaml_content}"
         return yaml_content
 
+    @classmethod
+    def render_object_to(cls, obj: Any, marker: Optional[str], options: Dict[str, Any], out: IO[str]):
+        if marker:
+            out.write(f"# {marker}\n\n")
+        yaml.dump(obj, out, default_flow_style=False, width=options["line_width"])
+
     def serialize(self, obj: Any) -> str:
-        return yaml.dump(obj, default_flow_style=False, width=self.line_width)
+        return self.dumps(obj, self.serializer_options())
+
+    @staticmethod
+    def dumps(obj: Any, options: Dict[str, Any]) -> str:
+        return yaml.dump(obj, default_flow_style=False, width=options["line_width"])
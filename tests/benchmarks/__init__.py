@@ -0,0 +1,7 @@
+"""
+Benchmarks for pyprojen.
+
+These are marked as `slow`, so `make test-quick` skips them. Run them with `-s` to see the timings, e.g.
+
+    python -m pytest tests/benchmarks -s
+"""
@@ -0,0 +1,86 @@
+import json
+import time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+)
+
+import pytest
+import tomlkit
+import yaml
+
+from pyprojen.json_file import JsonFile
+from pyprojen.object_file import ObjectFile
+from pyprojen.project import Project
+from pyprojen.toml_file import TomlFile
+from pyprojen.yaml_file import YamlFile
+
+NUM_ENTRIES = 1000
+
+# the parser of each format, for the old pipeline that serialized the object, parsed its output back and
+# serialized the parsed object again
+ROUND_TRIPS: Dict[type, Callable[[str], Any]] = {
+    JsonFile: json.loads,
+    YamlFile: yaml.safe_load,
+    TomlFile: tomlkit.loads,
+}
+
+
+def _make_document() -> Dict[str, Any]:
+    """A CI-workflow-like document with a large matrix."""
+    return {
+        "name": "ci",
+        "jobs": {
+            "test": {
+                "runs-on": "ubuntu-latest",
+                "strategy": {
+                    "matrix": {
+                        "include": [
+                            {"python": f"3.{i % 5 + 8}", "os": f"os-{i}", "shard": i, "fast": i % 2 == 0}
+                            for i in range(NUM_ENTRIES)
+                        ]
+                    }
+                },
+            }
+        },
+    }
+
+
+def _best_of(fn: Callable[[], Any], repeat: int = 3) -> float:
+    """Return the fastest of several timed runs."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("file_type", [JsonFile, YamlFile, TomlFile], ids=lambda t: t.__name__)
+def test__single_serialization_speedup(test_project: Project, file_type: type, monkeypatch):
+    """Compare rendering an object file once against the previous serialize -> parse -> serialize pipeline."""
+    # GIVEN: An object file with a large document
+    file: ObjectFile = file_type(test_project, f"bench.{file_type.__name__.lower()}", _make_document())
+    options = file.serializer_options()
+
+    def render_once():
+        file.create_render_job(None).render()
+
+    def render_with_round_trip():
+        job = file.create_render_job(None)
+        job.obj = ROUND_TRIPS[file_type](file_type.dumps(job.obj, options))
+        job.render()
+
+    # WHEN: Timing both pipelines, and counting the serializations of a render
+    single = _best_of(render_once)
+    round_trip = _best_of(render_with_round_trip)
+    dumps = file_type.dumps
+    calls = []
+    monkeypatch.setattr(file_type, "dumps", staticmethod(lambda obj, options: calls.append(1) or dumps(obj, options)))
+    render_once()
+
+    # THEN: A render serializes the object exactly once; the timings are only reported, as they vary between runs
+    print(f"\n{file_type.__name__}: {single * 1000:.1f}ms vs {round_trip * 1000:.1f}ms ({round_trip / single:.1f}x)")
+    assert len(calls) == 1
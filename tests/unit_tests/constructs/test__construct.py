@@ -0,0 +1,140 @@
+import sys
+
+import pytest
+
+from pyprojen.constructs import (
+    Construct,
+    ConstructOrder,
+)
+from pyprojen.project import Project
+from pyprojen.textfile import TextFile
+from pyprojen.util.constructs import find_closest_project
+
+
+def test__scopes_path_and_depth():
+    """Test that the ancestry of a construct is reported from the root down."""
+    # GIVEN: A three-level construct tree
+    root = Construct(None, "")
+    child = Construct(root, "child")
+    grandchild = Construct(child, "grandchild")
+
+    # THEN: Ancestry, path and depth are derived from the tree
+    assert grandchild.node.scopes == (root, child, grandchild)
+    assert grandchild.node.root is root
+    assert grandchild.node.path == "child/grandchild"
+    assert grandchild.node.depth == 2
+    assert root.node.depth == 0
+
+
+def test__reparenting_invalidates_cached_ancestry():
+    """Test that moving a subtree to another scope refreshes the cached ancestry of the whole subtree."""
+    # GIVEN: A subtree whose ancestry has been cached
+    root = Construct(None, "")
+    old_parent = Construct(root, "old")
+    new_parent = Construct(root, "new")
+    child = Construct(old_parent, "child")
+    grandchild = Construct(child, "grandchild")
+    assert grandchild.node.path == "old/child/grandchild"
+
+    # WHEN: The subtree is moved under another scope
+    child.node.scope = new_parent
+
+    # THEN: The subtree moved between the children of the two scopes, and the cached ancestry of all
+    # descendants is refreshed
+    assert old_parent.node.children == []
+    assert new_parent.node.children == [child]
+    assert list(root.node.find_all()) == [root, old_parent, new_parent, child, grandchild]
+    assert child.node.scopes == (root, new_parent, child)
+    assert grandchild.node.path == "new/child/grandchild"
+    assert grandchild.node.depth == 3
+
+
+def test__reparenting_onto_taken_id_fails():
+    """Test that a construct cannot be moved to a scope that already has a child with its ID."""
+    # GIVEN: Two scopes with a child of the same ID
+    root = Construct(None, "")
+    child = Construct(Construct(root, "a"), "child")
+    other = Construct(root, "b")
+    Construct(other, "child")
+
+    # WHEN/THEN: Moving one child next to the other fails, and leaves it where it was
+    with pytest.raises(ValueError, match="There is already a Construct with name 'child'"):
+        child.node.scope = other
+    assert child.node.path == "a/child"
+
+
+def test__find_closest_project(test_project: Project):
+    """Test that files resolve the closest project, even when nested in a subproject."""
+    # GIVEN: A file nested in a construct inside a subproject
+    subproject = Project(name="sub", parent=test_project, outdir="sub")
+    scope = Construct(subproject, "scope")
+    text_file = TextFile(scope=scope, file_path="foo.txt")
+
+    # THEN: The closest project is the subproject
+    assert find_closest_project(scope) is subproject
+    assert text_file.project is subproject
+    assert subproject.root is test_project
+    assert test_project.node.find_closest(Project.is_project) is test_project
+
+
+def test__find_all_order():
+    """Test that the tree can be traversed in pre-order and post-order."""
+    # GIVEN: A small construct tree
+    root = Construct(None, "")
+    a = Construct(root, "a")
+    a1 = Construct(a, "a1")
+    a2 = Construct(a, "a2")
+    b = Construct(root, "b")
+
+    # THEN: Both traversal orders visit children in insertion order
+    assert list(root.node.find_all()) == [root, a, a1, a2, b]
+    assert list(root.node.find_all(ConstructOrder.POSTORDER)) == [a1, a2, a, b, root]
+
+
+def test__find_all_deep_tree():
+    """Test that traversing a very deep tree does not hit the recursion limit."""
+    # GIVEN: A construct chain deeper than the recursion limit
+    root = Construct(None, "")
+    leaf = root
+    for i in range(sys.getrecursionlimit() + 100):
+        leaf = Construct(leaf, f"c{i}")
+
+    # THEN: Both traversal orders reach every construct
+    assert next(root.node.find_all(ConstructOrder.POSTORDER)) is leaf
+    assert sum(1 for _ in root.node.find_all()) == sys.getrecursionlimit() + 101
+
+
+def test__find_all_matching_stops_early():
+    """Test that filtered traversal is lazy and can skip subtrees."""
+    # GIVEN: A tree with two branches
+    root = Construct(None, "")
+    a = Construct(root, "a")
+    Construct(a, "a1")
+    b = Construct(root, "b")
+    b1 = Construct(b, "b1")
+    visited = []
+
+    def is_b(construct) -> bool:
+        visited.append(construct)
+        return construct.node.id.startswith("b")
+
+    # WHEN: Taking only the first match, without descending into "a"
+    first = next(root.node.find_all_matching(is_b, descend=lambda c: c is not a))
+
+    # THEN: Traversal stopped at the first match and never visited the skipped subtree
+    assert first is b
+    assert visited == [root, a, b]
+    assert list(root.node.find_all_matching(is_b, descend=lambda c: c is not a)) == [b, b1]
+
+
+def test__project_components_and_files(test_project: Project):
+    """Test that a project yields its own components, and files of all its subprojects."""
+    # GIVEN: A project with a file and a subproject with a file
+    subproject = Project(name="sub", parent=test_project, outdir="sub")
+    root_file = TextFile(scope=test_project, file_path="foo.txt")
+    sub_file = TextFile(scope=subproject, file_path="bar.txt")
+
+    # THEN: Components stop at subprojects, files do not
+    assert list(test_project.find_all_components()) == [test_project.gitignore, root_file]
+    assert list(test_project.find_all_files()) == [test_project.gitignore, subproject.gitignore, sub_file, root_file]
+    assert list(test_project.node.find_all_of_type(TextFile)) == [sub_file, root_file]
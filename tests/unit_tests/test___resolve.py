@@ -0,0 +1,140 @@
+import random
+import re
+from typing import (
+    Any,
+    Dict,
+)
+
+import pytest
+
+from pyprojen._resolve import (
+    is_resolvable,
+    resolve,
+)
+from pyprojen.json_file import JsonFile
+from pyprojen.project import Project
+from pyprojen.util.synth import synth_snapshot
+
+
+def recursive_resolve(value: Any, options: Dict[str, Any] = {}) -> Any:
+    """The original recursive resolve, as a reference."""
+    args = options.get("args", [])
+    omit_empty = options.get("omit_empty", False)
+
+    match value:
+        case None:
+            return None
+        case _ if is_resolvable(value):
+            return recursive_resolve(value.to_json(), options)
+        case re.Pattern():
+            if value.flags:
+                raise ValueError("RegExp with flags should be explicitly converted to a string")
+            return value.pattern
+        case set():
+            return recursive_resolve(list(value), options)
+        case dict():
+            result = {}
+            for k, v in value.items():
+                resolved = recursive_resolve(v, options)
+                if resolved is not None:
+                    result[k] = resolved
+            return None if omit_empty and not result else result
+        case list():
+            resolved = [x for x in (recursive_resolve(v, options) for v in value) if x is not None]
+            return None if omit_empty and not resolved else resolved
+        case _ if callable(value):
+            return recursive_resolve(value(*args), options)
+        case _:
+            return value
+
+
+class Token:
+    def __init__(self, value: Any):
+        self.value = value
+
+    def to_json(self) -> Any:
+        return self.value
+
+
+def _random_value(rng: random.Random, depth: int = 0) -> Any:
+    """A random value, mixing containers, lazy values and scalars."""
+    choice = rng.randint(0, 9 if depth < 4 else 3)
+    if choice == 0:
+        return rng.choice([None, 1, 2.5, True, "s", re.compile(b"a+"), (1, 2)])
+    if choice == 1:
+        return rng.choice([[], {}, set()])
+    if choice == 2:
+        return rng.choice([1, "x"])
+    if choice == 3:
+        return {3, 4}
+    if choice in (4, 5):
+        return {f"k{i}": _random_value(rng, depth + 1) for i in range(rng.randint(0, 4))}
+    if choice in (6, 7):
+        return [_random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    inner = _random_value(rng, depth + 1)
+    return Token(inner) if choice == 8 else (lambda *args: args or inner)
+
+
+@pytest.mark.parametrize("options", [{}, {"omit_empty": True}, {"args": [1]}, {"memo": {}}])
+def test__resolve_matches_recursive_resolve(options):
+    """Test that the iterative resolve produces exactly what the recursive implementation did."""
+    rng = random.Random(3)
+    for _ in range(500):
+        # GIVEN: A random document
+        value = _random_value(rng)
+
+        # WHEN/THEN: Both implementations resolve it to the same value
+        assert resolve(value, options) == recursive_resolve(value, options)
+
+
+def test__resolve_deep_document():
+    """Test that documents deeper than the recursion limit can be resolved."""
+    # GIVEN: A document nested 100000 levels deep
+    value: Any = {"leaf": lambda: 1}
+    for _ in range(100_000):
+        value = {"a": [value]}
+
+    # WHEN: It is resolved
+    resolved = resolve(value, {"memo": {}})
+
+    # THEN: The leaf was resolved
+    for _ in range(100_000):
+        resolved = resolved["a"][0]
+    assert resolved == {"leaf": 1}
+
+
+def test__memo_resolves_shared_objects_once():
+    """Test that a container shared between resolutions is resolved once, and every caller gets its own copy."""
+    # GIVEN: A shared dict with a lazy value, referenced by two objects
+    calls = []
+    shared = {"version": lambda: calls.append(1) or "1.0", "nested": {"list": [1]}}
+    memo = {}
+
+    # WHEN: Both objects are resolved with the same memo
+    first = resolve({"a": shared}, {"memo": memo})
+    second = resolve({"b": shared}, {"memo": memo})
+    first["a"]["nested"]["list"].append(2)
+
+    # THEN: The lazy value was evaluated once, and modifying one result does not change the other
+    assert len(calls) == 1
+    assert second == {"b": {"version": "1.0", "nested": {"list": [1]}}}
+    assert resolve({"c": shared}, {"memo": memo})["c"]["nested"]["list"] == [1]
+
+
+def test__synth_resolves_shared_objects_once(test_project: Project):
+    """Test that an object shared by files of several projects is resolved once per synth."""
+    # GIVEN: Files in a project and its subproject that share a dict with a lazy value
+    calls = []
+    shared = {"version": lambda: calls.append(1) or "1.0"}
+    subproject = Project(name="sub", parent=test_project, outdir="sub")
+    for i in range(3):
+        JsonFile(test_project, f"root{i}.json", {"shared": shared})
+        JsonFile(subproject, f"sub{i}.json", {"shared": shared})
+
+    # WHEN: The project is synthesized
+    output = synth_snapshot(test_project)
+
+    # THEN: The lazy value was evaluated once, and every file has it
+    assert len(calls) == 1
+    assert output["root0.json"]["shared"] == output["sub/sub2.json"]["shared"] == {"version": "1.0"}
+    assert test_project._resolver is None
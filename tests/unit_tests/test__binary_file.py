@@ -0,0 +1,73 @@
+import json
+import os
+import stat
+
+from pyprojen.binary_file import BinaryFile
+from pyprojen.common import (
+    FILE_MANIFEST,
+    FILE_STATE,
+)
+from pyprojen.file import Lazy
+from pyprojen.project import Project
+from pyprojen.util.synth import (
+    SnapshotOptions,
+    synth_snapshot,
+)
+
+# not valid UTF-8, and full of newlines that must not be translated
+DATA = bytes(range(256)) * 4 + b"\r\n\x00\xff"
+
+
+def test__binary_file_is_written_as_is(tmp_path):
+    """Test that a binary file is written byte for byte, and recorded in the manifest like other files."""
+    # GIVEN: A project with a binary file
+    project = Project(name="binary", outdir=str(tmp_path))
+    BinaryFile(project, "assets/logo.bin", DATA)
+
+    # WHEN: The project is synthesized
+    project.synth()
+
+    # THEN: The file has the exact bytes, is readonly and managed by the manifest
+    assert (tmp_path / "assets/logo.bin").read_bytes() == DATA
+    assert stat.S_IMODE(os.stat(tmp_path / "assets/logo.bin").st_mode) == 0o444
+    with open(tmp_path / FILE_MANIFEST) as f:
+        manifest = json.load(f)
+    with open(tmp_path / FILE_STATE) as f:
+        state = json.load(f)
+    assert "assets/logo.bin" in manifest["files"]
+    assert state["entries"]["assets/logo.bin"]["size"] == len(DATA)
+
+
+def test__unchanged_binary_file_is_kept(tmp_path):
+    """Test that a binary file with the same content is not rewritten, and a removed one is cleaned up."""
+    # GIVEN: A project that was synthesized with two binary files
+    project = Project(name="binary", outdir=str(tmp_path))
+    BinaryFile(project, "a.bin", DATA)
+    BinaryFile(project, "b.bin", DATA)
+    project.synth()
+    inode = os.stat(tmp_path / "a.bin").st_ino
+
+    # WHEN: The project is synthesized again with one of the files, produced by a lazy value
+    project = Project(name="binary", outdir=str(tmp_path))
+    binary_file = BinaryFile(project, "a.bin", Lazy(lambda: DATA))
+    project.synth()
+
+    # THEN: The file was kept as it was, and the other one was removed
+    assert binary_file.changed is False
+    assert os.stat(tmp_path / "a.bin").st_ino == inode
+    assert not (tmp_path / "b.bin").exists()
+
+
+def test__binary_file_in_memory(test_project: Project):
+    """Test that a binary file can be synthesized in memory, and changed for an incremental synth."""
+    # GIVEN: A binary file
+    binary_file = BinaryFile(test_project, "data.bin", DATA)
+
+    # WHEN: The project is synthesized in memory, before and after the content is changed
+    first = synth_snapshot(test_project, SnapshotOptions(in_memory=True))["data.bin"]
+    binary_file.set_data(b"\x00")
+    second = synth_snapshot(test_project, SnapshotOptions(in_memory=True, incremental=True))["data.bin"]
+
+    # THEN: Both snapshots have the bytes
+    assert first == DATA
+    assert second == b"\x00"
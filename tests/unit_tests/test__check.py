@@ -0,0 +1,127 @@
+import os
+import runpy
+from pathlib import Path
+
+from pyprojen.cli import main
+from pyprojen.common import FILE_MANIFEST
+from pyprojen.json_file import JsonFile
+from pyprojen.project import Project
+from pyprojen.textfile import TextFile
+from pyprojen.util.synth import directory_snapshot
+
+
+def _build_project(outdir: str, version: str, with_legacy: bool) -> Project:
+    """Build a project with a json file and optional extra files."""
+    project = Project(name="checked", outdir=outdir)
+    JsonFile(project, "package.json", {"version": version})
+    TextFile(scope=project, file_path="unchanged.txt", lines=["same"], readonly=True)
+    if with_legacy:
+        TextFile(scope=project, file_path="legacy.txt", lines=["legacy"], readonly=True)
+    else:
+        TextFile(scope=project, file_path="new.txt", lines=["new"], readonly=True)
+    return project
+
+
+def test__dry_run_of_synthesized_project_is_up_to_date(tmp_path):
+    """Test that a dry run right after a synth reports nothing."""
+    # GIVEN: A synthesized project
+    _build_project(str(tmp_path), "1.0.0", with_legacy=True).synth()
+
+    # WHEN: The same project is checked
+    report = _build_project(str(tmp_path), "1.0.0", with_legacy=True).check(max_workers=4)
+
+    # THEN: Everything is up to date
+    assert report.up_to_date
+    assert report.format() == ""
+
+
+def test__dry_run_reports_without_writing(tmp_path):
+    """Test that a dry run reports added, changed and orphaned files, and leaves the outdir alone."""
+    # GIVEN: A synthesized project, and a changed config
+    _build_project(str(tmp_path), "1.0.0", with_legacy=True).synth()
+    before = directory_snapshot(str(tmp_path))
+    manifest = (tmp_path / FILE_MANIFEST).read_text()
+    project = _build_project(str(tmp_path), "2.0.0", with_legacy=False)
+
+    # WHEN: The changed project is synthesized with dry_run
+    report = project.synth(dry_run=True)
+
+    # THEN: The differences are reported, and nothing was written or removed
+    assert report.added == ["new.txt"]
+    assert report.changed == [".gitignore", FILE_MANIFEST, "package.json"]
+    assert report.orphaned == ["legacy.txt"]
+    assert not report.up_to_date
+    assert directory_snapshot(str(tmp_path)) == before
+    assert (tmp_path / FILE_MANIFEST).read_text() == manifest
+
+    # WHEN: The project is then synthesized for real, incrementally
+    project.synth(incremental=True)
+
+    # THEN: The dry run did not count as a synth
+    assert sorted(directory_snapshot(str(tmp_path))) == ["new.txt", "package.json", "unchanged.txt"]
+
+
+def _tree_state(root: Path) -> dict:
+    """The content and mtime of every file under a directory, including hidden ones."""
+    state = {}
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = Path(dirpath) / filename
+            state[str(path.relative_to(root))] = (path.read_bytes(), path.stat().st_mtime_ns)
+    return state
+
+
+def test__check_leaves_render_cache_alone(tmp_path):
+    """Test that checking a project with a render cache leaves the outdir byte-for-byte unchanged."""
+
+    def build(outdir: Path, version: str) -> Project:
+        project = Project(name="cached", outdir=str(outdir), render_cache=True)
+        JsonFile(project, "package.json", {"version": version})
+        return project
+
+    # GIVEN: An empty outdir, and an outdir synthesized with a render cache
+    empty = tmp_path / "empty"
+    empty.mkdir()
+    synthesized = tmp_path / "synthesized"
+    build(synthesized, "1.0.0").synth()
+    before = _tree_state(synthesized)
+
+    # WHEN: Projects with cached and uncached renderings are checked, in and out of process
+    build(empty, "1.0.0").check()
+    build(synthesized, "1.0.0").check()
+    build(synthesized, "2.0.0").check()
+    build(synthesized, "2.0.0").synth(render_processes=2, dry_run=True)
+
+    # THEN: Neither outdir changed, not even the cache
+    assert _tree_state(empty) == {}
+    assert _tree_state(synthesized) == before
+
+
+RC_FILE = """
+from pyprojen.json_file import JsonFile
+from pyprojen.project import Project
+
+if __name__ == "__main__":
+    project = Project(name="cli", outdir={outdir!r})
+    JsonFile(project, "package.json", {{"version": "1.0.0"}})
+    project.synth()
+"""
+
+
+def test__cli_check(tmp_path: Path, capsys):
+    """Test that `pyprojen check` fails while generated files are out of date."""
+    # GIVEN: A config script whose project was never synthesized
+    outdir = tmp_path / "out"
+    rc_file = tmp_path / ".pyprojenrc.py"
+    rc_file.write_text(RC_FILE.format(outdir=str(outdir)))
+
+    # THEN: The check fails, and does not write anything
+    assert main(["check", str(rc_file)]) == 1
+    assert "added: package.json" in capsys.readouterr().err
+    assert not os.path.exists(outdir / "package.json")
+
+    # WHEN: The project is synthesized
+    runpy.run_path(str(rc_file), run_name="__main__")
+
+    # THEN: The check passes
+    assert main(["check", str(rc_file)]) == 0
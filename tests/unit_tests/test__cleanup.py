@@ -0,0 +1,213 @@
+import json
+import os
+
+from pyprojen.cleanup import find_generated_files
+from pyprojen.common import (
+    FILE_MANIFEST,
+    GENERATED_FILE_MARKER,
+    PYPROJEN_MARKER,
+)
+from pyprojen.json_file import JsonFile
+from pyprojen.project import Project
+from pyprojen.textfile import TextFile
+from pyprojen.util.ignore import IgnoreMatcher
+
+
+def _synth(outdir: str, files: list, exclude: list = []) -> Project:
+    """Synthesize a project with readonly text files."""
+    project = Project(name="cleaned", outdir=outdir)
+    for file in files:
+        TextFile(scope=project, file_path=file, lines=[file], readonly=True)
+    project.add_exclude_from_cleanup(*exclude)
+    project.synth()
+    return project
+
+
+def _write_readonly(path, content: str):
+    """Write a file and make it readonly, like pyprojen writes generated files."""
+    path.write_text(content)
+    os.chmod(path, 0o444)
+
+
+def test__orphaned_files_are_removed(tmp_path):
+    """Test that files that are no longer generated are removed."""
+    # GIVEN: A synthesized project
+    _synth(str(tmp_path), ["a.txt", "b.txt"])
+
+    # WHEN: One of its files is no longer generated
+    _synth(str(tmp_path), ["a.txt"])
+
+    # THEN: It was removed
+    assert os.path.exists(tmp_path / "a.txt")
+    assert not os.path.exists(tmp_path / "b.txt")
+
+
+def test__orphans_replaced_by_directories_are_kept(tmp_path):
+    """Test that cleanup never removes a directory, even if a file of the same name was generated before."""
+    # GIVEN: A synthesized project whose file was replaced by a directory with user files
+    _synth(str(tmp_path), ["a.txt", "b"])
+    os.chmod(tmp_path / "b", 0o644)
+    os.remove(tmp_path / "b")
+    (tmp_path / "b").mkdir()
+    (tmp_path / "b/notes.md").write_text("mine")
+
+    # WHEN: The file is no longer generated
+    project = _synth(str(tmp_path), ["a.txt"])
+
+    # THEN: The directory was kept, and reported as a failure
+    assert (tmp_path / "b/notes.md").read_text() == "mine"
+    assert list(project.cleanup_stats.failures) == [str(tmp_path / "b")]
+
+
+def test__excluded_files_are_kept(tmp_path):
+    """Test that orphaned files matching `add_exclude_from_cleanup` globs are kept."""
+    # GIVEN: A synthesized project
+    _synth(str(tmp_path), ["a.txt", "docs/b.md", "docs/c.txt", "keep/d.txt", "keep/e.txt"])
+
+    # WHEN: All files but one are no longer generated, and some are excluded from cleanup
+    _synth(str(tmp_path), ["a.txt"], exclude=["*.md", "keep/", "!keep/e.txt"])
+
+    # THEN: Only the orphaned files that are not excluded were removed
+    assert os.path.exists(tmp_path / "docs/b.md")
+    assert not os.path.exists(tmp_path / "docs/c.txt")
+    assert os.path.exists(tmp_path / "keep/d.txt")
+    # (files inside an excluded directory cannot be re-included)
+    assert os.path.exists(tmp_path / "keep/e.txt")
+
+
+def test__cleanup_prunes_empty_dirs_and_reports_stats(tmp_path):
+    """Test that directories left empty are pruned, and that the cleanup reports what it did."""
+    # GIVEN: A synthesized project with nested files, and a user file next to one of them
+    _synth(str(tmp_path), ["a.txt", "gone/deep/b.txt", "gone/c.txt", "kept/d.txt"])
+    (tmp_path / "kept/user.txt").write_text("not generated")
+
+    # WHEN: The nested files are no longer generated
+    project = _synth(str(tmp_path), ["a.txt"])
+
+    # THEN: The empty directories were pruned, the directory with a user file was kept
+    assert not os.path.exists(tmp_path / "gone")
+    assert os.path.exists(tmp_path / "kept/user.txt")
+    stats = project.cleanup_stats
+    assert sorted(os.path.relpath(f, tmp_path) for f in stats.files_removed) == [
+        "gone/c.txt",
+        "gone/deep/b.txt",
+        "kept/d.txt",
+    ]
+    assert sorted(os.path.relpath(d, tmp_path) for d in stats.dirs_pruned) == ["gone", "gone/deep"]
+    assert stats.failures == {}
+    assert stats.seconds > 0
+
+
+def test__parallel_cleanup(tmp_path):
+    """Test that orphaned files are removed on a thread pool."""
+    # GIVEN: A synthesized project with many files
+    files = [f"dir{i % 7}/file{i}.txt" for i in range(500)]
+    _synth(str(tmp_path), files)
+
+    # WHEN: Most are no longer generated, and the project is synthesized on a thread pool
+    project = Project(name="cleaned", outdir=str(tmp_path))
+    TextFile(scope=project, file_path=files[0], lines=[files[0]], readonly=True)
+    project.synth(max_workers=4)
+
+    # THEN: All orphans were removed
+    assert len(project.cleanup_stats.files_removed) == 499
+    assert sorted(os.listdir(tmp_path)) == [".gitignore", ".pyprojen", "dir0"]
+    assert os.listdir(tmp_path / "dir0") == ["file0.txt"]
+
+
+def test__find_generated_files(tmp_path):
+    """Test that the legacy scan finds readonly files with the marker where pyprojen writes it."""
+    # GIVEN: Generated files with the marker line at the start or the "//" key at the end, and files to leave alone
+    (tmp_path / "src/nested").mkdir(parents=True)
+    (tmp_path / ".git").mkdir()
+    (tmp_path / "vendor").mkdir()
+    _write_readonly(tmp_path / "config.yaml", f"# {GENERATED_FILE_MARKER}\na: 1\n")
+    big = {f"key{i}": "x" * 20 for i in range(1000)}
+    _write_readonly(tmp_path / "src/nested/package.json", json.dumps({**big, "//": GENERATED_FILE_MARKER}, indent=2))
+    _write_readonly(tmp_path / "src/user.py", "print('hello')\n" * 1000)
+    _write_readonly(tmp_path / ".git/config", f"# {GENERATED_FILE_MARKER}\n")
+    _write_readonly(tmp_path / "vendor/lib.txt", f"# {GENERATED_FILE_MARKER}\n")
+    _write_readonly(tmp_path / "notes.md", f"# {GENERATED_FILE_MARKER}\n")
+
+    # WHEN: Scanning for generated files, excluding some
+    found = find_generated_files(str(tmp_path), IgnoreMatcher(["vendor/", "*.md"]), max_workers=4)
+
+    # THEN: Only the generated files outside of .git and the excluded paths are found
+    assert [os.path.relpath(f, tmp_path) for f in found] == ["config.yaml", "src/nested/package.json"]
+
+
+def test__legacy_scan_leaves_other_files_alone(tmp_path):
+    """Test that the legacy scan skips virtualenvs and dependencies, and files that merely mention pyprojen."""
+    # GIVEN: pyprojen's own sources in a virtualenv, dependencies, and a hand-written file about pyprojen
+    site_packages = tmp_path / ".venv/lib/python3.11/site-packages/pyprojen"
+    site_packages.mkdir(parents=True)
+    _write_readonly(site_packages / "common.py", f"PYPROJEN_MARKER = {PYPROJEN_MARKER!r}\n")
+    _write_readonly(site_packages / "file.py", f"# {GENERATED_FILE_MARKER}\n")
+    (tmp_path / "env").mkdir()
+    (tmp_path / "env/pyvenv.cfg").write_text("home = /usr/bin\n")
+    _write_readonly(tmp_path / "env/generated.txt", f"# {GENERATED_FILE_MARKER}\n")
+    (tmp_path / "node_modules/pkg").mkdir(parents=True)
+    _write_readonly(tmp_path / "node_modules/pkg/index.js", f"// {GENERATED_FILE_MARKER}\n")
+    (tmp_path / "docs").mkdir()
+    _write_readonly(tmp_path / "docs/README.md", f"These files are {PYPROJEN_MARKER}.\n")
+
+    # WHEN: A project without a manifest is synthesized
+    _synth(str(tmp_path), ["a.txt"])
+
+    # THEN: None of those files were removed
+    assert (site_packages / "common.py").exists()
+    assert (site_packages / "file.py").exists()
+    assert (tmp_path / "env/generated.txt").exists()
+    assert (tmp_path / "node_modules/pkg/index.js").exists()
+    assert (tmp_path / "docs/README.md").exists()
+
+
+def test__legacy_scan_requires_marker_in_place(tmp_path):
+    """Test that the legacy scan leaves files alone that contain the marker text elsewhere, or are writable."""
+    # GIVEN: Readonly files that mention the marker in code or in a nested key, and a writable generated file
+    _write_readonly(tmp_path / "test__json_file.py", f"MARKER = {GENERATED_FILE_MARKER!r}\n")
+    _write_readonly(tmp_path / "notes.yaml", f"a: 1\n# {GENERATED_FILE_MARKER}\n")
+    _write_readonly(tmp_path / "nested.json", json.dumps({"a": {"//": GENERATED_FILE_MARKER}}, indent=2))
+    (tmp_path / "edited.yaml").write_text(f"# {GENERATED_FILE_MARKER}\na: 1\n")
+    _write_readonly(tmp_path / "generated.yaml", f"# {GENERATED_FILE_MARKER}\na: 1\n")
+
+    # WHEN: Scanning for generated files
+    found = find_generated_files(str(tmp_path), IgnoreMatcher([]))
+
+    # THEN: Only the readonly file with the marker line at its top is found
+    assert [os.path.relpath(f, tmp_path) for f in found] == ["generated.yaml"]
+
+
+def test__legacy_scan_only_runs_on_disk(tmp_path):
+    """Test that check mode does not report generated files as orphaned when there is no manifest."""
+    # GIVEN: A synthesized project whose manifest is gone
+    _synth(str(tmp_path), ["a.txt"])
+    os.remove(tmp_path / FILE_MANIFEST)
+
+    # WHEN: A project that no longer has that file is checked
+    project = Project(name="cleaned", outdir=str(tmp_path))
+    report = project.check()
+
+    # THEN: Nothing is reported as orphaned, and the file is still there
+    assert report.orphaned == []
+    assert (tmp_path / "a.txt").exists()
+
+
+def test__cleanup_without_manifest_removes_generated_files(tmp_path):
+    """Test that a project without a manifest removes the files generated by an earlier synth."""
+    # GIVEN: A synthesized project whose manifest is gone, and a user file
+    project = Project(name="legacy", outdir=str(tmp_path))
+    JsonFile(project, "old.json", {"a": 1})
+    project.synth()
+    os.remove(tmp_path / FILE_MANIFEST)
+    (tmp_path / "user.json").write_text("{}")
+
+    # WHEN: A project that no longer has that file is synthesized
+    project = Project(name="legacy", outdir=str(tmp_path))
+    JsonFile(project, "new.json", {"b": 2})
+    project.synth()
+
+    # THEN: The old generated file was removed, the user file was kept
+    assert not os.path.exists(tmp_path / "old.json")
+    assert os.path.exists(tmp_path / "new.json")
+    assert os.path.exists(tmp_path / "user.json")
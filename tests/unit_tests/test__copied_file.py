@@ -0,0 +1,160 @@
+import os
+import stat
+
+import pytest
+
+from pyprojen.copied_file import (
+    CopiedDirectory,
+    CopiedFile,
+)
+from pyprojen.output_backend import DiskBackend
+from pyprojen.project import Project
+
+DATA = bytes(range(256)) * 1024
+
+
+@pytest.fixture
+def source(tmp_path) -> str:
+    """A binary file to copy, with an mtime in the past."""
+    path = tmp_path / "source" / "logo.png"
+    path.parent.mkdir()
+    path.write_bytes(DATA)
+    os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+    return str(path)
+
+
+@pytest.fixture
+def digests(monkeypatch) -> list:
+    """Record the files whose digest is computed to compare them."""
+    computed = []
+    digest = DiskBackend.digest
+
+    def record_digest(self, file_path: str):
+        computed.append(os.path.basename(file_path))
+        return digest(self, file_path)
+
+    monkeypatch.setattr(DiskBackend, "digest", record_digest)
+    return computed
+
+
+def _synth_copy(outdir: str, source: str) -> CopiedFile:
+    """Synthesize a fresh project with a single copied file."""
+    project = Project(name="copied", outdir=outdir)
+    copied_file = CopiedFile(project, "assets/logo.png", source)
+    project.synth()
+    return copied_file
+
+
+def test__copied_file(tmp_path, source: str):
+    """Test that a file is copied byte for byte, keeping the mtime of the source."""
+    # WHEN: A project with a copied file is synthesized
+    _synth_copy(str(tmp_path / "out"), source)
+
+    # THEN: The copy has the content and mtime of the source, and is readonly
+    copy = tmp_path / "out" / "assets" / "logo.png"
+    assert copy.read_bytes() == DATA
+    assert os.stat(copy).st_mtime_ns == os.stat(source).st_mtime_ns
+    assert stat.S_IMODE(os.stat(copy).st_mode) == 0o444
+
+
+def test__unchanged_copy_is_not_read(tmp_path, source: str, digests: list):
+    """Test that a copy with the size and mtime of its source is neither read nor copied again."""
+    # GIVEN: A project that was synthesized before
+    _synth_copy(str(tmp_path / "out"), source)
+    inode = os.stat(tmp_path / "out" / "assets" / "logo.png").st_ino
+
+    # WHEN: The same project is synthesized again
+    copied_file = _synth_copy(str(tmp_path / "out"), source)
+
+    # THEN: The copy was kept without comparing its content
+    assert copied_file.changed is False
+    assert digests == []
+    assert os.stat(tmp_path / "out" / "assets" / "logo.png").st_ino == inode
+
+
+def test__touched_copy_is_compared_by_digest(tmp_path, source: str, digests: list):
+    """Test that a copy with the content but not the mtime of its source is compared by digest, once."""
+    # GIVEN: A copy whose mtime changed since it was synthesized, e.g. by a checkout
+    _synth_copy(str(tmp_path / "out"), source)
+    copy = tmp_path / "out" / "assets" / "logo.png"
+    os.utime(copy, ns=(2_000_000_000, 2_000_000_000))
+
+    # WHEN: The project is synthesized twice
+    first = _synth_copy(str(tmp_path / "out"), source)
+    second = _synth_copy(str(tmp_path / "out"), source)
+
+    # THEN: The copy was kept, and only read by the first synth, which recorded its digest
+    assert first.changed is False
+    assert second.changed is False
+    assert digests == ["logo.png"]
+    assert os.stat(copy).st_mtime_ns == 2_000_000_000
+
+
+def test__changed_source_is_copied(tmp_path, source: str):
+    """Test that a changed source is copied again, also by an incremental synth."""
+    # GIVEN: A project that was synthesized before
+    project = Project(name="copied", outdir=str(tmp_path / "out"))
+    CopiedFile(project, "logo.png", source, executable=True)
+    project.synth()
+
+    # WHEN: The source changes, without changing its size, and the project is synthesized incrementally
+    with open(source, "r+b") as f:
+        f.write(b"\xff")
+    project.synth(incremental=True)
+
+    # THEN: The new content was copied
+    assert (tmp_path / "out" / "logo.png").read_bytes() == b"\xff" + DATA[1:]
+    assert stat.S_IMODE(os.stat(tmp_path / "out" / "logo.png").st_mode) == 0o544
+
+
+def test__copied_directory(tmp_path):
+    """Test that the files of a directory are copied, except excluded ones, and removed files are cleaned up."""
+    # GIVEN: A template directory with nested and excluded files
+    template = tmp_path / "template"
+    (template / "docs" / "img").mkdir(parents=True)
+    (template / "build").mkdir()
+    (template / "README.md").write_text("readme")
+    (template / "run.sh").write_text("echo hi")
+    os.chmod(template / "run.sh", 0o755)
+    (template / "docs" / "img" / "logo.png").write_bytes(DATA)
+    (template / "docs" / "notes.tmp").write_text("tmp")
+    (template / "build" / "out.whl").write_bytes(DATA)
+
+    def synth() -> Project:
+        project = Project(name="copied", outdir=str(tmp_path / "out"))
+        CopiedDirectory(project, "template", str(template), exclude=["*.tmp", "build/"])
+        project.synth()
+        return project
+
+    # WHEN: The directory is copied, and copied again after a file is removed from it
+    synth()
+    copied = sorted(
+        os.path.relpath(os.path.join(root, name), tmp_path / "out" / "template")
+        for root, _, files in os.walk(tmp_path / "out" / "template")
+        for name in files
+    )
+    os.remove(template / "README.md")
+    synth()
+
+    # THEN: Only the files that were not excluded were copied, and the removed file was cleaned up
+    assert copied == ["README.md", "docs/img/logo.png", "run.sh"]
+    assert (tmp_path / "out" / "template" / "docs" / "img" / "logo.png").read_bytes() == DATA
+    assert stat.S_IMODE(os.stat(tmp_path / "out" / "template" / "run.sh").st_mode) == 0o544
+    assert not (tmp_path / "out" / "template" / "README.md").exists()
+
+
+def test__copy_check(tmp_path, source: str):
+    """Test that check mode reports a copy that is out of date, without copying it."""
+    # GIVEN: A project that was synthesized before, whose source changed since
+    _synth_copy(str(tmp_path / "out"), source)
+    with open(source, "ab") as f:
+        f.write(b"more")
+
+    # WHEN: The project is checked
+    project = Project(name="copied", outdir=str(tmp_path / "out"))
+    CopiedFile(project, "assets/logo.png", source)
+    report = project.check()
+
+    # THEN: The copy is reported as changed, and was left as it was
+    assert report.changed == ["assets/logo.png"]
+    assert (tmp_path / "out" / "assets" / "logo.png").read_bytes() == DATA
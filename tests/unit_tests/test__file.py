@@ -0,0 +1,264 @@
+import json
+import os
+
+import pytest
+
+from pyprojen.common import (
+    FILE_MANIFEST,
+    FILE_STATE,
+)
+from pyprojen.file import (
+    Lazy,
+    SynthResolver,
+)
+from pyprojen.json_file import JsonFile
+from pyprojen.output_backend import DiskBackend
+from pyprojen.project import Project
+from pyprojen.textfile import TextFile
+from pyprojen.util.synth import synth_snapshot
+from pyprojen.yaml_file import YamlFile
+
+
+def _synth_text_file(outdir: str, lines: list) -> TextFile:
+    """Synthesize a fresh project with a single text file."""
+    project = Project(name="test-project", outdir=outdir)
+    text_file = TextFile(scope=project, file_path="hello/foo.txt", lines=lines)
+    project.synth()
+    return text_file
+
+
+@pytest.fixture
+def read_files(monkeypatch) -> list:
+    """Record the files that are read back for comparison."""
+    reads = []
+
+    read = DiskBackend.read
+    content_equals = DiskBackend.content_equals
+    digest = DiskBackend.digest
+
+    def record(file_path: str):
+        # the manifest and the state cannot record their own state, so they are always read
+        if not file_path.endswith((FILE_MANIFEST, FILE_STATE)):
+            reads.append(os.path.basename(file_path))
+
+    def record_read(self, file_path: str):
+        record(file_path)
+        return read(self, file_path)
+
+    def record_content_equals(self, file_path: str, data: bytes):
+        record(file_path)
+        return content_equals(self, file_path, data)
+
+    def record_digest(self, file_path: str):
+        record(file_path)
+        return digest(self, file_path)
+
+    monkeypatch.setattr(DiskBackend, "read", record_read)
+    monkeypatch.setattr(DiskBackend, "content_equals", record_content_equals)
+    monkeypatch.setattr(DiskBackend, "digest", record_digest)
+    return reads
+
+
+def test__state_records_file_state(tmp_path):
+    """Test that the uncommitted state records the size, mtime and digest of each synthesized file."""
+    # WHEN: A project is synthesized
+    _synth_text_file(str(tmp_path), ["line 1"])
+
+    # THEN: The state has an entry matching the file on disk, and the manifest only lists the managed files
+    with open(tmp_path / FILE_MANIFEST) as f:
+        manifest = json.load(f)
+    with open(tmp_path / FILE_STATE) as f:
+        entry = json.load(f)["entries"]["hello/foo.txt"]
+    stat = os.stat(tmp_path / "hello/foo.txt")
+    assert manifest["files"] == [".gitignore"]  # text files are not readonly by default
+    assert "entries" not in manifest
+    assert "/.pyprojen/cache/" in (tmp_path / ".gitignore").read_text().splitlines()
+    assert entry["size"] == stat.st_size == len("line 1")
+    assert entry["mtime"] == stat.st_mtime_ns
+    assert len(entry["sha256"]) == 64
+
+
+def test__manifest_does_not_change_when_files_are_touched(tmp_path):
+    """Test that the committed manifest stays the same when only the mtimes of the files change."""
+    # GIVEN: A synthesized project whose file was touched since
+    _synth_text_file(str(tmp_path), ["line 1"])
+    manifest_stat = os.stat(tmp_path / FILE_MANIFEST)
+    os.utime(tmp_path / "hello/foo.txt", ns=(1_000_000_000, 1_000_000_000))
+
+    # WHEN: The project is synthesized again
+    _synth_text_file(str(tmp_path), ["line 1"])
+
+    # THEN: The manifest was not rewritten
+    assert os.stat(tmp_path / FILE_MANIFEST).st_mtime_ns == manifest_stat.st_mtime_ns
+
+
+def test__unchanged_file_is_not_read(tmp_path, read_files: list):
+    """Test that re-synthesizing unchanged files does not read them back."""
+    # GIVEN: A project that was synthesized before
+    _synth_text_file(str(tmp_path), ["line 1"])
+    read_files.clear()
+
+    # WHEN: The same project is synthesized again
+    text_file = _synth_text_file(str(tmp_path), ["line 1"])
+
+    # THEN: Nothing is read or written
+    assert read_files == []
+    assert text_file.changed is False
+
+
+def test__modified_file_is_compared(tmp_path, read_files: list):
+    """Test that a file touched since the last synth is compared and restored."""
+    # GIVEN: A synthesized file that was modified on disk
+    _synth_text_file(str(tmp_path), ["line 1"])
+    file_path = tmp_path / "hello/foo.txt"
+    file_path.write_text("line 2")
+    read_files.clear()
+
+    # WHEN: The project is synthesized again
+    text_file = _synth_text_file(str(tmp_path), ["line 1"])
+
+    # THEN: The file is read back and restored
+    assert read_files == ["foo.txt"]
+    assert text_file.changed is True
+    assert file_path.read_text() == "line 1"
+
+
+def test__file_of_other_size_is_not_compared(tmp_path, read_files: list):
+    """Test that a file touched since the last synth is not read back if its size differs."""
+    # GIVEN: A synthesized file that was modified on disk, changing its size
+    _synth_text_file(str(tmp_path), ["line 1"])
+    file_path = tmp_path / "hello/foo.txt"
+    file_path.write_text("line 1\n")
+    read_files.clear()
+
+    # WHEN: The project is synthesized again
+    text_file = _synth_text_file(str(tmp_path), ["line 1"])
+
+    # THEN: The file is restored without being read
+    assert read_files == []
+    assert text_file.changed is True
+    assert file_path.read_text() == "line 1"
+
+
+def test__changed_content_is_written(tmp_path, read_files: list):
+    """Test that new content is written without reading the old file when the digest differs."""
+    # GIVEN: A project that was synthesized before
+    _synth_text_file(str(tmp_path), ["line 1"])
+    read_files.clear()
+
+    # WHEN: The content of the file changes
+    text_file = _synth_text_file(str(tmp_path), ["line 1", "line 2"])
+
+    # THEN: The file is rewritten
+    assert text_file.changed is True
+    assert (tmp_path / "hello/foo.txt").read_text() == "line 1\nline 2"
+
+
+def test__lazy_is_evaluated_once_per_synth(test_project: Project):
+    """Test that a lazy value shared by text and object files of several projects is evaluated once per synth."""
+    # GIVEN: A lazy value used by files of a project and its subproject, synthesized on several threads
+    calls = []
+    version = Lazy(lambda: calls.append(1) or "1.2.3", name="version")
+    subproject = Project(name="sub", parent=test_project, outdir="sub")
+    TextFile(test_project, "VERSION", lines=["version:", version])
+    for i in range(5):
+        JsonFile(subproject, f"file{i}.json", {"version": version})
+
+    # WHEN: The project is synthesized twice
+    test_project.synth(max_workers=4)
+    test_project.synth(max_workers=4)
+
+    # THEN: The value was evaluated once per synth, and every file has it
+    assert len(calls) == 2
+    output = synth_snapshot(test_project)
+    assert output["VERSION"] == "version:\n1.2.3"
+    assert output["sub/file4.json"]["version"] == "1.2.3"
+
+
+def test__lazy_cycle_is_detected():
+    """Test that lazy values that need each other fail instead of recursing forever."""
+    # GIVEN: Lazy values that refer to each other, through their values and through the resolver
+    resolver = SynthResolver()
+    a = Lazy(lambda: {"b": b}, name="a")
+    b = Lazy(lambda: [a], name="b")
+    c = Lazy(lambda: resolver.resolve(d), name="c")
+    d = Lazy(lambda: resolver.resolve(c), name="d")
+
+    # WHEN/THEN: Resolving them raises an error
+    with pytest.raises(ValueError, match="contains itself"):
+        resolver.resolve({"a": a})
+    with pytest.raises(ValueError, match="Cycle between lazy values: Lazy\\(c\\) -> Lazy\\(d\\) -> Lazy\\(c\\)"):
+        resolver.resolve(c)
+
+
+def _synth_files(outdir: str, stream: bool) -> Project:
+    """Synthesize a fresh project with text, json, jsonc and yaml files, streamed or not."""
+    project = Project(name="test-project", outdir=outdir)
+    obj = {"name": "foo", "items": [{"id": i, "tags": ["a", "ü"]} for i in range(2000)], "empty": {}}
+    TextFile(project, "data.txt", lines=[f"line {i}" for i in range(5000)], stream=stream)
+    JsonFile(project, "data.json", obj, stream=stream).add_override("extra.key", True)
+    JsonFile(project, "data.jsonc", obj, newline=False, stream=stream)
+    YamlFile(project, "data.yaml", obj, stream=stream)
+    JsonFile(project, "empty.json", {}, omit_empty=True, stream=stream)
+    project.synth()
+    return project
+
+
+def test__streamed_files_match_rendered_files(tmp_path):
+    """Test that streaming a file writes exactly what rendering it in memory writes, and records the same digest."""
+    # WHEN: The same files are synthesized with and without streaming
+    _synth_files(str(tmp_path / "rendered"), stream=False)
+    _synth_files(str(tmp_path / "streamed"), stream=True)
+
+    # THEN: The files and manifests are identical, and no temp files are left behind
+    for name in ["data.txt", "data.json", "data.jsonc", "data.yaml"]:
+        assert (tmp_path / "streamed" / name).read_bytes() == (tmp_path / "rendered" / name).read_bytes()
+    assert not (tmp_path / "streamed" / "empty.json").exists()
+    with open(tmp_path / "rendered" / FILE_STATE) as f:
+        rendered_entries = json.load(f)["entries"]
+    with open(tmp_path / "streamed" / FILE_STATE) as f:
+        streamed_entries = json.load(f)["entries"]
+    assert {k: v["sha256"] for k, v in streamed_entries.items()} == {
+        k: v["sha256"] for k, v in rendered_entries.items()
+    }
+    assert sorted(os.listdir(tmp_path / "streamed")) == sorted(os.listdir(tmp_path / "rendered"))
+
+
+def test__unchanged_streamed_file_is_kept(tmp_path, read_files: list):
+    """Test that a streamed file with the same digest as the existing file is not replaced."""
+    # GIVEN: Streamed files that were synthesized before, one of them modified on disk since
+    _synth_files(str(tmp_path), stream=True)
+    stat = os.stat(tmp_path / "data.json")
+    os.chmod(tmp_path / "data.txt", 0o644)
+    (tmp_path / "data.txt").write_text("modified")
+    read_files.clear()
+
+    # WHEN: The same files are synthesized again
+    project = _synth_files(str(tmp_path), stream=True)
+
+    # THEN: The untouched file is still the same file, the modified one was restored, and neither was read
+    assert os.stat(tmp_path / "data.json").st_ino == stat.st_ino
+    assert os.stat(tmp_path / "data.json").st_mtime_ns == stat.st_mtime_ns
+    assert (tmp_path / "data.txt").read_text().startswith("line 0\nline 1\n")
+    assert read_files == []
+    changed = {file.path: file.changed for file in project.files}
+    assert changed["data.json"] is False
+    assert changed["data.txt"] is True
+
+
+def test__streamed_file_of_another_size_is_not_read(tmp_path, read_files: list):
+    """Test that a streamed file is replaced without reading the existing file if their sizes differ."""
+    # GIVEN: A streamed file that was replaced on disk by a readonly file of another size
+    _synth_files(str(tmp_path), stream=True)
+    os.chmod(tmp_path / "data.txt", 0o644)
+    (tmp_path / "data.txt").write_text("modified")
+    os.chmod(tmp_path / "data.txt", 0o444)
+    read_files.clear()
+
+    # WHEN: The same files are synthesized again
+    project = _synth_files(str(tmp_path), stream=True)
+
+    # THEN: The file was restored without being read
+    assert (tmp_path / "data.txt").read_text().startswith("line 0\nline 1\n")
+    assert read_files == []
+    assert project.try_find_file("data.txt").changed is True
@@ -0,0 +1,128 @@
+import random
+
+from pyprojen.ignore_file import IgnoreFile
+from pyprojen.project import Project
+from pyprojen.textfile import TextFile
+from pyprojen.util import normalize_persisted_path
+
+
+class ListIgnoreFile:
+    """The original list-based pattern bookkeeping of IgnoreFile, as a reference."""
+
+    def __init__(self, patterns: list):
+        self.patterns = patterns.copy()
+
+    def add_patterns(self, *patterns: str):
+        for pattern in patterns:
+            is_comment = pattern.startswith("#")
+            is_empty_line = len(pattern.strip()) == 0
+            if not is_comment and not is_empty_line:
+                opposite = "!" + pattern[1:] if pattern.startswith("!") else "!" + pattern
+                self._remove(pattern)
+                self._remove(opposite)
+                if pattern.endswith("/"):
+                    self.patterns = [p for p in self.patterns if not p.startswith(opposite)]
+            self.patterns.append(normalize_persisted_path(pattern))
+
+    def remove_patterns(self, *patterns: str):
+        for p in patterns:
+            self._remove(p)
+
+    def _remove(self, value: str):
+        if value in self.patterns:
+            self.patterns.remove(value)
+
+
+def test__patterns_match_list_semantics(tmp_path):
+    """Test that the indexed patterns produce exactly what the list-based implementation did."""
+    # GIVEN: A .gitignore that keeps comments and empty lines, and the reference implementation
+    initial = ["a/", "!a/b", "# comment", "", "a/"]
+    project = Project(
+        name="ignored",
+        outdir=str(tmp_path),
+        git_ignore_filter_comment_lines=False,
+        git_ignore_filter_empty_lines=False,
+        git_ignore_patterns=initial,
+    )
+    ignore_file: IgnoreFile = project.gitignore
+    reference = ListIgnoreFile(initial)
+    reference.add_patterns("/.pyprojen/cache/")
+    rng = random.Random(42)
+    names = ["a", "a/b", "a/b/c", "b", "b/c", "c\\\\d", "**/x"]
+
+    # WHEN: Random patterns are added and removed
+    for _ in range(2000):
+        name = rng.choice(names)
+        pattern = rng.choice(["", "!"]) + name + rng.choice(["", "/"])
+        if rng.random() < 0.05:
+            pattern = rng.choice(["# comment", "", "  "])
+        if rng.random() < 0.2:
+            ignore_file.remove_patterns(pattern)
+            reference.remove_patterns(pattern)
+        else:
+            ignore_file.add_patterns(pattern)
+            reference.add_patterns(pattern)
+
+        # THEN: Both hold the same patterns in the same order
+        assert list(ignore_file._patterns_by_id.values()) == reference.patterns
+
+
+class ScanCountingDict(dict):
+    """A dict that counts how often it is iterated."""
+
+    scans = 0
+
+    def __iter__(self):
+        self.scans += 1
+        return super().__iter__()
+
+    def keys(self):
+        self.scans += 1
+        return super().keys()
+
+    def values(self):
+        self.scans += 1
+        return super().values()
+
+    def items(self):
+        self.scans += 1
+        return super().items()
+
+
+def test__adding_patterns_does_not_scan_previous_patterns(tmp_path):
+    """Test that adding patterns, including directory patterns that remove others, does not rescan all patterns."""
+    # GIVEN: A project whose .gitignore counts scans of its patterns
+    project = Project(name="ignored", outdir=str(tmp_path))
+    ignore_file: IgnoreFile = project.gitignore
+    ignore_file._patterns_by_id = ScanCountingDict(ignore_file._patterns_by_id)
+
+    # WHEN: Many files are added, each adding a pattern, then a directory pattern that removes some of them
+    for i in range(1000):
+        TextFile(scope=project, file_path=f"dir{i % 10}/file{i}.txt")
+    project.add_git_ignore("dir0/")
+
+    # THEN: The patterns were never scanned, and the directory pattern removed the files below it
+    assert ignore_file._patterns_by_id.scans == 0
+    patterns = list(ignore_file._patterns_by_id.values())
+    assert "dir0/" in patterns
+    assert "!dir1/file1.txt" in patterns
+    assert not any(p.startswith("!dir0/") for p in patterns)
+
+
+def test__is_ignored(test_project: Project):
+    """Test that an ignore file answers queries for its current patterns."""
+    # GIVEN: A .gitignore with a directory pattern and a re-included file
+    test_project.add_git_ignore("build/")
+    test_project.add_git_ignore("*.log")
+    test_project.gitignore.include("keep.log")
+
+    # THEN: Paths are matched with gitignore semantics
+    assert test_project.gitignore.is_ignored("build/out.js")
+    assert test_project.gitignore.is_ignored("src/debug.log")
+    assert not test_project.gitignore.is_ignored("keep.log")
+
+    # WHEN: A pattern is removed
+    test_project.gitignore.remove_patterns("*.log")
+
+    # THEN: The query reflects it
+    assert not test_project.gitignore.is_ignored("src/debug.log")
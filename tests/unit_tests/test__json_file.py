@@ -0,0 +1,34 @@
+from pyprojen.json_file import JsonFile
+from pyprojen.json_patch import JsonPatch
+from pyprojen.project import Project
+from pyprojen.util.synth import synth_snapshot
+
+MARKER = "DO NOT EDIT. Generated by pyprojen. To modify, edit .pyprojenrc.py and run 'python .pyprojenrc.py'."
+
+
+def test__marker_as_key(test_project: Project):
+    """Test that the marker is added as a "//" key, after overrides and patches are applied."""
+    # GIVEN: A json file with an override and a patch
+    json_file = JsonFile(test_project, "package.json", {"name": "foo", "scripts": {"build": "make"}})
+    json_file.add_override("scripts.test", "pytest")
+    json_file.patch(JsonPatch.remove("/scripts/build"))
+
+    # WHEN: The project is synthesized
+    output: dict = synth_snapshot(test_project)
+
+    # THEN: The file is serialized once with the marker as its last key
+    assert output["package.json"] == {"name": "foo", "scripts": {"test": "pytest"}, "//": MARKER}
+    with open(f"{test_project.outdir}/package.json") as f:
+        assert f.read().endswith("}\n")
+
+
+def test__marker_as_comment(test_project: Project):
+    """Test that json5/jsonc files get the marker as a comment."""
+    # GIVEN: A jsonc file without a trailing newline
+    JsonFile(test_project, "settings.jsonc", {"a": [1, 2]}, newline=False)
+
+    # WHEN: The project is synthesized
+    output: dict = synth_snapshot(test_project)
+
+    # THEN: The marker is a comment on the first line
+    assert output["settings.jsonc"] == f'// {MARKER}\n{{\n  "a": [\n    1,\n    2\n  ]\n}}'
@@ -0,0 +1,105 @@
+import copy
+import random
+
+import jsonpatch
+import pytest
+
+from pyprojen.json_file import JsonFile
+from pyprojen.json_patch import JsonPatch
+from pyprojen.project import Project
+from pyprojen.util.synth import (
+    SnapshotOptions,
+    synth_snapshot,
+)
+
+
+def _random_patch(rng: random.Random) -> JsonPatch:
+    """A random patch over a small document, which may or may not apply to it."""
+    pointers = ["", "/a", "/a/b", "/a/~1x", "/l", "/l/0", "/l/1", "/l/-", "/l/01", "/l/5", "/n", "/a/b/c", "/~0"]
+    while True:
+        value = rng.choice([1, "s", None, [1, 2], {"k": [3]}])
+        op = rng.choice(["add", "remove", "replace", "move", "copy", "test"])
+        from_ = rng.choice(pointers[1:]) if op in ("move", "copy") else None
+        try:
+            return JsonPatch(op, rng.choice(pointers), value, from_)
+        except jsonpatch.InvalidJsonPatch:
+            # covered by test__invalid_patches_fail_when_created
+            continue
+
+
+def test__apply_matches_jsonpatch():
+    """Test that the native engine produces the same documents and failures as the jsonpatch library."""
+    rng = random.Random(7)
+    for _ in range(2000):
+        # GIVEN: A document and a random sequence of patches
+        doc = {"a": {"b": 1, "/x": 2}, "l": [1, {"m": 2}], "~": 0, "n": None}
+        patches = [_random_patch(rng) for _ in range(rng.randint(1, 4))]
+
+        # WHEN: The patches are applied one at a time by both engines
+        for patch in patches:
+            try:
+                expected = jsonpatch.apply_patch(doc, [patch.to_dict() | {"value": patch.value}])
+            except (jsonpatch.JsonPatchException, jsonpatch.JsonPointerException):
+                expected = "error"
+            try:
+                actual = JsonPatch.apply(doc, patch)
+            except (jsonpatch.JsonPatchException, jsonpatch.JsonPointerException):
+                actual = "error"
+
+            # THEN: They agree on the result, or both fail
+            assert actual == expected, (doc, patch.to_dict())
+            if expected != "error":
+                doc = expected
+
+
+def test__apply_in_place_does_not_copy_the_document():
+    """Test that all patches are applied to the given object, and the patches stay reusable."""
+    # GIVEN: A document and patches that add a container and then modify it
+    doc = {"scripts": {"build": "make"}, "list": [1]}
+    patches = [
+        JsonPatch.add("/deps", {"foo": "1.0"}),
+        JsonPatch.add("/deps/bar", "2.0"),
+        JsonPatch.move("/scripts/build", "/scripts/compile"),
+        JsonPatch.add("/list/-", 2),
+    ]
+
+    # WHEN: The patches are applied in place twice, to two documents
+    patched = JsonPatch.apply_in_place(doc, patches)
+    again = JsonPatch.apply_in_place(copy.deepcopy({"scripts": {"build": "make"}, "list": [1]}), patches)
+
+    # THEN: The document itself was modified, and the patch values were not
+    assert patched is doc
+    assert doc == {"scripts": {"compile": "make"}, "list": [1, 2], "deps": {"foo": "1.0", "bar": "2.0"}}
+    assert again == doc
+    assert patches[0].value == {"foo": "1.0"}
+
+
+def test__invalid_patches_fail_when_created():
+    """Test that pointers and operations are validated when a patch is created, not when it is applied."""
+    # WHEN/THEN: Creating patches with invalid pointers or operations fails
+    with pytest.raises(jsonpatch.JsonPointerException):
+        JsonPatch.add("a/b", 1)
+    with pytest.raises(jsonpatch.JsonPointerException):
+        JsonPatch.remove("/a/~2")
+    with pytest.raises(jsonpatch.InvalidJsonPatch):
+        JsonPatch("merge", "/a", 1)
+    with pytest.raises(jsonpatch.InvalidJsonPatch):
+        JsonPatch("move", "/a")
+    with pytest.raises(jsonpatch.InvalidJsonPatch):
+        JsonPatch.replace("/list/-", 1)
+
+
+def test__patches_are_applied_on_every_synth(test_project: Project):
+    """Test that a file's patches render the same content on repeated synths."""
+    # GIVEN: A json file with a patch that adds a container and one that adds into it
+    json_file = JsonFile(test_project, "package.json", {"name": "foo"})
+    json_file.patch(JsonPatch.add("/scripts", {}), JsonPatch.add("/scripts/test", "pytest"))
+
+    # WHEN: The project is synthesized twice, with the file marked dirty in between
+    first = synth_snapshot(test_project)["package.json"]
+    json_file.mark_dirty()
+    second = synth_snapshot(test_project, SnapshotOptions(incremental=True))["package.json"]
+
+    # THEN: Both synths render the patched object
+    assert first == second
+    assert first["scripts"] == {"test": "pytest"}
@@ -0,0 +1,63 @@
+from pyprojen.json_file import JsonFile
+from pyprojen.json_patch import JsonPatch
+from pyprojen.object_file import ObjectFile
+from pyprojen.project import Project
+from pyprojen.util.synth import synth_snapshot
+
+
+def test__split_on_periods_escapes():
+    """Test that a backslash escapes a period, so it stays part of the key."""
+    # WHEN/THEN: Paths with escaped periods and empty parts are split
+    assert ObjectFile._split_on_periods("a.b\\.c.d") == ["a", "b.c", "d"]
+    assert ObjectFile._split_on_periods("a..b.") == ["a", "b"]
+    assert ObjectFile._split_on_periods("a\\\\.b") == ["a\\", "b"]
+
+
+def test__overrides(test_project: Project):
+    """Test that overrides set, merge, delete and append values, without modifying the dicts passed to them."""
+    # GIVEN: A file with overrides on top of each other, below a dict value, and on arrays
+    json_file = JsonFile(test_project, "package.json", {"name": "foo", "files": ["a"], "old": 1})
+    value = {"test": "pytest"}
+    json_file.add_override("scripts", value)
+    json_file.add_override("scripts.build", "make")
+    json_file.add_override("tool.v\\.1", True)
+    json_file.add_deletion_override("old")
+    json_file.add_deletion_override("missing.key")
+    json_file.add_to_array("files", "b")
+    json_file.add_to_array("files", "c", "d")
+    json_file.add_to_array("keywords", "x")
+    json_file.patch(JsonPatch.add("/scripts/lint", "flake8"))
+
+    # WHEN: The project is synthesized
+    output = synth_snapshot(test_project)
+
+    # THEN: The overrides were applied, and neither the dict value nor the overrides were modified by patching
+    assert output["package.json"] == {
+        "name": "foo",
+        "files": ["a", "b", "c", "d"],
+        "scripts": {"test": "pytest", "build": "make", "lint": "flake8"},
+        "tool": {"v.1": True},
+        "keywords": ["x"],
+        "//": json_file.marker,
+    }
+    assert value == {"test": "pytest"}
+    assert json_file._raw_overrides["scripts"] == {"test": "pytest", "build": "make"}
+
+
+def test__add_override_only_touches_its_path(test_project: Project):
+    """Test that adding an override extends the trie in place, without copying the overrides added before."""
+    # GIVEN: A file with an override in each of a few sections
+    json_file = JsonFile(test_project, "pyproject.json", {})
+    for i in range(50):
+        json_file.add_override(f"tool.section{i}.key{i}", i)
+    tool = json_file._raw_overrides["tool"]
+    sections = {key: id(node) for key, node in tool.items()}
+
+    # WHEN: Many more overrides are added to the same sections
+    for i in range(50, 20_000):
+        json_file.add_override(f"tool.section{i % 50}.key{i}", i)
+
+    # THEN: The existing nodes were extended rather than replaced, and all overrides are rendered
+    assert json_file._raw_overrides["tool"] is tool
+    assert {key: id(node) for key, node in tool.items()} == sections
+    assert len(synth_snapshot(test_project)["pyproject.json"]["tool"]["section49"]) == 20_000 // 50
@@ -0,0 +1,156 @@
+import io
+import os
+import stat
+import tarfile
+import zipfile
+
+import pytest
+
+from pyprojen.common import (
+    FILE_MANIFEST,
+    FILE_STATE,
+)
+from pyprojen.json_file import JsonFile
+from pyprojen.output_backend import (
+    MMAP_THRESHOLD,
+    ArchiveBackend,
+    DiskBackend,
+    MemoryBackend,
+)
+from pyprojen.project import Project
+from pyprojen.textfile import TextFile
+from pyprojen.util.synth import (
+    SnapshotOptions,
+    synth_snapshot,
+)
+from pyprojen.yaml_file import YamlFile
+
+
+def _build_tree(outdir: str) -> Project:
+    """Build a project with a subproject and a few files."""
+    project = Project(name="backends", outdir=outdir)
+    subproject = Project(name="sub", parent=project, outdir="sub")
+    TextFile(scope=project, file_path="scripts/run.sh", lines=["echo hi"], executable=True)
+    JsonFile(project, "package.json", {"name": "backends"})
+    YamlFile(subproject, "config.yaml", {"a": [1, 2]})
+    return project
+
+
+def test__memory_snapshot_matches_disk_snapshot(tmp_path):
+    """Test that an in-memory snapshot equals a disk snapshot and writes nothing to disk."""
+    # GIVEN: Two identical projects
+    on_disk = _build_tree(str(tmp_path / "disk"))
+    in_memory = _build_tree(str(tmp_path / "memory"))
+
+    # WHEN: One is snapshotted on disk and the other in memory
+    disk_snapshot = synth_snapshot(on_disk)
+    memory_snapshot = synth_snapshot(in_memory, SnapshotOptions(in_memory=True))
+
+    # THEN: The snapshots are equal, and the in-memory project did not touch its outdir
+    assert memory_snapshot == disk_snapshot
+    assert sorted(memory_snapshot) == ["package.json", "scripts/run.sh", "sub/config.yaml"]
+    assert not os.path.exists(in_memory.outdir)
+
+
+def test__memory_backend_cleans_up_and_skips_unchanged_files(tmp_path):
+    """Test that re-synthesizing into the same memory backend behaves like re-synthesizing on disk."""
+    # GIVEN: A project synthesized into a memory backend
+    backend = MemoryBackend()
+    project = Project(name="memory", outdir=str(tmp_path))
+    TextFile(scope=project, file_path="foo.txt", lines=["foo"], readonly=True)
+    project.synth(backend=backend)
+
+    # WHEN: A fresh project without that file, but with another one, is synthesized into the same backend
+    project = Project(name="memory", outdir=str(tmp_path))
+    TextFile(scope=project, file_path="bar.txt", lines=["bar"], readonly=True)
+    project.synth(backend=backend)
+    project = Project(name="memory", outdir=str(tmp_path))
+    bar = TextFile(scope=project, file_path="bar.txt", lines=["bar"], readonly=True)
+    project.synth(backend=backend)
+
+    # THEN: The orphaned file was removed, and the unchanged file was not rewritten
+    files = backend.files_under(str(tmp_path))
+    assert sorted(files) == [".gitignore", FILE_STATE, FILE_MANIFEST, "bar.txt"]
+    assert bar.changed is False
+    assert stat.S_IMODE(backend.stat(str(tmp_path / "bar.txt")).st_mode) == 0o444
+
+
+def test__incremental_memory_snapshot(test_project: Project):
+    """Test that a project can be snapshotted in memory repeatedly in incremental mode."""
+    # GIVEN: A project snapshotted in memory
+    text_file = TextFile(scope=test_project, file_path="foo.txt", lines=["line 1"])
+    assert synth_snapshot(test_project, SnapshotOptions(in_memory=True))["foo.txt"] == "line 1"
+
+    # WHEN: The file changes, and the project is snapshotted again
+    text_file.add_line("line 2")
+    snapshot = synth_snapshot(test_project, SnapshotOptions(in_memory=True, incremental=True))
+
+    # THEN: The change is picked up
+    assert snapshot["foo.txt"] == "line 1\nline 2"
+
+
+@pytest.mark.parametrize("format", ["tar", "tar.gz", "zip"])
+def test__archive_backend(tmp_path, format):
+    """Test that a project can be synthesized into an archive stream."""
+    # GIVEN: A project and a stream
+    project = _build_tree(str(tmp_path / "archived"))
+    stream = io.BytesIO()
+
+    # WHEN: The project is synthesized into an archive
+    project.synth(backend=ArchiveBackend(stream, format))
+
+    # THEN: The archive holds the files with their modes, and nothing was written to disk
+    stream.seek(0)
+    if format == "zip":
+        with zipfile.ZipFile(stream) as archive:
+            names = archive.namelist()
+            content = archive.read("scripts/run.sh").decode()
+            mode = archive.getinfo("scripts/run.sh").external_attr >> 16
+    else:
+        with tarfile.open(fileobj=stream) as archive:
+            names = archive.getnames()
+            content = archive.extractfile("scripts/run.sh").read().decode()
+            mode = archive.getmember("scripts/run.sh").mode
+    assert sorted(names) == sorted(
+        [
+            ".gitignore",
+            FILE_MANIFEST,
+            "package.json",
+            "scripts/run.sh",
+            "sub/.gitignore",
+            f"sub/{FILE_MANIFEST}",
+            "sub/config.yaml",
+        ]
+    )
+    assert "echo hi" in content
+    assert stat.S_IMODE(mode) == 0o755
+    assert not os.path.exists(project.outdir)
+
+
+def test__archive_backend_rejects_second_synth(tmp_path):
+    """Test that an archive backend can only be used once."""
+    # GIVEN: A project synthesized into an archive
+    backend = ArchiveBackend(str(tmp_path / "out.tar"), "tar")
+    _build_tree(str(tmp_path / "archived")).synth(backend=backend)
+
+    # THEN: It cannot be used for another synth
+    with pytest.raises(ValueError, match="single synth"):
+        _build_tree(str(tmp_path / "archived")).synth(backend=backend)
+
+
+@pytest.mark.parametrize("size", [0, 100, MMAP_THRESHOLD * 4])
+def test__disk_backend_content_equals(tmp_path, size):
+    """Test that existing files are compared byte for byte, whether they are read or mapped into memory."""
+    # GIVEN: A file with non-ASCII content
+    data = ("ü" * size).encode("utf-8")[:size]
+    path = tmp_path / "data.txt"
+    path.write_bytes(data)
+    backend = DiskBackend()
+
+    # WHEN/THEN: Only the same bytes are equal, and missing files are not
+    assert backend.content_equals(str(path), data)
+    assert not backend.content_equals(str(path), data + b"x")
+    if size:
+        assert not backend.content_equals(str(path), data[:-1] + b"x")
+    assert not backend.content_equals(str(tmp_path / "missing.txt"), data)
+    assert MemoryBackend().content_equals(str(path), data) is False
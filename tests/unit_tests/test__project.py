@@ -0,0 +1,341 @@
+import json
+import os
+import threading
+
+import pytest
+
+from pyprojen.common import (
+    FILE_MANIFEST,
+    FILE_STATE,
+)
+from pyprojen.component import Component
+from pyprojen.constructs import Node
+from pyprojen.file import Lazy
+from pyprojen.json_file import JsonFile
+from pyprojen.output_backend import DiskBackend
+from pyprojen.project import Project
+from pyprojen.textfile import TextFile
+from pyprojen.toml_file import TomlFile
+from pyprojen.util.synth import (
+    SnapshotOptions,
+    directory_snapshot,
+    synth_snapshot,
+)
+from pyprojen.yaml_file import YamlFile
+
+
+def test__try_find_file(test_project: Project):
+    """Test that files can be found by relative and absolute path."""
+    # GIVEN: A project with a text file
+    text_file = TextFile(scope=test_project, file_path="hello/foo.txt")
+
+    # THEN: The file can be found by its relative and its absolute path
+    assert test_project.try_find_file("hello/foo.txt") is text_file
+    assert test_project.try_find_file("./hello/../hello/foo.txt") is text_file
+    assert test_project.try_find_file(os.path.join(test_project.outdir, "hello/foo.txt")) is text_file
+    assert test_project.try_find_file("hello/bar.txt") is None
+
+
+def test__try_find_file_in_subproject(test_project: Project):
+    """Test that a project finds files of its subprojects, but not of its parent."""
+    # GIVEN: A subproject with a file, and a parent file inside the subproject's outdir
+    subproject = Project(name="sub", parent=test_project, outdir="sub")
+    sub_file = TextFile(scope=subproject, file_path="foo.txt")
+    parent_file = TextFile(scope=test_project, file_path="sub/bar.txt")
+
+    # THEN: The parent finds both files, the subproject only its own
+    assert test_project.try_find_file("sub/foo.txt") is sub_file
+    assert test_project.try_find_file("sub/bar.txt") is parent_file
+    assert subproject.try_find_file("foo.txt") is sub_file
+    assert subproject.try_find_file("bar.txt") is None
+
+
+def test__duplicate_file_across_projects(test_project: Project):
+    """Test that two files may not share an absolute path, even across subprojects."""
+    # GIVEN: A subproject with a file
+    subproject = Project(name="sub", parent=test_project, outdir="sub")
+    TextFile(scope=subproject, file_path="foo.txt")
+
+    # THEN: The root project cannot define a file at the same location
+    with pytest.raises(ValueError, match="There is already a file under sub/foo.txt"):
+        TextFile(scope=test_project, file_path="sub/foo.txt")
+
+
+def test__try_find_object_file(test_project: Project):
+    """Test that object files are found and other files are rejected."""
+    # GIVEN: A project with a json file and a text file
+    json_file = JsonFile(test_project, "foo.json", {"a": 1})
+    TextFile(scope=test_project, file_path="foo.txt")
+
+    # THEN: Only the json file is returned as an object file
+    assert test_project.try_find_object_file("foo.json") is json_file
+    with pytest.raises(TypeError):
+        test_project.try_find_object_file("foo.txt")
+
+
+def test__file_registration_does_not_walk_the_tree(tmp_path, monkeypatch):
+    """Test that registering files does not walk the whole construct tree per file."""
+    # GIVEN: A root project, and a count of the walks over the construct tree
+    project = Project(name="scaling", outdir=str(tmp_path))
+    walks = []
+    walk = Node._walk
+    monkeypatch.setattr(Node, "_walk", lambda self, *args: walks.append(self) or walk(self, *args))
+
+    # WHEN: Building a tree of subprojects with files
+    for i in range(50):
+        subproject = Project(name=f"sub{i}", parent=project, outdir=f"sub{i}")
+        for j in range(5):
+            TextFile(scope=subproject, file_path=f"file{j}.txt")
+
+    # THEN: The tree was never walked, and the files are found through the index
+    assert walks == []
+    assert project.try_find_file("sub49/file4.txt") is not None
+
+
+EVENTS_LOCK = threading.Lock()
+
+
+class PhaseRecorder(Component):
+    """Component that records the synthesis phases it takes part in."""
+
+    def __init__(self, scope, events: list):
+        super().__init__(scope)
+        self.events = events
+
+    def pre_synthesize(self):
+        with EVENTS_LOCK:
+            self.events.append("pre")
+
+    def synthesize(self):
+        with EVENTS_LOCK:
+            self.events.append("synth")
+
+    def post_synthesize(self):
+        with EVENTS_LOCK:
+            self.events.append("post")
+
+
+def _build_tree(outdir: str, events: list) -> Project:
+    """Build a project with subprojects, files and phase recorders."""
+    project = Project(name="parallel", outdir=outdir)
+    for i in range(3):
+        subproject = Project(name=f"sub{i}", parent=project, outdir=f"sub{i}")
+        for j in range(10):
+            TextFile(scope=subproject, file_path=f"dir{j % 3}/file{j}.txt", lines=[f"{i}-{j}"])
+        YamlFile(subproject, "config.yaml", {"index": i, "matrix": [{"python": f"3.{v}"} for v in range(8, 13)]})
+        TomlFile(subproject, "pyproject.toml", {"project": {"name": f"sub{i}"}})
+    for _ in range(5):
+        PhaseRecorder(project, events)
+    JsonFile(project, "package.json", {"name": "parallel"})
+    return project
+
+
+def test__parallel_synth_matches_serial(tmp_path):
+    """Test that synthesizing on a thread pool writes the same files as a serial synth."""
+    # GIVEN: Two identical project trees
+    serial = _build_tree(str(tmp_path / "serial"), [])
+    parallel = _build_tree(str(tmp_path / "parallel"), [])
+
+    # WHEN: One is synthesized serially and the other on a thread pool
+    serial.synth()
+    parallel.synth(max_workers=4)
+
+    # THEN: Both produce the same output
+    assert directory_snapshot(parallel.outdir) == directory_snapshot(serial.outdir)
+    # (the snapshot skips dotfiles: 10 text files, a yaml and a toml file per subproject, plus package.json)
+    assert len(directory_snapshot(parallel.outdir)) == 3 * 12 + 1
+
+
+def test__parallel_synth_keeps_phase_barriers(tmp_path):
+    """Test that all components finish a phase before any component starts the next one."""
+    # GIVEN: A project with several components recording their phases
+    events = []
+    project = _build_tree(str(tmp_path), events)
+
+    # WHEN: Synthesizing on a thread pool
+    project.synth(max_workers=4)
+
+    # THEN: The phases never interleave
+    assert events == ["pre"] * 5 + ["synth"] * 5 + ["post"] * 5
+
+
+@pytest.mark.parametrize("max_workers", [None, 4])
+def test__process_pool_rendering_matches_in_process(tmp_path, max_workers):
+    """Test that rendering object files on a process pool writes the same files as rendering in-process."""
+    # GIVEN: Two identical project trees
+    in_process = _build_tree(str(tmp_path / "in-process"), [])
+    out_of_process = _build_tree(str(tmp_path / "out-of-process"), [])
+    out_of_process.try_find_object_file("package.json").add_override("scripts.test", "pytest")
+    in_process.try_find_object_file("package.json").add_override("scripts.test", "pytest")
+
+    # WHEN: One renders object files in-process and the other on a process pool
+    in_process.synth()
+    out_of_process.synth(max_workers=max_workers, render_processes=2)
+
+    # THEN: Both produce the same output
+    assert directory_snapshot(out_of_process.outdir) == directory_snapshot(in_process.outdir)
+
+
+def test__mutators_mark_files_dirty(test_project: Project):
+    """Test that modifying a file marks it as dirty until it is synthesized."""
+    # GIVEN: A synthesized project with a text and a json file
+    text_file = TextFile(scope=test_project, file_path="foo.txt")
+    json_file = JsonFile(test_project, "foo.json", {"a": 1})
+    test_project.synth()
+    assert not text_file.dirty and not json_file.dirty and not test_project.gitignore.dirty
+
+    # WHEN: The files are modified
+    text_file.add_line("line 1")
+    json_file.add_override("b", 2)
+    test_project.gitignore.remove_patterns("/foo.txt")
+
+    # THEN: They are dirty
+    assert text_file.dirty and json_file.dirty and test_project.gitignore.dirty
+
+
+def test__incremental_synth_only_rewrites_changed_files(test_project: Project):
+    """Test that an incremental synth only re-synthesizes dirty files and files with changed lazy values."""
+    # GIVEN: A synthesized project with a text file, a plain json file and a json file with a lazy object
+    state = {"version": "1.0.0"}
+    text_file = TextFile(scope=test_project, file_path="foo.txt", lines=["line 1"])
+    plain_file = JsonFile(test_project, "plain.json", {"a": 1})
+    lazy_file = JsonFile(test_project, "lazy.json", lambda: {"version": state["version"]})
+    test_project.synth()
+
+    # WHEN: A line is added, and the lazy value changes
+    text_file.add_line("line 2")
+    state["version"] = "2.0.0"
+    test_project.synth(incremental=True)
+
+    # THEN: Only the modified files were rewritten
+    assert text_file.changed is True
+    assert lazy_file.changed is True
+    assert plain_file.changed is False
+    assert test_project.gitignore.changed is False
+    with open(os.path.join(test_project.outdir, "foo.txt")) as f:
+        assert f.read() == "line 1\nline 2"
+    with open(os.path.join(test_project.outdir, "lazy.json")) as f:
+        assert '"version": "2.0.0"' in f.read()
+
+
+def test__incremental_synth_rerenders_lazy_lines(test_project: Project):
+    """Test that an incremental synth rewrites a text file whose lazy lines changed."""
+    # GIVEN: A synthesized project with a text file holding a lazy line, and one without
+    state = {"line": "one"}
+    lazy_file = TextFile(scope=test_project, file_path="foo.txt", lines=[Lazy(lambda: state["line"])])
+    plain_file = TextFile(scope=test_project, file_path="bar.txt", lines=["bar"])
+    test_project.synth()
+
+    # WHEN: The lazy value changes, without marking the file dirty
+    state["line"] = "two"
+    test_project.synth(incremental=True)
+
+    # THEN: Only the file holding it was rewritten
+    assert lazy_file.changed is True
+    assert plain_file.changed is False
+    with open(os.path.join(test_project.outdir, "foo.txt")) as f:
+        assert f.read() == "two"
+
+
+def test__incremental_synth_restores_touched_output(test_project: Project):
+    """Test that an incremental synth rewrites an output that was modified on disk."""
+    # GIVEN: A synthesized project whose output was modified on disk
+    text_file = TextFile(scope=test_project, file_path="foo.txt", lines=["line 1"])
+    test_project.synth()
+    with open(os.path.join(test_project.outdir, "foo.txt"), "w") as f:
+        f.write("changed on disk")
+
+    # WHEN: The project is synthesized incrementally
+    test_project.synth(incremental=True)
+
+    # THEN: The output is restored
+    assert text_file.changed is True
+    with open(os.path.join(test_project.outdir, "foo.txt")) as f:
+        assert f.read() == "line 1"
+
+
+def test__incremental_snapshot(test_project: Project):
+    """Test that a project can be snapshotted repeatedly in incremental mode."""
+    # GIVEN: A snapshotted project
+    text_file = TextFile(scope=test_project, file_path="foo.txt", lines=["line 1"])
+    assert synth_snapshot(test_project)["foo.txt"] == "line 1"
+
+    # WHEN: The file changes and the project is snapshotted again
+    text_file.add_line("line 2")
+
+    # THEN: A regular snapshot refuses, an incremental one picks up the change
+    with pytest.raises(ValueError, match="duplicate synth"):
+        synth_snapshot(test_project)
+    assert synth_snapshot(test_project, SnapshotOptions(incremental=True))["foo.txt"] == "line 1\nline 2"
+
+
+def _build_consolidated(outdir: str, sub_files: list, consolidated: bool = True) -> Project:
+    """Build a project with two subprojects with readonly files."""
+    project = Project(name="mono", outdir=outdir, consolidated_manifest=consolidated)
+    TextFile(scope=project, file_path="root.txt", lines=["root"], readonly=True)
+    for name in ["a", "b"]:
+        subproject = Project(name=name, parent=project, outdir=f"packages/{name}")
+        subproject.add_exclude_from_cleanup("*.keep")
+        for file in sub_files:
+            TextFile(scope=subproject, file_path=file, lines=[file], readonly=True)
+    return project
+
+
+def test__consolidated_manifest(tmp_path):
+    """Test that the root keeps one manifest for the whole tree, and cleans up subprojects in one pass."""
+    # GIVEN: A synthesized tree with a consolidated manifest
+    _build_consolidated(str(tmp_path), ["x.txt", "y.txt", "z.keep"]).synth()
+
+    # THEN: Only the root has a manifest, and it lists the files of the subprojects
+    assert not os.path.exists(tmp_path / "packages/a" / FILE_MANIFEST)
+    with open(tmp_path / FILE_MANIFEST) as f:
+        manifest = json.load(f)
+    assert manifest["consolidated"] is True
+    with open(tmp_path / FILE_STATE) as f:
+        state = json.load(f)
+    assert "packages/a/x.txt" in manifest["files"]
+    assert "packages/b/z.keep" in state["entries"]
+
+    # WHEN: The subprojects no longer generate some files
+    project = _build_consolidated(str(tmp_path), ["x.txt"])
+    project.synth()
+
+    # THEN: A single cleanup removed the orphans of all subprojects, except the excluded ones
+    assert sorted(os.path.relpath(f, tmp_path) for f in project.cleanup_stats.files_removed) == [
+        "packages/a/y.txt",
+        "packages/b/y.txt",
+    ]
+    assert os.path.exists(tmp_path / "packages/a/z.keep")
+    assert all(p.cleanup_stats is None for p in project.subprojects)
+
+
+def test__consolidated_manifest_skips_reading_unchanged_files(tmp_path, monkeypatch):
+    """Test that subproject files are recognized as unchanged from the consolidated manifest."""
+    # GIVEN: A synthesized tree with a consolidated manifest
+    _build_consolidated(str(tmp_path), ["x.txt"]).synth()
+    reads = []
+    read = DiskBackend.read
+    monkeypatch.setattr(DiskBackend, "read", lambda self, path: reads.append(path) or read(self, path))
+
+    # WHEN: The same tree is synthesized again
+    project = _build_consolidated(str(tmp_path), ["x.txt"])
+    project.synth()
+
+    # THEN: Only the manifest and the state were read
+    assert set(reads) == {os.path.join(project.outdir, FILE_MANIFEST), os.path.join(project.outdir, FILE_STATE)}
+    assert project.subprojects[0].try_find_file("x.txt").changed is False
+
+
+def test__switching_to_consolidated_manifest(tmp_path):
+    """Test that switching to a consolidated manifest cleans up after the per-subproject manifests."""
+    # GIVEN: A tree synthesized with per-subproject manifests
+    _build_consolidated(str(tmp_path), ["x.txt", "y.txt"], consolidated=False).synth()
+    assert os.path.exists(tmp_path / "packages/a" / FILE_MANIFEST)
+
+    # WHEN: It is synthesized with a consolidated manifest, without one of the files
+    _build_consolidated(str(tmp_path), ["x.txt"]).synth()
+
+    # THEN: The orphans and the per-subproject manifests were removed
+    assert not os.path.exists(tmp_path / "packages/a/y.txt")
+    assert not os.path.exists(tmp_path / "packages/a" / FILE_MANIFEST)
+    assert os.path.exists(tmp_path / "packages/a/x.txt")
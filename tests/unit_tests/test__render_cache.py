@@ -0,0 +1,114 @@
+import os
+
+from pyprojen import render_cache
+from pyprojen.object_file import RenderJob
+from pyprojen.project import Project
+from pyprojen.render_cache import (
+    RENDER_CACHE_DIR,
+    RenderCache,
+)
+from pyprojen.yaml_file import YamlFile
+
+
+def _synth_yaml_file(outdir: str, obj: dict, renders: list) -> Project:
+    """Synthesize a fresh project with a render cache and a single yaml file."""
+
+    class CountingYamlFile(YamlFile):
+        @classmethod
+        def render_object(cls, *args):
+            renders.append(args[0])
+            return super().render_object(*args)
+
+    project = Project(name="test-project", outdir=outdir, render_cache=True)
+    yaml_file = CountingYamlFile(project, "ci.yaml", obj)
+    yaml_file.add_override("jobs.test.runs-on", "ubuntu-latest")
+    project.synth()
+    return project
+
+
+def test__warm_run_reuses_rendered_output(tmp_path):
+    """Test that a second run with the same inputs does not render the file again."""
+    # GIVEN: A project that was synthesized with a render cache
+    renders = []
+    _synth_yaml_file(str(tmp_path), {"on": ["push"]}, renders)
+    assert len(renders) == 1
+
+    # WHEN: The same project is synthesized in a new run
+    _synth_yaml_file(str(tmp_path), {"on": ["push"]}, renders)
+
+    # THEN: The rendered output comes from the cache
+    assert len(renders) == 1
+    assert "runs-on: ubuntu-latest" in (tmp_path / "ci.yaml").read_text()
+
+
+def test__changed_inputs_miss_the_cache(tmp_path):
+    """Test that changing the object renders the file again."""
+    # GIVEN: A project that was synthesized with a render cache
+    renders = []
+    _synth_yaml_file(str(tmp_path), {"on": ["push"]}, renders)
+
+    # WHEN: The object changes
+    _synth_yaml_file(str(tmp_path), {"on": ["pull_request"]}, renders)
+
+    # THEN: The file is rendered again
+    assert len(renders) == 2
+    assert "- pull_request" in (tmp_path / "ci.yaml").read_text()
+
+
+def test__upgraded_library_misses_the_cache(tmp_path, monkeypatch):
+    """Test that upgrading a library that renders the file renders it again."""
+    # GIVEN: A project that was synthesized with a render cache
+    renders = []
+    _synth_yaml_file(str(tmp_path), {"on": ["push"]}, renders)
+
+    # WHEN: The same project is synthesized with a different version of PyYAML
+    versions = dict(render_cache._library_versions())
+    versions["PyYAML"] = "0.0.1"
+    monkeypatch.setattr(render_cache, "_library_versions", lambda: tuple(versions.items()))
+    _synth_yaml_file(str(tmp_path), {"on": ["push"]}, renders)
+
+    # THEN: The file is rendered again
+    assert len(renders) == 2
+
+
+def test__equal_data_has_equal_fingerprints():
+    """Test that the fingerprint only depends on the data, not on which objects are shared."""
+    # GIVEN: Two jobs with equal objects, one of them sharing a list between two keys
+    def job(obj: dict) -> RenderJob:
+        return RenderJob(YamlFile, obj, {}, [], None, {"line_width": 80})
+
+    steps = [{"run": "make"}]
+    shared = job({"build": steps, "test": steps})
+    copied = job({"build": [{"run": "make"}], "test": [{"run": "make"}]})
+    other = job({"build": steps, "test": []})
+
+    # WHEN/THEN: The equal jobs have the same fingerprint, and the other job another one
+    assert RenderCache.fingerprint(shared) == RenderCache.fingerprint(copied)
+    assert RenderCache.fingerprint(shared) != RenderCache.fingerprint(other)
+
+
+def test__cache_is_gitignored(tmp_path):
+    """Test that the cache directory is ignored by git."""
+    # WHEN: A project with a render cache is synthesized
+    _synth_yaml_file(str(tmp_path), {"on": ["push"]}, [])
+
+    # THEN: The cache directory is ignored
+    assert f"/{RENDER_CACHE_DIR}/" in (tmp_path / ".gitignore").read_text().splitlines()
+
+
+def test__evicts_least_recently_used(tmp_path):
+    """Test that eviction removes the least recently used entries first."""
+    # GIVEN: A cache with three entries, where the first one was used most recently
+    cache = RenderCache(str(tmp_path), max_bytes=20)
+    for i, key in enumerate(["aa1", "bb2", "cc3"]):
+        cache.put(key, "x" * 10)
+        os.utime(os.path.join(str(tmp_path), key[:2], key), (1000 + i, 1000 + i))
+    assert cache.get("aa1") == "x" * 10
+
+    # WHEN: Evicting down to 20 bytes
+    cache.evict()
+
+    # THEN: The oldest entry that was not used again is gone
+    assert cache.get("bb2") is None
+    assert cache.get("aa1") is not None
+    assert cache.get("cc3") is not None
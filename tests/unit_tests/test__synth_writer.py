@@ -0,0 +1,182 @@
+import errno
+import os
+import stat
+
+import pytest
+
+from pyprojen import synth_writer
+from pyprojen.project import Project
+from pyprojen.synth_writer import (
+    FsyncPolicy,
+    SynthWriter,
+)
+from pyprojen.textfile import TextFile
+from pyprojen.util import content_digest
+
+
+def test__write_replaces_readonly_file(tmp_path):
+    """Test that a readonly file is replaced atomically, without leaving temp files behind."""
+    # GIVEN: A readonly file
+    writer = SynthWriter()
+    path = str(tmp_path / "foo.txt")
+    writer.write(path, "old", readonly=True)
+    inode = os.stat(path).st_ino
+
+    # WHEN: The file is written again
+    st = writer.write(path, "new", readonly=True, executable=True)
+
+    # THEN: It was replaced by a new file with the final mode, and the returned stat describes it
+    assert (tmp_path / "foo.txt").read_text() == "new"
+    assert os.listdir(tmp_path) == ["foo.txt"]
+    assert os.stat(path).st_ino != inode
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o544
+    assert (st.st_size, st.st_mtime_ns) == (os.stat(path).st_size, os.stat(path).st_mtime_ns)
+
+
+def test__write_creates_each_directory_once(tmp_path, monkeypatch):
+    """Test that the parent directories are created once per writer, not once per file."""
+    # GIVEN: A writer that counts directory creations
+    created = []
+    makedirs = os.makedirs
+    monkeypatch.setattr(os, "makedirs", lambda path, **kwargs: created.append(path) or makedirs(path, **kwargs))
+    writer = SynthWriter()
+
+    # WHEN: Several files are written into two directories
+    for i in range(5):
+        writer.write(str(tmp_path / "a/b" / f"file{i}.txt"), f"{i}")
+        writer.write(str(tmp_path / "c" / f"file{i}.txt"), f"{i}")
+
+    # THEN: Each directory was created once (os.makedirs also recurses into "a")
+    assert created.count(str(tmp_path / "a/b")) == 1
+    assert created.count(str(tmp_path / "c")) == 1
+
+
+def test__failed_write_keeps_previous_file(tmp_path):
+    """Test that a failed write leaves the previous file intact and removes the temp file."""
+    # GIVEN: An existing file
+    writer = SynthWriter()
+    path = str(tmp_path / "foo.txt")
+    writer.write(path, "old")
+
+    # WHEN: Writing content that cannot be encoded
+    with pytest.raises(UnicodeEncodeError):
+        writer.write(path, "\udc80")
+
+    # THEN: The previous content is still there
+    assert (tmp_path / "foo.txt").read_text() == "old"
+    assert os.listdir(tmp_path) == ["foo.txt"]
+
+
+@pytest.mark.parametrize(
+    "policy, expected_during_writes",
+    [(FsyncPolicy.NONE, 0), (FsyncPolicy.PER_FILE, 3), (FsyncPolicy.AT_END, 0)],
+)
+def test__fsync_policy(tmp_path, monkeypatch, policy, expected_during_writes):
+    """Test when each fsync policy flushes files and directories."""
+    # GIVEN: A writer that counts fsyncs
+    calls = []
+    monkeypatch.setattr(os, "fsync", lambda fd: calls.append(fd))
+    writer = SynthWriter(policy)
+
+    # WHEN: Three files in two directories are written, and the writer finishes
+    writer.write(str(tmp_path / "a/foo.txt"), "foo")
+    writer.write(str(tmp_path / "a/bar.txt"), "bar")
+    writer.write(str(tmp_path / "b/baz.txt"), "baz")
+    during_writes = len(calls)
+    writer.finish()
+
+    # THEN: Files are flushed per file or at the end, and the two directories at the end
+    assert during_writes == expected_during_writes
+    assert len(calls) == {FsyncPolicy.NONE: 0, FsyncPolicy.PER_FILE: 5, FsyncPolicy.AT_END: 5}[policy]
+
+
+def test__synth_shares_one_writer(test_project: Project, monkeypatch):
+    """Test that a project and its subprojects write through one writer, which is finished once."""
+    # GIVEN: A project with a subproject
+    subproject = Project(name="sub", parent=test_project, outdir="sub")
+    TextFile(scope=test_project, file_path="foo.txt", lines=["foo"])
+    TextFile(scope=subproject, file_path="bar.txt", lines=["bar"])
+    finished = []
+    monkeypatch.setattr(SynthWriter, "finish", lambda self: finished.append(self))
+
+    # WHEN: The project is synthesized
+    test_project.synth(fsync=FsyncPolicy.AT_END)
+
+    # THEN: The files were written, and the writer was finished once
+    assert (open(os.path.join(subproject.outdir, "bar.txt")).read()) == "bar"
+    assert len(finished) == 1 and finished[0].fsync == FsyncPolicy.AT_END
+    assert test_project._backend is None and subproject._backend is None
+
+
+def test__open_writes_in_chunks(tmp_path):
+    """Test that a pending write only replaces the file when committed, and digests the encoded content."""
+    # GIVEN: A file, and a pending write of new content in many chunks
+    writer = SynthWriter()
+    path = str(tmp_path / "foo.txt")
+    writer.write(path, "old")
+    pending = writer.open(path)
+    chunks = [f"chunk {i} ü\n" for i in range(20_000)]
+    for chunk in chunks:
+        pending.write(chunk)
+
+    # WHEN: It is committed, and another pending write is discarded
+    assert (tmp_path / "foo.txt").read_text() == "old"
+    st = pending.commit()
+    discarded = writer.open(path)
+    discarded.write("discarded")
+    discarded.discard()
+
+    # THEN: The file has the new content, with the digest and size of its encoded content
+    content = "".join(chunks)
+    assert (tmp_path / "foo.txt").read_text() == content
+    assert pending.digest == content_digest(content)
+    assert pending.size == st.st_size == len(content.encode("utf-8"))
+    assert os.listdir(tmp_path) == ["foo.txt"]
+
+
+def test__copy_falls_back_when_kernel_copy_is_unsupported(tmp_path, monkeypatch):
+    """Test that a file is still copied when the kernel cannot copy between the files."""
+    # GIVEN: A source file, and kernel copies that fail as they do across filesystems on older kernels
+    source = tmp_path / "source.bin"
+    source.write_bytes(bytes(range(256)) * 10_000)
+
+    def unsupported(*args):
+        raise OSError(errno.EXDEV, "cross-device copy")
+
+    monkeypatch.setattr(synth_writer, "_KERNEL_COPIES", [unsupported])
+
+    # WHEN: The file is copied
+    st = SynthWriter().copy(str(source), str(tmp_path / "copy.bin"))
+
+    # THEN: The copy has the content of the source
+    assert (tmp_path / "copy.bin").read_bytes() == source.read_bytes()
+    assert st.st_size == os.stat(source).st_size
+
+
+def test__replaces_readonly_files_without_fchmod(tmp_path, monkeypatch):
+    """Test that writes and copies work like on Windows: without os.fchmod, and onto writable targets only."""
+    # GIVEN: A platform without os.fchmod, whose os.replace refuses to replace readonly files
+    monkeypatch.delattr(os, "fchmod")
+    monkeypatch.setattr(synth_writer, "_REPLACE_NEEDS_WRITABLE_TARGET", True)
+    replace = os.replace
+
+    def windows_replace(src, dst):
+        if os.path.exists(dst) and not os.stat(dst).st_mode & stat.S_IWUSR:
+            raise PermissionError(errno.EACCES, "Access is denied", dst)
+        replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", windows_replace)
+    writer = SynthWriter()
+    source = tmp_path / "source.bin"
+    source.write_bytes(b"copied")
+
+    # WHEN: Readonly files are written and copied over readonly files
+    for _ in range(2):
+        writer.write(str(tmp_path / "foo.txt"), "new", readonly=True)
+        writer.copy(str(source), str(tmp_path / "copy.bin"), readonly=True)
+
+    # THEN: They were replaced, and are readonly
+    assert (tmp_path / "foo.txt").read_text() == "new"
+    assert (tmp_path / "copy.bin").read_bytes() == b"copied"
+    assert stat.S_IMODE(os.stat(tmp_path / "foo.txt").st_mode) == 0o444
+    assert stat.S_IMODE(os.stat(tmp_path / "copy.bin").st_mode) == 0o444
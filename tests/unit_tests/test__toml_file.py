@@ -0,0 +1,29 @@
+from pyprojen.project import Project
+from pyprojen.toml_file import TomlFile
+from pyprojen.util.synth import synth_snapshot
+
+MARKER = "DO NOT EDIT. Generated by pyprojen. To modify, edit .pyprojenrc.py and run 'python .pyprojenrc.py'."
+
+
+def test__toml_file(test_project: Project):
+    """Test that a toml file is serialized with its marker and overrides."""
+    # GIVEN: A toml file with an override
+    toml_file = TomlFile(test_project, "pyproject.toml", {"project": {"name": "foo"}})
+    toml_file.add_override("tool.black.line-length", 119)
+
+    # WHEN: The project is synthesized
+    output: dict = synth_snapshot(test_project)
+
+    # THEN: The content is the marker followed by the toml document
+    assert output["pyproject.toml"] == "\n".join(
+        [
+            f"# {MARKER}",
+            "",
+            "[project]",
+            'name = "foo"',
+            "",
+            "[tool.black]",
+            "line-length = 119",
+            "",
+        ]
+    )
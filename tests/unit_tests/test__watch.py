@@ -0,0 +1,157 @@
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from pyprojen.watch import (
+    InotifyWatcher,
+    PollingWatcher,
+    invalidate_modules,
+    run_config,
+    watch,
+)
+
+RC_FILE = """
+from components import make_project
+
+if __name__ == "__main__":
+    make_project(OUTDIR).synth()
+"""
+
+BASE_MODULE = """
+LINE = "{line}"
+"""
+
+COMPONENTS_MODULE = """
+from base import LINE
+from pyprojen.project import Project
+from pyprojen.textfile import TextFile
+
+
+def make_project(outdir):
+    project = Project(name="watched", outdir=outdir)
+    TextFile(scope=project, file_path="foo.txt", lines=[LINE])
+    return project
+"""
+
+
+@pytest.fixture
+def config_dir(tmp_path: Path):
+    """A project directory with a config script that imports two local modules."""
+    outdir = tmp_path / "out"
+    (tmp_path / ".pyprojenrc.py").write_text(f"OUTDIR = {str(outdir)!r}\n{RC_FILE}")
+    (tmp_path / "base.py").write_text(BASE_MODULE.format(line="line 1"))
+    (tmp_path / "components.py").write_text(COMPONENTS_MODULE)
+    (tmp_path / "unrelated.py").write_text("")
+    yield tmp_path
+    for name in ["base", "components", "unrelated"]:
+        sys.modules.pop(name, None)
+    if str(tmp_path) in sys.path:
+        sys.path.remove(str(tmp_path))
+
+
+def _edit(path: Path, content: str):
+    """Rewrite a file, making sure its mtime changes."""
+    mtime = os.stat(path).st_mtime_ns
+    path.write_text(content)
+    os.utime(path, ns=(mtime + 1_000_000_000, mtime + 1_000_000_000))
+
+
+def test__run_config_collects_local_modules(config_dir: Path):
+    """Test that running the config returns the config and the local modules it imported."""
+    # WHEN: The config is run
+    paths = run_config(str(config_dir / ".pyprojenrc.py"))
+
+    # THEN: The project is synthesized and the local modules are watched
+    assert (config_dir / "out/foo.txt").read_text() == "line 1"
+    assert {os.path.basename(p) for p in paths} == {".pyprojenrc.py", "base.py", "components.py"}
+
+
+def test__invalidate_modules_reimports_dependents(config_dir: Path):
+    """Test that a changed module and the local modules importing from it are re-imported, and nothing else."""
+    # GIVEN: A config that was run, and an unrelated local module
+    run_config(str(config_dir / ".pyprojenrc.py"))
+    import unrelated  # noqa: F401
+
+    # WHEN: The base module changes
+    removed = invalidate_modules({str(config_dir / "base.py")}, str(config_dir))
+
+    # THEN: The base module and the components module that imports from it are invalidated
+    assert removed == ["base", "components"]
+    assert "unrelated" in sys.modules
+    assert "pyprojen.project" in sys.modules
+
+
+def test__polling_watcher(tmp_path: Path):
+    """Test that the polling watcher reports modified files."""
+    # GIVEN: A watched file
+    path = tmp_path / "foo.py"
+    path.write_text("")
+    watcher = PollingWatcher(interval=0.01)
+    assert watcher.wait({str(path)}, timeout=0.05) == set()
+
+    # WHEN: The file is modified
+    _edit(path, "x = 1")
+
+    # THEN: The watcher reports it
+    assert watcher.wait({str(path)}, timeout=1) == {str(path)}
+
+
+@pytest.mark.skipif(not InotifyWatcher.is_available(), reason="inotify is not available")
+def test__inotify_watcher(tmp_path: Path):
+    """Test that the inotify watcher reports modified files, and ignores other files in the directory."""
+    # GIVEN: A watched file and an unwatched sibling
+    path = tmp_path / "foo.py"
+    path.write_text("")
+    watcher = InotifyWatcher()
+
+    # WHEN: Both files are modified while waiting
+    def edit():
+        time.sleep(0.1)
+        (tmp_path / "other.py").write_text("y = 2")
+        path.write_text("x = 1")
+
+    thread = threading.Thread(target=edit)
+    thread.start()
+    changed = watcher.wait({str(path)}, timeout=5)
+    thread.join()
+
+    # THEN: Only the watched file is reported
+    assert changed == {str(path)}
+    watcher.close()
+
+
+@pytest.mark.skipif(not InotifyWatcher.is_available(), reason="inotify is not available")
+def test__inotify_watcher_reports_changes_between_waits(tmp_path: Path):
+    """Test that the inotify watcher reports a file that changed while nobody was waiting, e.g. during a run."""
+    # GIVEN: A watched file
+    path = tmp_path / "foo.py"
+    path.write_text("")
+    watcher = InotifyWatcher()
+    assert watcher.wait({str(path)}, timeout=0.05) == set()
+
+    # WHEN: The file is modified before the next wait
+    path.write_text("x = 1")
+
+    # THEN: The next wait reports it right away
+    assert watcher.wait({str(path)}, timeout=0) == {str(path)}
+    watcher.close()
+
+
+def test__watch_resynthesizes_on_change(config_dir: Path):
+    """Test that watch mode re-synthesizes with the new code when a local module changes."""
+
+    # GIVEN: A watcher that edits the base module instead of waiting
+    class EditingWatcher(PollingWatcher):
+        def wait(self, paths, timeout=None):
+            _edit(config_dir / "base.py", BASE_MODULE.format(line="line 2"))
+            return {str(config_dir / "base.py")}
+
+    # WHEN: Watching for two runs
+    watch(str(config_dir / ".pyprojenrc.py"), EditingWatcher(), max_runs=2)
+
+    # THEN: The second run used the new code
+    assert (config_dir / "out/foo.txt").read_text() == "line 2"
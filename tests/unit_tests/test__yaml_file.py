@@ -0,0 +1,31 @@
+from pyprojen.project import Project
+from pyprojen.util.synth import synth_snapshot
+from pyprojen.yaml_file import YamlFile
+
+MARKER = "DO NOT EDIT. Generated by pyprojen. To modify, edit .pyprojenrc.py and run 'python .pyprojenrc.py'."
+
+
+def test__yaml_file(test_project: Project):
+    """Test that a yaml file is serialized with its marker and overrides."""
+    # GIVEN: A yaml file with an override
+    yaml_file = YamlFile(test_project, "ci.yaml", {"on": ["push"], "jobs": {"test": {"steps": [{"run": "make"}]}}})
+    yaml_file.add_override("jobs.test.runs-on", "ubuntu-latest")
+
+    # WHEN: The project is synthesized
+    output: dict = synth_snapshot(test_project)
+
+    # THEN: The content is the marker followed by the block-style yaml document
+    assert output["ci.yaml"] == "\n".join(
+        [
+            f"# {MARKER}",
+            "",
+            "jobs:",
+            "  test:",
+            "    runs-on: ubuntu-latest",
+            "    steps:",
+            "    - run: make",
+            "'on':",
+            "- push",
+            "",
+        ]
+    )
@@ -0,0 +1,141 @@
+import shutil
+import subprocess
+
+import pytest
+
+from pyprojen.util.ignore import (
+    IgnoreMatcher,
+    rebase_pattern,
+)
+
+PATTERNS = [
+    "# comment",
+    "",
+    "*.log",
+    "!important.log",
+    "build/",
+    "/dist",
+    "docs/**/*.html",
+    "**/cache",
+    "tmp/**",
+    "!tmp/keep.txt",
+    "a/*/c",
+    "file[0-9].txt",
+    "\\!bang",
+    "node_modules/",
+    "!node_modules/keep.js",
+]
+
+PATHS = [
+    "debug.log",
+    "src/debug.log",
+    "important.log",
+    "src/important.log",
+    "build/out.js",
+    "src/build/out.js",
+    "build",
+    "dist",
+    "dist/bundle.js",
+    "src/dist",
+    "docs/index.html",
+    "docs/api/index.html",
+    "docs/api/v1/index.html",
+    "cache",
+    "src/cache/x",
+    "tmp/a.txt",
+    "tmp/keep.txt",
+    "a/b/c",
+    "a/b/d/c",
+    "file1.txt",
+    "filex.txt",
+    "!bang",
+    "node_modules/keep.js",
+    "src/main.py",
+]
+
+
+@pytest.mark.parametrize("path", PATHS)
+def test__is_ignored(path):
+    """Test gitignore semantics on a representative set of patterns."""
+    # GIVEN: A matcher
+    matcher = IgnoreMatcher(PATTERNS)
+
+    # THEN: The paths are matched as git would
+    expected = {
+        "debug.log",
+        "src/debug.log",
+        "build/out.js",
+        "src/build/out.js",
+        "dist",
+        "dist/bundle.js",
+        "docs/index.html",
+        "docs/api/index.html",
+        "docs/api/v1/index.html",
+        "cache",
+        "src/cache/x",
+        "tmp/a.txt",
+        "a/b/c",
+        "file1.txt",
+        "!bang",
+        # a file inside an ignored directory cannot be re-included
+        "node_modules/keep.js",
+    }
+    assert matcher.is_ignored(path) == (path in expected)
+
+
+def test__directory_patterns_only_match_directories():
+    """Test that a pattern with a trailing slash matches directories, but not files."""
+    # GIVEN: A matcher with a directory pattern
+    matcher = IgnoreMatcher(["build/"])
+
+    # THEN: Only the directory, and the files inside it, are ignored
+    assert matcher.is_ignored("build", is_dir=True)
+    assert not matcher.is_ignored("build")
+    assert matcher.is_ignored("build/a.txt")
+
+
+def test__no_patterns():
+    """Test that nothing is ignored without patterns."""
+    assert not IgnoreMatcher([]).is_ignored("foo.txt")
+    assert not IgnoreMatcher(["# only a comment"]).is_ignored("foo.txt")
+
+
+@pytest.mark.parametrize(
+    "pattern, path, ignored",
+    [
+        ("*.md", "sub/docs/a.md", True),
+        ("*.md", "other/a.md", False),
+        ("/dist", "sub/dist/x.js", True),
+        ("/dist", "sub/nested/dist/x.js", False),
+        ("build/", "sub/a/build/x", True),
+        ("!keep.md", "sub/keep.md", False),
+    ],
+)
+def test__rebase_pattern(pattern, path, ignored):
+    """Test that a rebased pattern matches the same paths below the subdirectory."""
+    # GIVEN: A subdirectory pattern rebased onto its parent, after a pattern ignoring all markdown files
+    matcher = IgnoreMatcher(["sub/**/*.md" if pattern.startswith("!") else "", rebase_pattern(pattern, "sub")])
+
+    # THEN: It matches from the parent what it matched from the subdirectory
+    assert matcher.is_ignored(path) == ignored
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+def test__matches_git_check_ignore(tmp_path):
+    """Test that the matcher agrees with git itself."""
+    # GIVEN: A git repository with the patterns as .gitignore
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    (tmp_path / ".gitignore").write_text("\n".join(PATTERNS) + "\n")
+    matcher = IgnoreMatcher(PATTERNS)
+
+    # WHEN: git checks the paths
+    result = subprocess.run(
+        ["git", "-C", str(tmp_path), "check-ignore", "--no-index", "--stdin"],
+        input="\n".join(PATHS) + "\n",
+        capture_output=True,
+        text=True,
+    )
+
+    # THEN: The same paths are ignored
+    ignored_by_git = set(result.stdout.splitlines())
+    assert {p for p in PATHS if matcher.is_ignored(p)} == ignored_by_git
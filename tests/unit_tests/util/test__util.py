@@ -0,0 +1,125 @@
+import copy
+import random
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+)
+
+from pyprojen.util import (
+    APPEND_KEY,
+    deep_merge,
+)
+
+
+def recursive_deep_merge(objects: List[Optional[Dict[str, Any]]], destructive: bool = False) -> Dict[str, Any]:
+    """The original recursive deep_merge, as a reference."""
+
+    def merge_one(target: Dict[str, Any], source: Dict[str, Any]) -> None:
+        for key, value in source.items():
+            if isinstance(value, dict):
+                if not isinstance(target.get(key), dict):
+                    target[key] = value
+                if "__$APPEND" in value and isinstance(value["__$APPEND"], list):
+                    if isinstance(target.get(key), list):
+                        target[key].extend(value["__$APPEND"])
+                    else:
+                        target[key] = value["__$APPEND"]
+                merge_one(target[key], value)
+                if isinstance(target[key], dict) and len(target[key]) == 0 and destructive:
+                    del target[key]
+            elif value is None and destructive:
+                del target[key]
+            elif value is not None:
+                target[key] = value
+
+    others = [obj for obj in objects if obj is not None]
+    if not others:
+        return {}
+    into, *rest = others
+    for other in rest:
+        merge_one(into, other)
+    return into
+
+
+def _random_object(rng: random.Random, depth: int = 0) -> Dict[str, Any]:
+    """A random object over a small set of keys, so that sources overlap with targets."""
+    obj = {}
+    for key in rng.sample(["a", "b", "c", "d"], rng.randint(0, 4)):
+        choice = rng.randint(0, 5 if depth < 3 else 2)
+        if choice < 3:
+            obj[key] = [None, 1, [1, 2]][choice]
+        elif choice == 3:
+            obj[key] = {APPEND_KEY: [rng.randint(3, 9)]}
+        else:
+            obj[key] = _random_object(rng, depth + 1)
+    return obj
+
+
+def test__deep_merge_matches_recursive_merge():
+    """Test that the iterative merge produces what the recursive implementation did, wherever that one worked."""
+    rng = random.Random(5)
+    compared = 0
+    for _ in range(3000):
+        # GIVEN: Two random objects
+        target, source = _random_object(rng), _random_object(rng)
+        destructive = rng.random() < 0.5
+
+        # WHEN: They are merged by both implementations
+        try:
+            expected = recursive_deep_merge([copy.deepcopy(target), copy.deepcopy(source)], destructive)
+        except (KeyError, RuntimeError, TypeError):
+            # the recursive merge failed on deletions of missing keys, and on deletions and appends in new subtrees
+            continue
+        actual = deep_merge([target, source], destructive)
+
+        # THEN: The results are the same
+        assert actual == expected, (target, source, destructive)
+        compared += 1
+    assert compared > 1000
+
+
+def test__deep_merge_does_not_share_containers_with_sources():
+    """Test that the merged object can be modified without changing the sources."""
+    # GIVEN: A source with a new subtree and a list
+    source = {"new": {"list": [1]}, "list": [{"a": 1}]}
+
+    # WHEN: It is merged and the result is modified
+    merged = deep_merge([{}, source], True)
+    merged["new"]["list"].append(2)
+    merged["list"][0]["a"] = 2
+
+    # THEN: The source is unchanged
+    assert source == {"new": {"list": [1]}, "list": [{"a": 1}]}
+
+
+def test__deep_merge_append_and_delete():
+    """Test appending to arrays and deleting missing keys and new subtrees."""
+    # GIVEN: An object with an array
+    target = {"list": [1], "keep": 1}
+
+    # WHEN: Values are appended, and keys are deleted that do not exist or only exist in the source
+    merged = deep_merge(
+        [target, {"list": {APPEND_KEY: [2]}, "new": {APPEND_KEY: [3]}, "missing": None, "sub": {"x": None}}],
+        True,
+    )
+
+    # THEN: The arrays were appended to or created, and nothing else was added
+    assert merged == {"list": [1, 2], "keep": 1, "new": [3]}
+
+
+def test__deep_merge_deep_objects():
+    """Test that objects deeper than the recursion limit can be merged."""
+    # GIVEN: A source nested 50000 levels deep
+    source: Dict[str, Any] = {"leaf": 1}
+    for _ in range(50_000):
+        source = {"a": source}
+
+    # WHEN: It is merged into an empty object
+    merged = deep_merge([{}, source])
+
+    # THEN: The leaf is there
+    for _ in range(50_000):
+        merged = merged["a"]
+    assert merged == {"leaf": 1}